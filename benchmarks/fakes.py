@@ -0,0 +1,405 @@
+# Standard library imports
+import base64
+import bisect
+import collections
+import hashlib
+import json
+import random
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+# Local imports
+from services.vector_store import VectorStore, LocalVectorStore
+
+EMBEDDING_DIMENSION = 64
+
+def _fake_error(service):
+    # Firestore callers retry google.api_core errors, so raise one of those when it is installed
+    try:
+        from google.api_core.exceptions import ServiceUnavailable
+        return ServiceUnavailable(f"Injected {service} error")
+    except ImportError:
+        return RuntimeError(f"Injected {service} error")
+
+def _seeded(text):
+    return random.Random(hashlib.sha256(text.encode('utf-8')).digest())
+
+def fake_embedding(text):
+    rng = _seeded(text)
+    return [rng.uniform(-1, 1) for _ in range(EMBEDDING_DIMENSION)]
+
+class FakeServiceMixin:
+    """
+    Latency and error injection shared by the in-process fakes, with per-operation call counts.
+    """
+
+    def _setup(self, name, latency_ms, error_rate, seed=0):
+        self.name = name
+        self.latency = latency_ms / 1000.0
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._stats_lock = threading.Lock()
+        self.calls = collections.Counter()
+        self.errors = collections.Counter()
+
+    def _call(self, operation):
+        with self._stats_lock:
+            self.calls[operation] += 1
+            failed = self._rng.random() < self.error_rate
+            if failed:
+                self.errors[operation] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if failed:
+            raise _fake_error(self.name)
+
+    def stats(self):
+        with self._stats_lock:
+            return {'calls': dict(self.calls), 'errors': dict(self.errors)}
+
+# --- HTTP fakes for YouTube and OpenAI, run in a separate process ---------------------------
+
+def _youtube_video(video_id):
+    rng = _seeded(video_id)
+    channel = rng.randrange(500)
+    # Mostly short descriptions, with a long tail, as in real histories
+    description = " ".join(f"word{rng.randrange(5000)}" for _ in range(rng.choice([20, 40, 60, 400])))
+    return {
+        'kind': 'youtube#video',
+        'etag': hashlib.md5(video_id.encode()).hexdigest(),
+        'id': video_id,
+        'snippet': {
+            'publishedAt': '2023-11-10T12:00:00Z',
+            'channelId': f'UCfake{channel:06d}',
+            'title': f'Video {video_id} about topic {rng.randrange(1000)}',
+            'description': description,
+            'thumbnails': {'high': {'url': f'https://i.ytimg.com/vi/{video_id}/hqdefault.jpg'}},
+            'channelTitle': f'Channel {channel}',
+            'tags': [f'tag{rng.randrange(200)}' for _ in range(3)],
+            'categoryId': str(rng.choice([1, 10, 20, 22, 27, 28])),
+        },
+        'contentDetails': {'duration': f'PT{rng.randrange(1, 60)}M{rng.randrange(60)}S'},
+        'statistics': {'viewCount': str(rng.randrange(10 ** 6))},
+    }
+
+def _youtube_response(path, query):
+    if path.endswith('/videos'):
+        return {'items': [_youtube_video(video_id) for video_id in query['id'][0].split(',')]}
+    if path.endswith('/channels'):
+        return {'items': [{'id': channel_id, 'snippet': {'title': f'Channel {channel_id}'}}
+                          for channel_id in query['id'][0].split(',')]}
+    if path.endswith('/videoCategories'):
+        return {'items': [{'id': str(category), 'snippet': {'title': f'Category {category}'}}
+                          for category in (1, 10, 20, 22, 27, 28)]}
+    if path.endswith('/search'):
+        return {'items': [{'id': {'videoId': f'search{index:05d}'},
+                           'snippet': {'title': f"{query['q'][0]} {index}", 'thumbnails': {'high': {'url': ''}}}}
+                          for index in range(int(query.get('maxResults', ['3'])[0]))]}
+    return None
+
+def _openai_response(path, body):
+    if path.endswith('/embeddings'):
+        inputs = body['input'] if isinstance(body['input'], list) else [body['input']]
+        data = []
+        for index, text in enumerate(inputs):
+            vector = fake_embedding(text if isinstance(text, str) else json.dumps(text))
+            if body.get('encoding_format') == 'base64':
+                vector = base64.b64encode(struct.pack(f'<{len(vector)}f', *vector)).decode('ascii')
+            data.append({'object': 'embedding', 'index': index, 'embedding': vector})
+        tokens = sum(len(str(text)) // 4 for text in inputs)
+        return {'object': 'list', 'data': data, 'model': body.get('model', ''),
+                'usage': {'prompt_tokens': tokens, 'total_tokens': tokens}}
+    if path.endswith('/chat/completions'):
+        prompt = body['messages'][-1]['content']
+        if body.get('response_format', {}).get('type') == 'json_object':
+            items = json.loads(prompt)
+            content = json.dumps({'summaries': [{'id': item['id'], 'summary': f"Summary: {item['description'][:80]}"}
+                                                for item in items]})
+        else:
+            content = f"Summary: {prompt[:80]}"
+        prompt_tokens = sum(len(message.get('content') or '') // 4 for message in body['messages'])
+        completion_tokens = len(content) // 4
+        return {'id': 'chatcmpl-fake', 'object': 'chat.completion', 'created': int(time.time()), 'model': body['model'],
+                'choices': [{'index': 0, 'finish_reason': 'stop', 'message': {'role': 'assistant', 'content': content}}],
+                'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                          'total_tokens': prompt_tokens + completion_tokens}}
+    return None
+
+def serve_fake_http(kind, latency_ms, error_rate, ready, seed=0):
+    """
+    Serves the fake YouTube Data API ('youtube') or OpenAI API ('openai') until the process is stopped.
+    GET /_stats returns call and error counts per path. Puts the bound port on the `ready` queue.
+    """
+    rng = random.Random(seed)
+    lock = threading.Lock()
+    calls, errors, latencies = collections.Counter(), collections.Counter(), collections.defaultdict(list)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # Headers and body go out in separate writes; with Nagle's algorithm on, delayed ACKs add ~40 ms to each reply
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, payload, headers=None):
+            data = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _handle(self, body):
+            started = time.perf_counter()
+            url = urlsplit(self.path)
+            if url.path == '/_stats':
+                with lock:
+                    stats = {'calls': dict(calls), 'errors': dict(errors), 'latency_ms': {
+                        path: _percentiles(values) for path, values in latencies.items()}}
+                return self._send(200, stats)
+            with lock:
+                calls[url.path] += 1
+                failed = rng.random() < error_rate
+                if failed:
+                    errors[url.path] += 1
+            if latency_ms:
+                time.sleep(latency_ms / 1000.0)
+            if failed:
+                # OpenAI failures alternate between rate limiting and server errors
+                status = 429 if kind == 'openai' and rng.random() < 0.5 else 500
+                self._send(status, {'error': {'message': 'Injected error'}}, {'Retry-After': '0.05'} if status == 429 else None)
+            else:
+                payload = (_youtube_response(url.path, parse_qs(url.query)) if kind == 'youtube'
+                           else _openai_response(url.path, body))
+                self._send(200 if payload is not None else 404, payload or {'error': {'message': 'Not found'}})
+            with lock:
+                latencies[url.path].append((time.perf_counter() - started) * 1000)
+
+        def do_GET(self):
+            self._handle(None)
+
+        def do_POST(self):
+            self._handle(json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}'))
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    ready.put(server.server_address[1])
+    server.serve_forever()
+
+def _percentiles(values):
+    if not values:
+        return {'count': 0, 'p50': None, 'p99': None}
+    ordered = sorted(values)
+    return {'count': len(ordered), 'p50': ordered[int(0.50 * (len(ordered) - 1))], 'p99': ordered[int(0.99 * (len(ordered) - 1))]}
+
+# --- OpenAI embeddings client talking to the fake server -----------------------------------------
+
+class FakeServerEmbeddings:
+    """
+    Stand-in for langchain's OpenAIEmbeddings (embed_documents / embed_query) that sends
+    real HTTP requests through the openai SDK, pointed at the fake OpenAI server.
+    """
+
+    def __init__(self, base_url, model='text-embedding-ada-002'):
+        import openai
+        self._client = openai.OpenAI(api_key='benchmark', base_url=base_url, max_retries=3)
+        self.model = model
+
+    def embed_documents(self, texts):
+        response = self._client.embeddings.create(model=self.model, input=list(texts))
+        return [list(item.embedding) for item in sorted(response.data, key=lambda item: item.index)]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+# --- Pinecone emulator ------------------------------------------------------------------------------
+
+class FakePineconeStore(FakeServiceMixin, VectorStore):
+    """
+    Vector store with Pinecone-like latency and failures, backed by a LocalVectorStore.
+    """
+
+    def __init__(self, path, latency_ms=0, error_rate=0.0):
+        self._setup('pinecone', latency_ms, error_rate)
+        self._store = LocalVectorStore(path)
+
+    @property
+    def version(self):
+        return self._store.version
+
+    def upsert(self, vectors):
+        self._call('upsert')
+        return self._store.upsert(vectors)
+
+    def delete(self, ids):
+        self._call('delete')
+        self._store.delete(ids)
+
+    def query(self, vector, top_k=3):
+        self._call('query')
+        return self._store.query(vector, top_k=top_k)
+
+# --- Firestore emulator -----------------------------------------------------------------------------
+
+def _get_path(data, path):
+    for part in path.split('.'):
+        if not isinstance(data, dict) or part not in data:
+            return None
+        data = data[part]
+    return data
+
+def _project(data, field_paths):
+    if field_paths is None:
+        return dict(data)
+    projected = {}
+    for path in field_paths:
+        value = _get_path(data, path)
+        if value is None:
+            continue
+        target = projected
+        parts = path.split('.')
+        for part in parts[:-1]:
+            target = target.setdefault(part, {})
+        target[parts[-1]] = value
+    return projected
+
+class FakeSnapshot:
+    def __init__(self, document_id, data, field_paths=None):
+        self.id = document_id
+        self.exists = data is not None
+        self._data = data
+        self._field_paths = field_paths
+
+    def to_dict(self):
+        return _project(self._data, self._field_paths) if self.exists else None
+
+class FakeDocumentReference:
+    def __init__(self, db, collection, document_id):
+        self._db = db
+        self.collection = collection
+        self.id = document_id
+
+    def set(self, data, merge=False):
+        self._db._call('set')
+        self._db._write(self.collection, self.id, data, merge)
+
+    def get(self):
+        self._db._call('get')
+        return FakeSnapshot(self.id, self._db._read(self.collection, self.id))
+
+_OPERATORS = {
+    '<': lambda a, b: a < b, '<=': lambda a, b: a <= b, '==': lambda a, b: a == b,
+    '>': lambda a, b: a > b, '>=': lambda a, b: a >= b,
+}
+
+class FakeQuery:
+    def __init__(self, db, collection, filters=(), field_paths=None, order=(), limit=None, start_after=None):
+        self._db = db
+        self._collection = collection
+        self._filters = filters
+        self._field_paths = field_paths
+        self._order = order
+        self._limit = limit
+        self._start_after = start_after
+
+    def _copy(self, **changes):
+        state = dict(filters=self._filters, field_paths=self._field_paths, order=self._order,
+                     limit=self._limit, start_after=self._start_after)
+        state.update(changes)
+        return FakeQuery(self._db, self._collection, **state)
+
+    def where(self, field, op, value):
+        return self._copy(filters=self._filters + ((field, _OPERATORS[op], value),))
+
+    def select(self, field_paths):
+        return self._copy(field_paths=list(field_paths))
+
+    def order_by(self, field):
+        return self._copy(order=self._order + (field,))
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def start_after(self, snapshot):
+        return self._copy(start_after=snapshot)
+
+    def _sort_key(self, document_id, data):
+        return tuple(document_id if field == '__name__' else _get_path(data, field) for field in self._order)
+
+    def stream(self):
+        self._db._call('query')
+        documents = self._db._documents(self._collection)
+        matches = [(document_id, data) for document_id, data in documents
+                   if all(_get_path(data, field) is not None and compare(_get_path(data, field), value)
+                          for field, compare, value in self._filters)]
+        if self._order:
+            matches.sort(key=lambda match: self._sort_key(*match))
+            if self._start_after is not None:
+                keys = [self._sort_key(*match) for match in matches]
+                matches = matches[bisect.bisect_right(keys, self._sort_key(self._start_after.id, self._start_after._data)):]
+        if self._limit is not None:
+            matches = matches[:self._limit]
+        for document_id, data in matches:
+            yield FakeSnapshot(document_id, data, self._field_paths)
+
+class FakeCollection(FakeQuery):
+    def document(self, document_id):
+        return FakeDocumentReference(self._db, self._collection, document_id)
+
+class FakeBatch:
+    def __init__(self, db):
+        self._db = db
+        self._writes = []
+
+    def set(self, reference, data, merge=False):
+        self._writes.append((reference, data, merge))
+
+    def commit(self):
+        self._db._call('batch_commit')
+        for reference, data, merge in self._writes:
+            self._db._write(reference.collection, reference.id, data, merge)
+
+class FakeFirestore(FakeServiceMixin):
+    """
+    In-memory emulator of the subset of the Firestore client the app uses: documents,
+    batched writes, get_all with field masks, and where/select/order_by/limit/start_after queries.
+    """
+
+    def __init__(self, latency_ms=0, error_rate=0.0):
+        self._setup('firestore', latency_ms, error_rate)
+        self._collections = collections.defaultdict(dict)
+        self._lock = threading.Lock()
+
+    def _write(self, collection, document_id, data, merge):
+        with self._lock:
+            documents = self._collections[collection]
+            documents[document_id] = {**documents.get(document_id, {}), **data} if merge else dict(data)
+
+    def _read(self, collection, document_id):
+        with self._lock:
+            return self._collections[collection].get(document_id)
+
+    def _documents(self, collection):
+        with self._lock:
+            return list(self._collections[collection].items())
+
+    def collection(self, name):
+        return FakeCollection(self, name)
+
+    def batch(self):
+        return FakeBatch(self)
+
+    def get_all(self, references, field_paths=None):
+        self._call('get_all')
+        for reference in references:
+            yield FakeSnapshot(reference.id, self._read(reference.collection, reference.id), field_paths)
+
+    def count(self, collection):
+        with self._lock:
+            return len(self._collections[collection])
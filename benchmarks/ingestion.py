@@ -0,0 +1,261 @@
+"""
+End-to-end ingestion benchmark against local stand-ins for YouTube, OpenAI, Pinecone and Firestore.
+
+    python -m benchmarks.ingestion --entries 10000 --output benchmark.json
+    python -m benchmarks.ingestion --entries 10000 --compare benchmark.json
+
+watch_history_test.html is scaled up to --entries synthetic watch entries and replayed through
+parse_html -> process_videos -> /download_csv and /query-subtopic. YouTube and OpenAI are fake
+HTTP servers in a separate process; Firestore and Pinecone are in-process emulators. Every fake
+has latency and error-rate knobs. The report holds items/sec per phase, p50/p99 per pipeline
+stage, peak RSS and remote call counts.
+"""
+# Standard library imports
+import argparse
+import io
+import json
+import logging
+import multiprocessing
+import os
+import random
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+SAMPLE_HISTORY_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'watch_history_test.html')
+VIDEO_LINK_REGEX = re.compile(r'watch\?v=[\w-]{11}')
+
+def synthesize_history(entries, unique_ratio=0.7, seed=0, sample_path=SAMPLE_HISTORY_PATH):
+    """
+    Builds a Takeout watch history with `entries` entries by cycling the sample's entries and
+    rewriting their video IDs. About unique_ratio of the entries are distinct videos; the rest
+    are re-watches of earlier ones.
+
+    :return: The HTML document as a string.
+    """
+    with open(sample_path, encoding='utf-8') as f:
+        sample = f.read()
+    marker = '<div class="outer-cell'
+    first = sample.index(marker)
+    prefix, body = sample[:first], sample[first:]
+    blocks = [marker + block for block in body.split(marker)[1:]]
+    blocks = [block for block in blocks if VIDEO_LINK_REGEX.search(block)]
+
+    rng = random.Random(seed)
+    distinct = 0
+    parts = [prefix]
+    for index in range(entries):
+        if distinct == 0 or rng.random() < unique_ratio:
+            video_number = distinct
+            distinct += 1
+        else:
+            video_number = rng.randrange(distinct)
+        video_id = f'bm{video_number:09d}'
+        parts.append(VIDEO_LINK_REGEX.sub(f'watch?v={video_id}', blocks[index % len(blocks)], count=1))
+    return ''.join(parts)
+
+def percentiles(values):
+    """
+    Returns count, p50 and p99 of a list of durations in seconds, in milliseconds.
+    """
+    if not values:
+        return {'count': 0, 'p50_ms': None, 'p99_ms': None}
+    ordered = sorted(values)
+    return {
+        'count': len(ordered),
+        'p50_ms': ordered[int(0.50 * (len(ordered) - 1))] * 1000,
+        'p99_ms': ordered[int(0.99 * (len(ordered) - 1))] * 1000,
+    }
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def _phase(seconds, items):
+    return {'seconds': seconds, 'items': items, 'items_per_second': items / seconds if seconds else None,
+            'peak_rss_mb': peak_rss_mb()}
+
+def _start_fake_server(kind, latency_ms, error_rate):
+    from benchmarks.fakes import serve_fake_http
+    context = multiprocessing.get_context('spawn')
+    ready = context.Queue()
+    process = context.Process(target=serve_fake_http, args=(kind, latency_ms, error_rate, ready), daemon=True)
+    process.start()
+    return process, f'http://127.0.0.1:{ready.get(timeout=60)}'
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmark(args):
+    """
+    Runs the benchmark described by the parsed command line arguments.
+
+    :return: The results dictionary.
+    """
+    workdir = tempfile.mkdtemp(prefix='ingestion-benchmark-')
+    # Everything the app persists goes to the scratch directory, and no real credentials are needed
+    os.environ.update({
+        'SUMMARY_CACHE_PATH': os.path.join(workdir, 'summaries.sqlite3'),
+        'YT_VIDEO_CACHE_PATH': os.path.join(workdir, 'youtube_videos.sqlite3'),
+        'YT_QUOTA_LEDGER_PATH': os.path.join(workdir, 'youtube_quota.sqlite3'),
+        'BOILERPLATE_PATH': os.path.join(workdir, 'boilerplate.sqlite3'),
+        'KEYWORD_INDEX_PATH': os.path.join(workdir, 'keyword_index.sqlite3'),
+        'VIDEO_REPLICA_PATH': os.path.join(workdir, 'video_replica.sqlite3'),
+        'WATCH_EVENTS_PATH': os.path.join(workdir, 'watch_events.sqlite3'),
+        'JOB_STORE_PATH': os.path.join(workdir, 'jobs.sqlite3'),
+        'VECTOR_STORE_PATH': os.path.join(workdir, 'vectors'),
+        'YT_DAILY_QUOTA': str(10 ** 9),
+        'OPENAI_RPM': str(args.openai_rpm),
+        'OPENAI_TPM': str(args.openai_tpm),
+    })
+    for name in ('YOUR_YOUTUBE_API_KEY', 'YOUR_OPENAI_API_KEY', 'YOUR_PINECONE_API_KEY'):
+        os.environ.setdefault(name, 'benchmark')
+
+    youtube_process, youtube_url = _start_fake_server('youtube', args.youtube_latency_ms, args.youtube_error_rate)
+    openai_process, openai_url = _start_fake_server('openai', args.openai_latency_ms, args.openai_error_rate)
+    os.environ['YOUTUBE_API_BASE_URL'] = f'{youtube_url}/youtube/v3'
+    os.environ['OPENAI_BASE_URL'] = f'{openai_url}/v1'
+
+    # The app reads its configuration at import time, so it is only imported now
+    import httpx
+    from flask import Flask
+    from benchmarks.fakes import FakeFirestore, FakePineconeStore, FakeServerEmbeddings
+    from services.registry import register_service
+    from services.data_processing import process_videos
+    from controllers.flask_routes import initialize_routes
+    from utils.html_parser import parse_html, iter_parse_html
+    from utils.agents import get_summary_stats
+    from utils.openai_client import get_chat_client
+    from utils.youtube_api import get_video_cache_stats, get_quota_status
+
+    firestore = FakeFirestore(args.firestore_latency_ms, args.firestore_error_rate)
+    vector_store = FakePineconeStore(os.environ['VECTOR_STORE_PATH'], args.pinecone_latency_ms, args.pinecone_error_rate)
+    register_service('firestore', lambda: firestore)
+    register_service('vector_store', lambda: vector_store)
+    register_service('embeddings', lambda: FakeServerEmbeddings(os.environ['OPENAI_BASE_URL']))
+
+    results = {
+        'config': {name: value for name, value in vars(args).items() if name not in ('output', 'compare')},
+        'commit': _git_commit(),
+        'started_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'phases': {},
+    }
+    try:
+        html = synthesize_history(args.entries, args.unique_ratio)
+
+        started = time.perf_counter()
+        if args.parser == 'stream':
+            video_data_list = list(iter_parse_html(io.BytesIO(html.encode('utf-8'))))
+        else:
+            video_data_list = parse_html(html)
+        results['phases']['parse'] = _phase(time.perf_counter() - started, len(video_data_list))
+        del html
+
+        stage_timings, stage_counts, ingest_counts = {}, {}, {}
+        started = time.perf_counter()
+        processed_data, _ = process_videos(video_data_list, stage_counts=stage_counts, ingest_counts=ingest_counts,
+                                           stage_timings=stage_timings)
+        results['phases']['process_videos'] = _phase(time.perf_counter() - started, len(video_data_list))
+        results['phases']['process_videos'].update({'processed': len(processed_data), 'ingest_counts': ingest_counts})
+        results['stages'] = {name: dict(percentiles(timings), items=stage_counts.get(name))
+                             for name, timings in stage_timings.items()}
+
+        app = Flask(__name__)
+        initialize_routes(app)
+        client = app.test_client()
+
+        started = time.perf_counter()
+        response = client.get('/download_csv', buffered=False)
+        csv_bytes = sum(len(chunk) for chunk in response.response)
+        response.close()
+        results['phases']['download_csv'] = _phase(time.perf_counter() - started, firestore.count('youtube_videos'))
+        results['phases']['download_csv']['bytes'] = csv_bytes
+
+        rng = random.Random(1)
+        subtopics = [f'topic {rng.randrange(args.distinct_queries)}' for _ in range(args.queries)]
+        query_timings = []
+        started = time.perf_counter()
+        for subtopic in subtopics:
+            query_started = time.perf_counter()
+            client.post('/query-subtopic', json={'subTopic': subtopic, 'mode': args.query_mode})
+            query_timings.append(time.perf_counter() - query_started)
+        results['phases']['query_subtopic'] = _phase(time.perf_counter() - started, len(subtopics))
+        results['phases']['query_subtopic'].update(percentiles(query_timings))
+
+        results['remote_calls'] = {
+            'youtube': httpx.get(f'{youtube_url}/_stats').json(),
+            'openai': httpx.get(f'{openai_url}/_stats').json(),
+            'firestore': firestore.stats(),
+            'pinecone': vector_store.stats(),
+        }
+        results['clients'] = {
+            'openai': get_chat_client().stats(),
+            'summary_cache': get_summary_stats(),
+            'video_cache': get_video_cache_stats(),
+            'youtube_quota_spent': get_quota_status()['spent'],
+        }
+        results['peak_rss_mb'] = peak_rss_mb()
+    finally:
+        youtube_process.terminate()
+        openai_process.terminate()
+    return results
+
+def compare(results, baseline):
+    """
+    Prints throughput and latency changes against a saved run and returns True if any
+    phase's items/sec dropped by more than 10%.
+    """
+    regressed = False
+    for phase, current in results['phases'].items():
+        previous = baseline.get('phases', {}).get(phase)
+        if not previous or not previous.get('items_per_second') or not current.get('items_per_second'):
+            continue
+        change = current['items_per_second'] / previous['items_per_second'] - 1
+        regressed |= change < -0.10
+        print(f"{phase:>16}: {previous['items_per_second']:10.1f} -> {current['items_per_second']:10.1f} items/s ({change:+.1%})")
+    for stage, current in results.get('stages', {}).items():
+        previous = baseline.get('stages', {}).get(stage)
+        if previous and previous.get('p99_ms') and current.get('p99_ms'):
+            print(f"{'stage ' + stage:>16}: p99 {previous['p99_ms']:.1f} -> {current['p99_ms']:.1f} ms")
+    print(f"{'peak RSS':>16}: {baseline.get('peak_rss_mb', 0):.0f} -> {results['peak_rss_mb']:.0f} MB")
+    return regressed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entries', type=int, default=10000, help='Synthetic watch history entries')
+    parser.add_argument('--unique-ratio', type=float, default=0.7, help='Share of entries that are distinct videos')
+    parser.add_argument('--parser', choices=['soup', 'stream'], default='soup',
+                        help='parse_html (BeautifulSoup) or iter_parse_html (the streaming parser /upload uses)')
+    parser.add_argument('--queries', type=int, default=200, help='/query-subtopic requests to send')
+    parser.add_argument('--query-mode', choices=['vector', 'hybrid', 'keyword'], default='vector', help='/query-subtopic ranking mode')
+    parser.add_argument('--distinct-queries', type=int, default=50, help='Distinct subtopics among the queries')
+    for service, latency in (('youtube', 40), ('openai', 300), ('firestore', 20), ('pinecone', 30)):
+        parser.add_argument(f'--{service}-latency-ms', type=float, default=latency, help=f'Latency added to every {service} call')
+        parser.add_argument(f'--{service}-error-rate', type=float, default=0.0, help=f'Share of {service} calls that fail')
+    parser.add_argument('--openai-rpm', type=int, default=10000)
+    parser.add_argument('--openai-tpm', type=int, default=2000000)
+    parser.add_argument('--output', help='Write the results JSON to this file')
+    parser.add_argument('--compare', help='Results JSON of an earlier run to compare against')
+    args = parser.parse_args()
+
+    # Configured before the app modules are imported, so their basicConfig calls leave it alone
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    results = run_benchmark(args)
+    print(json.dumps(results, indent=2, default=str))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, default=str)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            if compare(results, json.load(f)):
+                sys.exit(1)
+
+if __name__ == '__main__':
+    main()
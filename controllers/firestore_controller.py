@@ -3,51 +3,250 @@ import logging
 import csv
 import io
 import json
+import threading
+import time
+import zlib
 
-# Third-party imports
-import firebase_admin
-from firebase_admin import credentials, firestore
+# Local imports
+from services.registry import register_service, get_service
+from utils.metrics import errors_total, firestore_write_seconds, firestore_documents_written_total
 
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
-# Initialize Firebase Admin
-try:
-    cred = credentials.Certificate('config/rabbit-408205-firebase-adminsdk-opkxt-77124475b9.json')
-    firebase_admin.initialize_app(cred)
-    db = firestore.client()
-    logging.info("Firebase Admin initialized successfully.")
-except Exception as e:
-    logging.error("Failed to initialize Firebase Admin", exc_info=True)
+def _create_firestore_client():
+    # Imported here so that loading this module stays cheap until Firestore is used
+    import firebase_admin
+    from firebase_admin import credentials, firestore
 
-def store_in_firestore(data):
+    try:
+        cred = credentials.Certificate('config/rabbit-408205-firebase-adminsdk-opkxt-77124475b9.json')
+        firebase_admin.initialize_app(cred)
+        logging.info("Firebase Admin initialized successfully.")
+    except Exception as e:
+        logging.error("Failed to initialize Firebase Admin", exc_info=True)
+        raise
+    return firestore.client()
+
+register_service('firestore', _create_firestore_client)
+
+def get_db():
+    """
+    Returns the Firestore client, initializing Firebase Admin on first use.
     """
-    Stores the provided data in Firestore.
+    return get_service('firestore')
+
+def _transient_errors():
+    # Errors worth retrying a write for; anything else is reported as a failure right away
+    from google.api_core import exceptions as google_exceptions
+    return (
+        google_exceptions.Aborted,
+        google_exceptions.DeadlineExceeded,
+        google_exceptions.InternalServerError,
+        google_exceptions.ResourceExhausted,
+        google_exceptions.ServiceUnavailable,
+    )
+MAX_BATCH_WRITES = 500  # Firestore's limit on writes per batch
+
+class FirestoreBulkWriter:
+    """
+    Buffers document writes and commits them as batched writes.
+
+    A batch is flushed when it reaches max_batch_size documents or when its oldest
+    write has waited flush_interval seconds. If a batch commit fails, its documents
+    are retried one by one with exponential backoff on transient errors. Results per
+    document ID ('ok' or an error message) are kept in `results`.
+    """
+
+    def __init__(self, collection='youtube_videos', max_batch_size=MAX_BATCH_WRITES, flush_interval=2.0, max_retries=3):
+        self.collection = collection
+        self.max_batch_size = min(max_batch_size, MAX_BATCH_WRITES)
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.results = {}
+        self._pending = []  # List of (document ID, data)
+        self._oldest = None
+        self._lock = threading.Lock()
+        self._commit_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+        self._flusher.start()
 
-    :param data: The data to be stored.
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def set(self, document_id, data):
+        """
+        Queues a document write, flushing if the batch is full.
+
+        :param document_id: The ID of the document to write.
+        :param data: The document data.
+        """
+        with self._lock:
+            self._pending.append((document_id, data))
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            full = len(self._pending) >= self.max_batch_size
+        if full:
+            self.flush()
+
+    def flush(self):
+        """
+        Commits every queued write.
+        """
+        with self._lock:
+            pending, self._pending, self._oldest = self._pending, [], None
+        for start in range(0, len(pending), self.max_batch_size):
+            self._commit(pending[start:start + self.max_batch_size])
+
+    def close(self):
+        """
+        Flushes remaining writes and stops the background flusher.
+
+        :return: Dictionary of document ID -> 'ok' or error message.
+        """
+        self._closed.set()
+        self._flusher.join()
+        self.flush()
+        failed = [document_id for document_id, result in self.results.items() if result != 'ok']
+        if failed:
+            logging.error(f"Failed to write {len(failed)} of {len(self.results)} documents to '{self.collection}': {failed}")
+        return self.results
+
+    def _flush_periodically(self):
+        while not self._closed.wait(self.flush_interval / 2):
+            with self._lock:
+                stale = self._oldest is not None and time.monotonic() - self._oldest >= self.flush_interval
+            if stale:
+                self.flush()
+
+    def _commit(self, writes):
+        if not writes:
+            return
+        db = get_db()
+        collection = db.collection(self.collection)
+        with self._commit_lock:
+            try:
+                batch = db.batch()
+                for document_id, data in writes:
+                    batch.set(collection.document(document_id), data)
+                with firestore_write_seconds.time(kind='batch'):
+                    batch.commit()
+                self.results.update((document_id, 'ok') for document_id, _ in writes)
+                firestore_documents_written_total.inc(len(writes), collection=self.collection)
+                logging.info(f"Committed {len(writes)} documents to '{self.collection}'")
+                return
+            except Exception as e:
+                errors_total.inc(service='firestore', stage='batch_write')
+                logging.warning(f"Batch write of {len(writes)} documents failed, retrying one by one: {e}")
+            for document_id, data in writes:
+                self.results[document_id] = self._write_with_retry(collection, document_id, data)
+
+    def _write_with_retry(self, collection, document_id, data):
+        transient_errors = _transient_errors()
+        for attempt in range(self.max_retries + 1):
+            try:
+                with firestore_write_seconds.time(kind='document'):
+                    collection.document(document_id).set(data)
+                firestore_documents_written_total.inc(collection=self.collection)
+                return 'ok'
+            except transient_errors as e:
+                errors_total.inc(service='firestore', stage='document_write')
+                if attempt == self.max_retries:
+                    logging.error(f"Giving up writing document {document_id} after {attempt + 1} attempts: {e}")
+                    return str(e)
+                time.sleep(0.5 * 2 ** attempt)
+            except Exception as e:
+                errors_total.inc(service='firestore', stage='document_write')
+                logging.error(f"Failed to write document {document_id}: {e}", exc_info=True)
+                return str(e)
+
+def store_in_firestore(data, collection='youtube_videos', id_field='video_id'):
     """
-    # Firestore storing logic
-    # Implement the logic to store data in Firestore
-    pass
+    Stores the provided documents in Firestore using batched writes.
 
-def get_all_videos_from_firestore():
+    :param data: Iterable of documents, each carrying its ID under id_field.
+    :param collection: The Firestore collection to write to.
+    :param id_field: The document field holding the document ID.
+    :return: Dictionary of document ID -> 'ok' or error message.
     """
-    Retrieves all videos from Firestore.
+    with FirestoreBulkWriter(collection) as writer:
+        for document in data:
+            writer.set(document[id_field], document)
+    return writer.results
 
-    :return: A list of video data.
+def iter_videos_from_firestore(page_size=500, fields=None, since=None):
     """
-    try:
-        videos = db.collection('youtube_videos').stream()
-        video_list = []
-        for doc in videos:
+    Yields every video in Firestore, reading the collection one page at a time.
+
+    :param page_size: Number of documents fetched per query.
+    :param fields: Optional list of field paths to project; other fields are not transferred.
+    :param since: Optional datetime; only videos with a later `last_updated` are returned.
+    :return: A generator of video data dictionaries.
+    """
+    query = get_db().collection('youtube_videos')
+    if fields:
+        # Paging past a document needs the value of every field the query is ordered by
+        query = query.select(list(dict.fromkeys([*fields, 'last_updated'] if since else fields)))
+    if since is not None:
+        query = query.where('last_updated', '>', since).order_by('last_updated')
+    query = query.order_by('__name__')
+
+    last_doc = None
+    while True:
+        page = query.limit(page_size)
+        if last_doc is not None:
+            page = page.start_after(last_doc)
+        docs = list(page.stream())
+        for doc in docs:
             video_data = doc.to_dict()
-            video_data['video_id'] = doc.id  # Ensure video_id is added to each video dictionary
-            video_list.append(video_data)
-        return video_list
-    except Exception as e:
-        logging.error("Failed to retrieve videos from Firestore", exc_info=True)
-        return []
+            video_data['video_id'] = doc.id
+            yield video_data
+        if len(docs) < page_size:
+            return
+        last_doc = docs[-1]
+
+def get_stored_videos(video_ids, fields=('last_updated',), chunk_size=300):
+    """
+    Looks up which videos are already stored with batched reads, transferring only the given fields.
+
+    :param video_ids: Iterable of video IDs.
+    :param fields: Field paths to read from each stored video.
+    :param chunk_size: Number of documents fetched per batched get.
+    :return: Dictionary of stored video ID -> dictionary of the requested fields.
+    """
+    db = get_db()
+    collection = db.collection('youtube_videos')
+    unique_ids = list(dict.fromkeys(video_ids))
+    stored = {}
+    for start in range(0, len(unique_ids), chunk_size):
+        refs = [collection.document(video_id) for video_id in unique_ids[start:start + chunk_size]]
+        for snapshot in db.get_all(refs, field_paths=list(fields)):
+            if snapshot.exists:
+                stored[snapshot.id] = snapshot.to_dict() or {}
+    return stored
+
+def get_ingest_watermark(user_id):
+    """
+    Returns the newest watch timestamp ingested for a user, or None before the first ingest.
+
+    :param user_id: The user the uploads belong to.
+    """
+    snapshot = get_db().collection('ingest_state').document(user_id).get()
+    return (snapshot.to_dict() or {}).get('watermark') if snapshot.exists else None
+
+def set_ingest_watermark(user_id, watermark):
+    """
+    Stores the newest watch timestamp ingested for a user.
+
+    :param user_id: The user the uploads belong to.
+    :param watermark: The timestamp.
+    """
+    get_db().collection('ingest_state').document(user_id).set({'watermark': watermark}, merge=True)
 
 def flatten_dict(d, parent_key='', sep='_'):
   """
@@ -70,24 +269,63 @@ def flatten_dict(d, parent_key='', sep='_'):
           items.append((new_key, v))
   return dict(items)
 
-def create_csv_from_data(data):
+# Flattened columns of the documents written by process_video_data
+VIDEO_CSV_FIELDS = sorted([
+    'video_id', 'kind', 'etag',
+    'snippet_publishedAt', 'snippet_channelId', 'snippet_title', 'snippet_description',
+    'snippet_thumbnails_default', 'snippet_thumbnails_medium', 'snippet_thumbnails_high',
+    'snippet_thumbnails_standard', 'snippet_thumbnails_maxres',
+    'snippet_channelTitle', 'snippet_tags', 'snippet_categoryId', 'snippet_liveBroadcastContent',
+    'snippet_defaultLanguage', 'snippet_localized_title', 'snippet_localized_description',
+    'snippet_defaultAudioLanguage',
+    'contentDetails_duration', 'contentDetails_dimension', 'contentDetails_definition',
+    'contentDetails_caption', 'contentDetails_licensedContent', 'contentDetails_projection',
+    'statistics_viewCount', 'statistics_likeCount', 'statistics_favoriteCount', 'statistics_commentCount',
+    'duration_in_seconds', 'category_name', 'channel_name', 'timestamp', 'last_updated', 'generated_summary',
+])
+
+def discover_csv_fields(data):
   """
-  Converts a list of dictionaries into a CSV file, handling nested dictionaries.
+  Collects the flattened column names of every document, keeping only the key set in memory.
 
-  :param data: List of dictionaries
-  :return: CSV file object
+  :param data: Iterable of dictionaries
+  :return: Sorted list of column names
   """
-  # Flatten each video's data and collect all unique fieldnames
-  flattened_data = [flatten_dict(video) for video in data]
   fieldnames = set()
-  for entry in flattened_data:
-      fieldnames.update(entry.keys())
+  for entry in data:
+      fieldnames.update(flatten_dict(entry).keys())
+  return sorted(fieldnames)
+
+def iter_csv_chunks(data, fieldnames, chunk_size=64 * 1024, compress=False):
+  """
+  Flattens dictionaries into CSV rows on the fly and yields the output in chunks.
+  Columns outside fieldnames are dropped and missing ones are left empty.
 
+  :param data: Iterable of dictionaries
+  :param fieldnames: The CSV columns
+  :param chunk_size: Approximate number of characters per yielded chunk
+  :param compress: Gzip the output
+  :return: A generator of str chunks, or bytes chunks when compressed
+  """
+  compressor = zlib.compressobj(wbits=31) if compress else None  # wbits=31 writes a gzip container
   output = io.StringIO()
-  # Use the unique fieldnames for all videos as the CSV headers
-  writer = csv.DictWriter(output, fieldnames=sorted(fieldnames))
+  writer = csv.DictWriter(output, fieldnames=fieldnames, extrasaction='ignore', restval='')
   writer.writeheader()
-  writer.writerows(flattened_data)
-  output.seek(0)
-  return output
 
+  def drain():
+      chunk = output.getvalue()
+      output.seek(0)
+      output.truncate()
+      return compressor.compress(chunk.encode('utf-8')) if compressor else chunk
+
+  for entry in data:
+      writer.writerow(flatten_dict(entry))
+      if output.tell() >= chunk_size:
+          chunk = drain()
+          if chunk:
+              yield chunk
+  chunk = drain()
+  if compressor:
+      chunk += compressor.flush()
+  if chunk:
+      yield chunk
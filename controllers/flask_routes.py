@@ -1,5 +1,9 @@
 # Flask and JSON imports
-from flask import jsonify, request
+import json
+import os
+import time
+import dateutil.parser
+from flask import jsonify, request, Response
 
 # Utility, services, and controllers imports
 from services.data_processing import embed_summaries_from_firestore, download_csv
@@ -7,20 +11,57 @@ from controllers.subprocess_controller import extract_youtube_ids
 from controllers.video_routes import upload_file, download_videos, process_extracted_videos
 from controllers.user_interaction_routes import index, query, upload_screen
 from utils.agents import agent_expander
-from services.pinecone import query_pinecone
-from utils.youtube_api import youtube_search
+from services.pinecone import query_pinecone, get_query_cache_stats, QUERY_MODES, SUBTOPIC_QUERY_MODE
+from services.jobs import get_job, DONE, FAILED
+from services.YTWatchTimeAnalysis import get_watch_time, get_period_range, get_recent_viewing_trends, get_daily_watch_time
+from utils.youtube_api import youtube_search, get_video_cache_stats, get_quota_status
+from utils.metrics import render_metrics
+from services.video_replica import get_video_replica
 from config.api_keys import yt_api_key
 
 # Configure logging
 import logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
+# A progress stream is closed after this long, or once its job has not changed for PROGRESS_STREAM_IDLE_SECONDS;
+# EventSource clients reconnect on their own and pick the job up where it is
+PROGRESS_STREAM_MAX_SECONDS = float(os.environ.get('PROGRESS_STREAM_MAX_SECONDS', 600))
+PROGRESS_STREAM_IDLE_SECONDS = float(os.environ.get('PROGRESS_STREAM_IDLE_SECONDS', 120))
+
 def get_progress():
     """
-    Endpoint to track and return the progress of processing.
+    Endpoint to return the current state and progress of a processing job.
+    """
+    job = get_job(request.args.get('job_id', ''))
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job)
+
+def stream_progress():
+    """
+    Server-Sent Events endpoint pushing a job's state whenever it changes, until it finishes
+    or the stream reaches PROGRESS_STREAM_MAX_SECONDS or PROGRESS_STREAM_IDLE_SECONDS.
     """
-    # Implement appropriate progress tracking here
-    return jsonify({'progress': 0})
+    job_id = request.args.get('job_id', '')
+    if get_job(job_id) is None:
+        return jsonify({'error': 'Unknown job'}), 404
+
+    def events():
+        started = last_change = time.monotonic()
+        last_update = None
+        while True:
+            job = get_job(job_id)
+            now = time.monotonic()
+            if job['updated_at'] != last_update:
+                last_update, last_change = job['updated_at'], now
+                yield f"data: {json.dumps(job)}\n\n"
+            if job['state'] in (DONE, FAILED):
+                return
+            if now - started >= PROGRESS_STREAM_MAX_SECONDS or now - last_change >= PROGRESS_STREAM_IDLE_SECONDS:
+                return
+            time.sleep(0.5)
+
+    return Response(events(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 def handle_agent_expander():
     """
@@ -39,15 +80,19 @@ def handle_agent_expander():
 def handle_query_pinecone():
     """
     Endpoint to query Pinecone for videos related to a given subtopic.
+    An optional `mode` selects vector, hybrid or keyword-only ranking.
     """
     data = request.json
     subtopic = data.get('subTopic')
+    mode = data.get('mode') or SUBTOPIC_QUERY_MODE
 
     if not subtopic:
         logging.warning("No subtopic provided in handle_query_pinecone")
         return jsonify({'error': 'No subtopic provided'}), 400
+    if mode not in QUERY_MODES:
+        return jsonify({'error': f"Unknown mode, expected one of {', '.join(QUERY_MODES)}"}), 400
 
-    video_titles = query_pinecone(subtopic)
+    video_titles = query_pinecone(subtopic, mode=mode)
     return jsonify({'results': video_titles})
 
 def search_youtube():
@@ -61,6 +106,66 @@ def search_youtube():
   videos = youtube_search(yt_api_key, subtopic, 3)
   return jsonify({'videos': videos})
 
+def video_cache_stats():
+    """
+    Endpoint to report how much the YouTube video metadata cache is saving.
+    """
+    return jsonify(get_video_cache_stats())
+
+def youtube_quota():
+    """
+    Endpoint reporting today's YouTube Data API quota spend and the budget left for search and ingestion.
+    """
+    return jsonify(get_quota_status())
+
+def video_replica_status():
+    """
+    Endpoint reporting the size and freshness of the local youtube_videos replica.
+    Consistency checks read the whole collection, so they are left to the background
+    repair and to `python -m services.video_replica --check [--repair]`.
+    """
+    return jsonify(get_video_replica().status())
+
+def metrics():
+    """
+    Endpoint exposing latency histograms, counters and queue depths in the Prometheus text format.
+    """
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+def query_cache_stats():
+    """
+    Endpoint to report hit rates and latency saved by the subtopic query caches.
+    """
+    return jsonify(get_query_cache_stats())
+
+def watch_time():
+    """
+    Endpoint returning total and average watch time, either for `period`
+    (today, this_week, this_month) or between ISO 8601 `start` and `end`.
+    The `daily=1` flag adds a per-day breakdown.
+    """
+    try:
+        if request.args.get('start') or request.args.get('end'):
+            start = dateutil.parser.isoparse(request.args['start'])
+            end = dateutil.parser.isoparse(request.args['end'])
+        else:
+            start, end = get_period_range(request.args.get('period', 'today'))
+    except (KeyError, ValueError) as e:
+        logging.warning(f"Invalid watch time range: {e}")
+        return jsonify({'error': 'Provide a valid period, or both start and end as ISO 8601 timestamps'}), 400
+
+    result = get_watch_time(start, end)
+    result.update({'start': start.isoformat(), 'end': end.isoformat()})
+    if request.args.get('daily') in ('1', 'true'):
+        result['daily'] = get_daily_watch_time(start.date(), end.date())
+    return jsonify(result)
+
+def watch_time_trends():
+    """
+    Endpoint returning total watch time for today, this week and this month.
+    """
+    return jsonify(get_recent_viewing_trends())
+
 
 def initialize_routes(app):
   app.add_url_rule('/', 'index', view_func=index, methods=['GET'])
@@ -69,6 +174,7 @@ def initialize_routes(app):
   app.add_url_rule('/upload', 'upload_file', view_func=upload_file, methods=['POST'])
   app.add_url_rule('/download', 'download_videos', view_func=download_videos)
   app.add_url_rule('/progress', 'get_progress', view_func=get_progress)
+  app.add_url_rule('/progress/stream', 'stream_progress', view_func=stream_progress)
   app.add_url_rule('/extract_youtube_ids', 'extract_youtube_ids', view_func=extract_youtube_ids, methods=['POST'])
   app.add_url_rule('/process_videos', 'process_extracted_videos', view_func=process_extracted_videos, methods=['POST'])
   app.add_url_rule('/embed_summaries_from_firestore', 'embed_summaries_from_firestore', view_func=embed_summaries_from_firestore, methods=['POST'])
@@ -76,6 +182,13 @@ def initialize_routes(app):
   app.add_url_rule('/query-subtopic', 'handle_query_pinecone', view_func=handle_query_pinecone, methods=['POST'])
   app.add_url_rule('/search_youtube', 'search_youtube', view_func=search_youtube, methods=['POST'])
   app.add_url_rule('/download_csv', 'download_csv', view_func=download_csv, methods=['GET'])
+  app.add_url_rule('/video_cache_stats', 'video_cache_stats', view_func=video_cache_stats, methods=['GET'])
+  app.add_url_rule('/youtube_quota', 'youtube_quota', view_func=youtube_quota, methods=['GET'])
+  app.add_url_rule('/video_replica', 'video_replica', view_func=video_replica_status, methods=['GET'])
+  app.add_url_rule('/metrics', 'metrics', view_func=metrics, methods=['GET'])
+  app.add_url_rule('/query_cache_stats', 'query_cache_stats', view_func=query_cache_stats, methods=['GET'])
+  app.add_url_rule('/watch_time', 'watch_time', view_func=watch_time, methods=['GET'])
+  app.add_url_rule('/watch_time/trends', 'watch_time_trends', view_func=watch_time_trends, methods=['GET'])
 
 
 
@@ -1,49 +1,194 @@
 import subprocess
 import logging
-import time
+import os
+import queue
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, contextmanager
 
-def extract_youtube_ids(cookies_content, debug=False):
+HISTORY_URL = 'https://www.youtube.com/feed/history'
+WINDOW_SIZE = int(os.environ.get('YT_DLP_WINDOW_SIZE', 200))  # History entries per yt-dlp run
+WINDOW_WORKERS = int(os.environ.get('YT_DLP_WINDOW_WORKERS', 4))  # yt-dlp runs in flight per request
+WINDOW_TIMEOUT = float(os.environ.get('YT_DLP_WINDOW_TIMEOUT', 120))  # Seconds before a run is killed
+# Extraction gives up after this many failed or timed out windows in a row (expired cookies, yt-dlp broken, ...)
+MAX_CONSECUTIVE_FAILURES = int(os.environ.get('YT_DLP_MAX_CONSECUTIVE_FAILURES', 3))
+
+@contextmanager
+def _cookie_file(cookies_content):
     """
-    Extracts YouTube video IDs from the user's watch history using yt-dlp.
-    :param cookies_content: The content of the cookies file.
-    :param debug: Enable detailed logging for debugging.
-    :return: A list of extracted YouTube video IDs.
+    Writes the cookies to a private temporary file that is removed afterwards, so
+    concurrent requests never share or overwrite each other's cookies.
     """
-    cookies_file_path = './www.youtube.com_cookies.txt'
-    logging.info("Starting extraction of YouTube IDs")
+    fd, path = tempfile.mkstemp(prefix='yt-cookies-', suffix='.txt')
+    try:
+        with os.fdopen(fd, 'w') as cookies_file:
+            cookies_file.write(cookies_content)
+        yield path
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
 
-    with open(cookies_file_path, 'w') as cookies_file:
-        cookies_file.write(cookies_content)
+def iter_window_ids(cookies_path, start, end, timeout=WINDOW_TIMEOUT, debug=False):
+    """
+    Runs yt-dlp over one window of the watch history and yields video IDs as yt-dlp prints them.
 
-    command = f"yt-dlp --cookies {cookies_file_path} --skip-download --playlist-start 1 --playlist-end 10 --get-id 'https://www.youtube.com/feed/history'"
+    :param cookies_path: Path of the cookies file.
+    :param start: First history entry (1-based, inclusive).
+    :param end: Last history entry (inclusive).
+    :param timeout: Seconds after which the run is killed.
+    :param debug: Enable detailed logging for debugging.
+    :return: A generator of video IDs.
+    :raises subprocess.TimeoutExpired: If the run timed out; the IDs read before that were already yielded.
+    :raises subprocess.CalledProcessError: If yt-dlp failed.
+    """
+    command = ['yt-dlp', '--cookies', cookies_path, '--skip-download', '--flat-playlist',
+               '--playlist-start', str(start), '--playlist-end', str(end), '--get-id', HISTORY_URL]
     if debug:
-        command += " --verbose"
-    logging.info(f"Running command: {command}")
+        command.append('--verbose')
+    logging.info(f"Running command: {' '.join(command)}")
 
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, bufsize=1)
+    # stderr is drained on its own thread so a chatty yt-dlp can never block on a full pipe
+    stderr_tail = deque(maxlen=20)
+    stderr_reader = threading.Thread(target=lambda: stderr_tail.extend(process.stderr), daemon=True)
+    stderr_reader.start()
+    timed_out = threading.Event()
+
+    def kill_on_timeout():
+        timed_out.set()
+        process.kill()
+
+    timer = threading.Timer(timeout, kill_on_timeout)
+    timer.start()
+    count = 0
     try:
-        process = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        start_time = time.time()
+        for line in process.stdout:
+            video_id = line.strip()
+            if video_id:
+                count += 1
+                yield video_id
+        process.wait()
+    finally:
+        timer.cancel()
+        if process.poll() is None:
+            process.kill()  # The consumer stopped early
+            process.wait()
+        stderr_reader.join(timeout=1)
+        logging.info(f"Extracted {count} IDs from history entries {start}-{end}")
+    if debug:
+        logging.info(f"yt-dlp stderr for entries {start}-{end}: {''.join(stderr_tail).strip()}")
+    if timed_out.is_set():
+        raise subprocess.TimeoutExpired(command, timeout)
+    if process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, command, stderr=''.join(stderr_tail))
 
-        while process.poll() is None:
-            if time.time() - start_time > 120:  # 120 seconds timeout
-                process.kill()
-                logging.error("yt-dlp command timed out")
-                return []
-            time.sleep(10)  # Sleep for 10 seconds before checking again
+def iter_youtube_ids(cookies_content, window_size=WINDOW_SIZE, workers=WINDOW_WORKERS, max_entries=None,
+                     timeout=WINDOW_TIMEOUT, debug=False, failures=None, max_consecutive_failures=MAX_CONSECUTIVE_FAILURES):
+    """
+    Extracts YouTube video IDs from the user's watch history, yielding each ID as soon as
+    yt-dlp prints it. The history is split into windows of window_size entries, and up to
+    workers windows are extracted in parallel until one comes back short (the end of the
+    history) or max_entries is reached. IDs of parallel windows arrive interleaved.
+    A window that fails or times out is skipped; after max_consecutive_failures failed
+    windows in a row extraction stops.
 
-        output, error = process.communicate()
+    :param cookies_content: The content of the cookies file.
+    :param window_size: Number of history entries per yt-dlp run.
+    :param workers: Number of windows extracted at the same time.
+    :param max_entries: Optional cap on the number of history entries read.
+    :param timeout: Per-window timeout in seconds.
+    :param debug: Enable detailed logging for debugging.
+    :param failures: Optional list extended in place with a message per failed window.
+    :param max_consecutive_failures: Failed windows in a row after which extraction stops.
+    :return: A generator of video IDs.
+    """
+    logging.info("Starting extraction of YouTube IDs")
+    failures = [] if failures is None else failures
+    results = queue.Queue(maxsize=1024)
+    lock = threading.Lock()
+    state = {'next_start': 1, 'end_of_history': False, 'stopped': False, 'consecutive_failures': 0}
+    done = object()
+
+    def next_window():
+        with lock:
+            start = state['next_start']
+            if state['end_of_history'] or state['stopped'] or (max_entries is not None and start > max_entries):
+                return None
+            end = start + window_size - 1 if max_entries is None else min(start + window_size - 1, max_entries)
+            state['next_start'] = end + 1
+            return start, end
 
-        if error:
-            logging.error(f"Error during extraction: {error}")
-            return []
+    def window_failed(message):
+        logging.error(message)
+        with lock:
+            failures.append(message)
+            state['consecutive_failures'] += 1
+            if state['consecutive_failures'] >= max_consecutive_failures and not state['stopped']:
+                logging.error(f"Stopping extraction after {state['consecutive_failures']} failed yt-dlp runs in a row")
+                state['stopped'] = True
 
-        video_ids = [line.strip() for line in output.split('\n') if line.strip()]
-        if debug:
-            logging.info(f"Raw output: {output}")
+    def work(cookies_path):
+        try:
+            while (window := next_window()) is not None:
+                start, end = window
+                count = 0
+                try:
+                    with closing(iter_window_ids(cookies_path, start, end, timeout=timeout, debug=debug)) as window_ids:
+                        for video_id in window_ids:
+                            count += 1
+                            results.put(video_id)
+                            if state['stopped']:
+                                return
+                except subprocess.TimeoutExpired:
+                    # The window is incomplete, not the end of the history
+                    window_failed(f"yt-dlp timed out after {timeout}s on entries {start}-{end} with {count} IDs read")
+                    continue
+                except subprocess.CalledProcessError as e:
+                    window_failed(f"yt-dlp exited with {e.returncode} on entries {start}-{end}: {e.stderr.strip()}")
+                    continue
+                with lock:
+                    state['consecutive_failures'] = 0
+                    if count < end - start + 1:
+                        state['end_of_history'] = True
+        except Exception as e:
+            logging.error(f"Exception occurred during YouTube ID extraction: {e}", exc_info=True)
+        finally:
+            results.put(done)
 
-        logging.info(f"Extraction complete. Extracted {len(video_ids)} IDs.")
-        return video_ids
+    with _cookie_file(cookies_content) as cookies_path, ThreadPoolExecutor(max_workers=workers) as executor:
+        for _ in range(workers):
+            executor.submit(work, cookies_path)
+        running = workers
+        total = 0
+        try:
+            while running:
+                video_id = results.get()
+                if video_id is done:
+                    running -= 1
+                    continue
+                total += 1
+                yield video_id
+        finally:
+            # Let the workers finish their current window if the consumer stopped early
+            state['stopped'] = True
+            while running:
+                if results.get() is done:
+                    running -= 1
+        logging.info(f"Extraction complete. Extracted {total} IDs.")
 
+def extract_youtube_ids(cookies_content, debug=False):
+    """
+    Extracts YouTube video IDs from the user's watch history using yt-dlp.
+    :param cookies_content: The content of the cookies file.
+    :param debug: Enable detailed logging for debugging.
+    :return: A list of extracted YouTube video IDs.
+    """
+    try:
+        return list(iter_youtube_ids(cookies_content, debug=debug))
     except Exception as e:
         logging.error(f"Exception occurred during YouTube ID extraction: {str(e)}", exc_info=True)
         return []
@@ -4,20 +4,76 @@ import logging
 import datetime
 
 # Third-party imports
-from flask import request, jsonify, send_file, session
+from flask import request, jsonify, session, Response
+import dateutil.parser
 
 # Local imports
-from utils.html_parser import parse_html  # Assuming parse_html is in utils
-from services.data_processing import process_videos, get_all_videos
-from controllers.subprocess_controller import extract_youtube_ids
+from utils.html_parser import iter_parse_html
+from services.data_processing import process_videos, DEFAULT_USER_ID
+from services.video_replica import iter_videos
+from services.jobs import submit_job
+from controllers.subprocess_controller import extract_youtube_ids, iter_youtube_ids
 from models.firestore_encoder import FirestoreEncoder
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
+def _process_upload(video_data_list, filename, user_id, progress):
+    """
+    Background job body for an upload: runs the videos through the ingestion pipeline.
+    """
+    ingest_counts = {}
+    processed_data, percent = process_videos(video_data_list, on_progress=progress, stage_counts=progress.stage_counts,
+                                             user_id=user_id, ingest_counts=ingest_counts)
+    logging.info(f"File {filename} processed successfully with {len(processed_data)} videos")
+    return {'total_videos': len(processed_data), 'progress': percent, **ingest_counts}
+
+# Extracted IDs are handed to the pipeline in chunks of this size while extraction continues
+EXTRACTION_CHUNK_SIZE = 50
+
+def _process_extraction(cookies_content, filename, user_id, progress):
+    """
+    Background job body for a cookies upload: streams the watch history out of yt-dlp and
+    runs each chunk of IDs through the ingestion pipeline as soon as it is extracted.
+    """
+    result = {'total_videos': 0, 'extracted': 0, 'new': 0, 'refreshed': 0, 'skipped': 0}
+    chunk = []
+    failures = []
+
+    def flush():
+        # Timestamps are not part of yt-dlp's output, so each chunk is stamped when it is processed
+        current_timestamp = datetime.datetime.now(datetime.timezone.utc)
+        ingest_counts, stage_counts = {}, {}
+        processed_data, _ = process_videos([{'video_id': video_id, 'timestamp': current_timestamp} for video_id in chunk],
+                                           stage_counts=stage_counts, user_id=user_id, ingest_counts=ingest_counts,
+                                           watch_timestamps=False)
+        result['total_videos'] += len(processed_data)
+        for name, count in ingest_counts.items():
+            result[name] += count
+        for name, count in stage_counts.items():
+            progress.stage_counts[name] = progress.stage_counts.get(name, 0) + count
+        chunk.clear()
+        progress(result['new'] + result['refreshed'] + result['skipped'], result['extracted'])
+
+    for video_id in iter_youtube_ids(cookies_content, failures=failures):
+        result['extracted'] += 1
+        chunk.append(video_id)
+        if len(chunk) >= EXTRACTION_CHUNK_SIZE:
+            flush()
+    if chunk:
+        flush()
+    if failures:
+        if not result['extracted']:
+            # Nothing came out of yt-dlp at all: fail the job with the reason, typically expired cookies
+            raise RuntimeError(f"yt-dlp failed: {failures[-1]}")
+        result['failed_windows'] = failures
+    logging.info(f"File {filename} processed successfully with {result['total_videos']} videos")
+    return result
+
 def upload_file():
     """
-    Handles the file upload request, processes the content, and returns the results.
+    Handles the file upload request, parses the content and queues it for processing.
+    Returns a job ID whose progress can be followed on /progress and /progress/stream.
     """
     logging.info("Received a request to upload a file")
 
@@ -33,51 +89,83 @@ def upload_file():
     filename = file_part.filename
     file_extension = filename.rsplit('.', 1)[1].lower()
 
+    video_data_list = []
     try:
-        file_content = file_part.read().decode('utf-8')
+        if file_extension == 'html':
+            # Parse the upload straight from its stream; only the extracted records are kept
+            video_data_list = list(iter_parse_html(file_part.stream))
+        elif file_extension == 'txt':
+            # Cookie files are small, so they are read whole; the history is extracted by the job
+            cookies_content = file_part.read().decode('utf-8')
+            job_id = submit_job('extract', _process_extraction, 0, cookies_content, filename,
+                                session.get('user_id', DEFAULT_USER_ID))
+            return jsonify({'message': 'Cookies uploaded, extracting watch history', 'job_id': job_id}), 202
     except UnicodeDecodeError as e:
         logging.error(f"Unable to decode the file: {e}", exc_info=True)
         return jsonify({'error': 'Unable to decode the file. Ensure it is UTF-8 encoded.'}), 400
 
-    video_data_list = []
-    if file_extension == 'html':
-        video_data_list = parse_html(file_content)
-    elif file_extension == 'txt':
-      video_id_list = extract_youtube_ids(file_content)
-      # Temporary fix: Assigning the current timestamp to each video ID.
-      # This should be replaced with the appropriate timestamp logic as per the application's requirement.
-      current_timestamp = datetime.datetime.now(datetime.timezone.utc)
-      video_data_list = [{'video_id': video_id, 'timestamp': current_timestamp} for video_id in video_id_list]
-
     if not video_data_list:
         logging.info("No video IDs found in the file")
         return jsonify({'message': 'No video IDs found in the file'}), 200
 
-    processed_data, progress = process_videos(video_data_list)
-    logging.info(f"File {filename} processed successfully with {len(processed_data)} videos")
+    job_id = submit_job('upload', _process_upload, len(video_data_list), video_data_list, filename,
+                        session.get('user_id', DEFAULT_USER_ID))
 
     return jsonify({
-        'message': 'File uploaded and processed successfully',
-        'total_videos': len(processed_data),
-        'progress': progress
-    }), 200
+        'message': 'File uploaded and queued for processing',
+        'job_id': job_id,
+        'total_videos': len(video_data_list)
+    }), 202
+
+def _iter_json_chunks(videos, ndjson=False, chunk_size=64 * 1024):
+    """
+    Encodes videos one at a time as {video_id: video_data} entries of a JSON array, or as
+    NDJSON lines, and yields the encoded text in chunks of about chunk_size characters.
+    """
+    buffer = [] if ndjson else ['[']
+    buffered = 0
+    first = True
+    for video in videos:
+        encoded = json.dumps({video['video_id']: video}, cls=FirestoreEncoder, ensure_ascii=False)
+        if ndjson:
+            buffer.append(encoded + '\n')
+        else:
+            buffer.append(encoded if first else ',\n' + encoded)
+        first = False
+        buffered += len(encoded)
+        if buffered >= chunk_size:
+            yield ''.join(buffer)
+            buffer, buffered = [], 0
+    if not ndjson:
+        buffer.append(']')
+    if buffer:
+        yield ''.join(buffer)
 
 def download_videos():
     """
-    Downloads video data as a JSON file.
+    Streams video data as a JSON array, or as NDJSON with `?format=ndjson`.
+
+    `?fields=snippet.title,generated.summary` limits the returned fields, and
+    `?since=<ISO 8601 timestamp>` only returns videos updated after that time.
     """
-    try:
-        video_data = get_all_videos()
-        filename = 'video_data.json'
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(video_data, f, cls=FirestoreEncoder, ensure_ascii=False, indent=4)
-        return send_file(filename, as_attachment=True)
-    except FileNotFoundError as e:
-        logging.error(f"File not found error: {e}", exc_info=True)
-        return jsonify({'error': 'File not found error'}), 500
-    except json.JSONEncodeError as e:
-        logging.error(f"JSON encoding error: {e}", exc_info=True)
-        return jsonify({'error': 'JSON encoding error'}), 500
+    ndjson = request.args.get('format', 'json') == 'ndjson'
+    fields = [field.strip() for field in request.args.get('fields', '').split(',') if field.strip()]
+    since = request.args.get('since')
+    if since:
+        try:
+            since = dateutil.parser.isoparse(since)
+        except ValueError:
+            logging.warning(f"Invalid since parameter for download: {since}")
+            return jsonify({'error': 'Invalid since timestamp. Use ISO 8601.'}), 400
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=datetime.timezone.utc)
+
+    videos = iter_videos(fields=fields or None, since=since or None)
+    filename = 'video_data.ndjson' if ndjson else 'video_data.json'
+    return Response(
+        _iter_json_chunks(videos, ndjson=ndjson),
+        mimetype='application/x-ndjson' if ndjson else 'application/json',
+        headers={"Content-disposition": f"attachment; filename={filename}"})
 
 def process_extracted_videos():
     """
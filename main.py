@@ -1,7 +1,12 @@
+import os
+
 from flask import Flask
 from flask_session import Session
 from flask_cors import CORS
 from controllers.flask_routes import initialize_routes
+from services.registry import warm_up_services
+from services.video_replica import start_background_sync
+from services.keyword_index import start_background_backfill
 
 app = Flask(__name__)
 app.secret_key = '2030'
@@ -11,5 +16,22 @@ Session(app)
 
 initialize_routes(app)
 
+# The replica starts syncing on its first read, which Firestore serves until the sync is done;
+# REPLICA_SYNC_AT_STARTUP=1 starts that sync on a background thread at startup instead.
+if os.environ.get('REPLICA_SYNC_AT_STARTUP', '0') not in ('0', 'false'):
+    start_background_sync()
+
+# Deployments that stored videos before the keyword index existed fill it once with
+# `python -m services.keyword_index --backfill`; KEYWORD_BACKFILL_AT_STARTUP=1 does it
+# on a background thread at startup instead, when the index is empty.
+if os.environ.get('KEYWORD_BACKFILL_AT_STARTUP', '0') not in ('0', 'false'):
+    start_background_backfill()
+
+# Services are created on first use; WARM_UP_SERVICES=all (or a comma separated list
+# such as firestore,youtube) initializes them on a background thread at startup instead.
+warm_up = os.environ.get('WARM_UP_SERVICES', '')
+if warm_up:
+    warm_up_services(None if warm_up == 'all' else warm_up.split(','))
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -1,65 +1,275 @@
 import datetime
-import isodate
+import logging
+import os
+import sqlite3
+import threading
 
-# Assuming a function to fetch data from your data source
-def fetch_watch_data(start_date, end_date):
+import numpy as np
+
+SECONDS_PER_DAY = 86400
+WATCH_EVENTS_PATH = os.environ.get('WATCH_EVENTS_PATH', '.cache/watch_events.sqlite3')
+
+def _to_epoch_seconds(timestamp):
     """
-    Fetches watch data from the data source between specified dates.
+    Converts a datetime (naive values are taken as UTC) to integer epoch seconds.
     """
-    # Replace with actual logic to fetch data from your database or data source
-    return [
-        {'video_id': 'video1', 'watch_duration': 'PT30M', 'timestamp': datetime.datetime(2024, 1, 1, 12, 0)},  
-        # ... more data
-    ]
+    if timestamp is None:
+        return None
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=datetime.timezone.utc)
+    return int(timestamp.timestamp())
 
-def retrieve_total_watch_time(period='today'):
+class WatchTimeEngine:
     """
-    Retrieves total watch time data for a specified period.
+    Columnar store of watch events. Events are kept as timestamp-sorted NumPy arrays
+    with prefix sums over event durations and over per-day totals, so the total or
+    average watch time of any range is two binary searches and a subtraction.
+    New events are buffered and merged in on the next query.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._times = np.empty(0, dtype=np.int64)
+        self._durations = np.empty(0, dtype=np.float64)
+        self._cumulative = np.zeros(1)  # _cumulative[i] = total duration of the first i events
+        self._days = np.empty(0, dtype=np.int64)  # Distinct UTC days (days since epoch) with events
+        self._day_cumulative = np.zeros(1)
+        self._pending = []
+        self._seen = set()  # (video_id, epoch seconds) of every event, so re-uploads are not counted twice
+
+    def add_events(self, events):
+        """
+        Adds watch events. Events without a timestamp or duration, and events already added, are ignored.
+
+        :param events: Iterable of dictionaries with video_id, timestamp and duration_in_seconds.
+        :return: Number of events added.
+        """
+        added = 0
+        with self._lock:
+            for event in events:
+                seconds = _to_epoch_seconds(event.get('timestamp'))
+                duration = event.get('duration_in_seconds')
+                key = (event.get('video_id'), seconds)
+                if seconds is None or duration is None or key in self._seen:
+                    continue
+                self._seen.add(key)
+                self._pending.append((seconds, float(duration)))
+                added += 1
+        return added
+
+    def _merge_pending(self):
+        if not self._pending:
+            return
+        self._pending.sort()
+        new_times, new_durations = (np.array(column) for column in zip(*self._pending))
+        self._pending = []
+        # Both sides are sorted, so the new events are inserted at their positions instead of re-sorting everything
+        positions = np.searchsorted(self._times, new_times, side='right')
+        self._times = np.insert(self._times, positions, new_times.astype(np.int64))
+        self._durations = np.insert(self._durations, positions, new_durations.astype(np.float64))
+        self._cumulative = np.concatenate([[0.0], np.cumsum(self._durations)])
+
+        days = self._times // SECONDS_PER_DAY
+        first_index = np.concatenate([[0], np.flatnonzero(np.diff(days)) + 1])
+        self._days = days[first_index]
+        self._day_cumulative = np.concatenate([[0.0], np.cumsum(np.add.reduceat(self._durations, first_index))])
+
+    def summarize(self, start, end):
+        """
+        Returns watch time over [start, end).
+
+        :param start: Start datetime (inclusive).
+        :param end: End datetime (exclusive).
+        :return: Dictionary with total_seconds, average_seconds and count.
+        """
+        with self._lock:
+            self._merge_pending()
+            lo = np.searchsorted(self._times, _to_epoch_seconds(start), side='left')
+            hi = np.searchsorted(self._times, _to_epoch_seconds(end), side='left')
+            total = float(self._cumulative[hi] - self._cumulative[lo])
+        count = int(hi - lo)
+        return {'total_seconds': total, 'average_seconds': total / count if count else 0, 'count': count}
+
+    def daily_totals(self, start_date, end_date):
+        """
+        Returns the watch time of every day with events between two dates.
+
+        :param start_date: First date (inclusive).
+        :param end_date: Last date (inclusive).
+        :return: List of dictionaries with date and total_seconds.
+        """
+        epoch = datetime.date(1970, 1, 1)
+        with self._lock:
+            self._merge_pending()
+            lo = np.searchsorted(self._days, (start_date - epoch).days, side='left')
+            hi = np.searchsorted(self._days, (end_date - epoch).days, side='right')
+            totals = np.diff(self._day_cumulative[lo:hi + 1])
+            days = self._days[lo:hi]
+        return [{'date': (epoch + datetime.timedelta(days=int(day))).isoformat(), 'total_seconds': float(total)}
+                for day, total in zip(days, totals)]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._times) + len(self._pending)
+
+class WatchEventStore:
+    """
+    Every ingested watch event, one row per (video ID, timestamp), persisted in SQLite.
+    youtube_videos keeps a single timestamp per video, so this is where repeat watches
+    of the same video survive a restart.
     """
-    end_date = datetime.datetime.now()
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute("CREATE TABLE IF NOT EXISTS watch_events (video_id TEXT, timestamp INTEGER, "
+                               "duration_in_seconds REAL NOT NULL, PRIMARY KEY (video_id, timestamp))")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS state (name TEXT PRIMARY KEY, value TEXT)")
+            self._conn.commit()
+        return self._conn
+
+    def add(self, events):
+        """
+        Stores watch events; events without a timestamp or duration, and events already stored, are ignored.
+
+        :param events: Iterable of dictionaries with video_id, timestamp and duration_in_seconds.
+        """
+        rows = [(event.get('video_id'), _to_epoch_seconds(event.get('timestamp')), float(event['duration_in_seconds']))
+                for event in events if event.get('timestamp') is not None and event.get('duration_in_seconds') is not None]
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany("INSERT OR IGNORE INTO watch_events VALUES (?, ?, ?)", rows)
+
+    def events(self, after_row=0):
+        """
+        Returns the watch events stored after a row. Rows are numbered in the order they were
+        committed, by any process, so passing the last row back reads only what is new.
+
+        :param after_row: Last row already read; 0 reads every event.
+        :return: Tuple of (list of dictionaries with video_id, timestamp and duration_in_seconds, last row read).
+        """
+        with self._lock:
+            rows = self._connection().execute("SELECT rowid, video_id, timestamp, duration_in_seconds FROM watch_events "
+                                              "WHERE rowid > ? ORDER BY rowid", (after_row,)).fetchall()
+        events = [{'video_id': video_id, 'timestamp': datetime.datetime.fromtimestamp(seconds, datetime.timezone.utc),
+                   'duration_in_seconds': duration} for _, video_id, seconds, duration in rows]
+        return events, rows[-1][0] if rows else after_row
+
+    def is_seeded(self):
+        with self._lock:
+            return self._connection().execute("SELECT 1 FROM state WHERE name = 'seeded'").fetchone() is not None
+
+    def mark_seeded(self):
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO state VALUES ('seeded', ?)", (datetime.datetime.now(datetime.timezone.utc).isoformat(),))
+
+watch_time_engine = WatchTimeEngine()
+watch_event_store = WatchEventStore(WATCH_EVENTS_PATH)
+_seeded = threading.Event()
+_load_lock = threading.Lock()
+_loaded_row = 0  # Last watch event store row the engine has, guarded by _load_lock
+
+def _ensure_loaded():
+    """
+    Brings the engine up to date with the watch event store before a query. The store is
+    shared by every worker process, so this is how events ingested by another worker
+    reach this one; each call only reads the rows added since the previous call.
+    A store that was never seeded first gets one event per stored video, the last watch
+    youtube_videos knows of; repeat watches are only known from the uploads since.
+    """
+    global _loaded_row
+    with _load_lock:
+        if not _seeded.is_set():
+            try:
+                if not watch_event_store.is_seeded():
+                    from services.video_replica import iter_videos
+                    watch_event_store.add(iter_videos(fields=['timestamp', 'duration_in_seconds']))
+                    watch_event_store.mark_seeded()
+            except Exception as e:
+                logging.error(f"Failed to seed watch events from the stored videos: {e}", exc_info=True)
+            _seeded.set()
+        try:
+            events, _loaded_row = watch_event_store.events(after_row=_loaded_row)
+            added = watch_time_engine.add_events(events)
+            if added:
+                logging.info(f"Loaded {added} watch events from the watch event store")
+        except Exception as e:
+            logging.error(f"Failed to load watch events: {e}", exc_info=True)
+
+def record_watch_events(events):
+    """
+    Adds freshly ingested watch events to the event store, from which every worker's
+    engine picks them up on its next query. If the store cannot be written, they are
+    added to this process's engine only.
+
+    :param events: Iterable of dictionaries with video_id, timestamp and duration_in_seconds.
+    """
+    events = list(events)
+    try:
+        watch_event_store.add(events)
+    except sqlite3.Error as e:
+        logging.error(f"Failed to store {len(events)} watch events: {e}", exc_info=True)
+        watch_time_engine.add_events(events)
+    logging.info(f"Recorded {len(events)} watch events")
+
+def get_period_range(period='today', now=None):
+    """
+    Returns the [start, end) datetimes of a named period, in UTC.
+    """
+    end_date = now or datetime.datetime.now(datetime.timezone.utc)
     if period == 'today':
         start_date = end_date.replace(hour=0, minute=0, second=0, microsecond=0)
     elif period == 'this_week':
-        start_date = end_date - datetime.timedelta(days=end_date.weekday())
+        start_date = (end_date - datetime.timedelta(days=end_date.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
     elif period == 'this_month':
-        start_date = end_date.replace(day=1)
+        start_date = end_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
     else:
         raise ValueError("Invalid period specified")
+    return start_date, end_date + datetime.timedelta(microseconds=1)
 
-    watch_data = fetch_watch_data(start_date, end_date)
-    total_watch_time = sum(isodate.parse_duration(item['watch_duration']).total_seconds() for item in watch_data)
-    return total_watch_time
+def get_watch_time(start_date, end_date):
+    """
+    Retrieves total and average watch time between two datetimes.
+    """
+    _ensure_loaded()
+    return watch_time_engine.summarize(start_date, end_date)
+
+def retrieve_total_watch_time(period='today'):
+    """
+    Retrieves total watch time data for a specified period.
+    """
+    return get_watch_time(*get_period_range(period))['total_seconds']
 
 def calculate_average_watch_duration(period='today'):
     """
     Calculates the average watch duration for a specified period.
     """
-    watch_data = fetch_watch_data(period)
-    if not watch_data:
-        return 0
-    total_duration = sum(isodate.parse_duration(item['watch_duration']).total_seconds() for item in watch_data)
-    average_duration = total_duration / len(watch_data)
-    return average_duration
+    return get_watch_time(*get_period_range(period))['average_seconds']
 
 def get_recent_viewing_trends():
     """
     Provides data for recent viewing trends.
     """
-    today_watch_time = retrieve_total_watch_time('today')
-    week_watch_time = retrieve_total_watch_time('this_week')
-    month_watch_time = retrieve_total_watch_time('this_month')
-
     return {
-        'today': today_watch_time,
-        'this_week': week_watch_time,
-        'this_month': month_watch_time
+        'today': retrieve_total_watch_time('today'),
+        'this_week': retrieve_total_watch_time('this_week'),
+        'this_month': retrieve_total_watch_time('this_month')
     }
 
-# Example usage
-total_watch_time_today = retrieve_total_watch_time('today')
-average_watch_duration_today = calculate_average_watch_duration('today')
-recent_trends = get_recent_viewing_trends()
-
-print("Total Watch Time Today:", total_watch_time_today)
-print("Average Watch Duration Today:", average_watch_duration_today)
-print("Recent Viewing Trends:", recent_trends)
+def get_daily_watch_time(start_date, end_date):
+    """
+    Provides the watch time of each day between two dates.
+    """
+    _ensure_loaded()
+    return watch_time_engine.daily_totals(start_date, end_date)
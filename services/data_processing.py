@@ -1,50 +1,105 @@
 # Standard library imports
 import datetime
 import logging
+import os
 
 # Third-party imports
 import dateutil.parser
 import isodate
-import openai
-from flask import jsonify, Response
+from flask import jsonify, request, Response
 
 # Local imports
-from langchain.vectorstores import Pinecone
-from langchain.embeddings.openai import OpenAIEmbeddings
-from utils.agents import agent_summarizer
-from utils.youtube_api import get_category_name, get_youtube_video_details
+from utils.agents import agent_summarizer, agent_summarizer_batch, get_summary_stats, get_embedding_client
+from services.pipeline import Stage, run_pipeline
+from services.YTWatchTimeAnalysis import record_watch_events
+from services.keyword_index import get_keyword_index
+from services.video_replica import iter_videos, request_sync
+from services.vector_store import get_vector_store, UPSERT_BATCH_SIZE, UPSERT_POOL_THREADS
+from utils.description_cleaner import clean_descriptions
+from utils.metrics import errors_total, embedding_request_seconds, embedded_texts_total, vector_upsert_seconds
+from utils.youtube_api import get_category_names, get_youtube_videos_details
 from config.api_keys import yt_api_key
-from controllers.firestore_controller import get_all_videos_from_firestore, db, create_csv_from_data
+from controllers.firestore_controller import (
+    get_db, FirestoreBulkWriter, VIDEO_CSV_FIELDS, discover_csv_fields, iter_csv_chunks,
+    get_stored_videos, get_ingest_watermark, set_ingest_watermark
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
 def download_csv():
+  """
+  Streams every stored video as CSV from the local replica, paging so memory stays flat.
+  Query parameters: `schema=discover` derives the columns from a first pass over the collection
+  instead of the declared VIDEO_CSV_FIELDS, and `gzip=1` compresses the response.
+
+  The first chunk is built before the response starts, so a replica or Firestore failure
+  still returns a 500. A failure after that is logged and aborts the transfer, so the client
+  sees an incomplete download rather than a CSV that looks complete.
+  """
   try:
-      data = get_all_videos_from_firestore()
-      csv_file = create_csv_from_data(data)
-      return Response(
-          csv_file.getvalue(),
-          mimetype='text/csv',
-          headers={"Content-disposition": "attachment; filename=firestore_data.csv"})
+      if request.args.get('schema') == 'discover':
+          fieldnames = discover_csv_fields(iter_videos())
+      else:
+          fieldnames = VIDEO_CSV_FIELDS
+      compress = request.args.get('gzip') in ('1', 'true')
+      chunks = iter_csv_chunks(iter_videos(), fieldnames, compress=compress)
+      first_chunk = next(chunks, None)
+      filename = "firestore_data.csv.gz" if compress else "firestore_data.csv"
   except Exception as e:
+      errors_total.inc(service='csv', stage='start')
+      logging.error(f"Failed to start the CSV download: {e}", exc_info=True)
       return {"error": str(e)}, 500
 
+  def stream():
+      sent = 0
+      try:
+          if first_chunk is not None:
+              yield first_chunk
+              sent += 1
+          for chunk in chunks:
+              yield chunk
+              sent += 1
+      except Exception as e:
+          errors_total.inc(service='csv', stage='stream')
+          logging.error(f"CSV download failed after {sent} chunks, aborting the response: {e}", exc_info=True)
+          raise
+
+  return Response(
+      stream(),
+      mimetype='application/gzip' if compress else 'text/csv',
+      headers={"Content-disposition": f"attachment; filename={filename}"})
+
 
-def process_video_data(video_id, video_details, timestamp):
+def get_duration_in_seconds(video_details):
+  """
+  Parses the ISO 8601 duration of a video.
+
+  :param video_details: Dictionary containing details of the video.
+  :return: Duration in seconds, or None if unknown.
+  """
+  duration = isodate.parse_duration(video_details.get('contentDetails', {}).get('duration', '')) if video_details.get('contentDetails', {}).get('duration') else None
+  return duration.total_seconds() if duration else None
+
+
+def process_video_data(video_id, video_details, timestamp, category_name=None, summary=None, writer=None):
   """
   Extracts video data and stores it in Firebase Firestore.
 
   :param video_id: The YouTube video ID.
   :param video_details: Dictionary containing details of the video.
   :param timestamp: The timestamp when the video data was processed.
+  :param category_name: Resolved name of the video's category, if known.
+  :param summary: Already generated summary of the description; generated here when omitted.
+  :param writer: Optional FirestoreBulkWriter to queue the write on instead of writing immediately.
   """
   try:
       # Parsing and formatting snippet data
       snippet = video_details.get('snippet', {})
       published_at = dateutil.parser.parse(snippet.get('publishedAt', '')) if snippet.get('publishedAt') else None
-      duration = isodate.parse_duration(video_details.get('contentDetails', {}).get('duration', '')) if video_details.get('contentDetails', {}).get('duration') else None
-      duration_in_seconds = duration.total_seconds() if duration else None
+      duration_in_seconds = get_duration_in_seconds(video_details)
+      if summary is None:
+          summary = agent_summarizer(snippet.get('description', ''))
 
       # Formatting video data for Firestore
       video_data = {
@@ -68,110 +123,363 @@ def process_video_data(video_id, video_details, timestamp):
           'contentDetails': video_details.get('contentDetails', {}),
           'statistics': video_details.get('statistics', {}),
           'duration_in_seconds': duration_in_seconds,
+          'category_name': category_name or 'Unknown',
+          'channel_name': snippet.get('channelTitle', '') or 'Unknown',
           'timestamp': timestamp,
           'last_updated': datetime.datetime.now(datetime.timezone.utc),
           'generated': {
-              'summary': agent_summarizer(snippet.get('description', '')),
+              'summary': summary,
           }
       }
 
       # Store video data in Firestore
-      db.collection('youtube_videos').document(video_id).set(video_data)
-      logging.info(f"Data processed and inserted successfully for video ID {video_id} into Firestore.")
+      if writer:
+          writer.set(video_id, video_data)
+          logging.info(f"Data processed and queued for video ID {video_id} for Firestore.")
+      else:
+          get_db().collection('youtube_videos').document(video_id).set(video_data)
+          logging.info(f"Data processed and inserted successfully for video ID {video_id} into Firestore.")
   except Exception as e:
       logging.error(f"Failed to insert data into Firestore for video ID {video_id}: {e}", exc_info=True)
 
 
-def process_videos(video_data_list):
+# Embedding batching
+EMBED_BATCH_MAX_ITEMS = 128
+EMBED_BATCH_MAX_TOKENS = 100000  # Well below the embeddings endpoint's per-request token limit
+
+
+def _estimate_tokens(text):
+  # Roughly four characters per token for English text
+  return len(text) // 4 + 1
+
+
+def _is_valid_embedding(embedded_summary):
+  return isinstance(embedded_summary, list) and all(isinstance(item, float) for item in embedded_summary)
+
+
+def embed_texts(embedding, texts, max_items=EMBED_BATCH_MAX_ITEMS, max_tokens=EMBED_BATCH_MAX_TOKENS):
   """
-  Processes a list of video data and embeds summaries into Pinecone.
-  
+  Embeds texts with embed_documents in batches bounded by item count and estimated tokens.
+  If a batch fails, its texts are retried one at a time.
+
+  :param embedding: An OpenAIEmbeddings instance.
+  :param texts: List of strings to embed.
+  :param max_items: Maximum number of texts per request.
+  :param max_tokens: Maximum estimated tokens per request.
+  :return: List of embeddings aligned with texts; None where embedding failed.
+  """
+  vectors = [None] * len(texts)
+
+  def flush(batch):
+      embedded_texts_total.inc(len(batch), caller='documents')
+      try:
+          with embedding_request_seconds.time(caller='documents'):
+              embedded_batch = embedding.embed_documents([texts[position] for position in batch])
+          for position, embedded in zip(batch, embedded_batch):
+              vectors[position] = embedded
+      except Exception as e:
+          errors_total.inc(service='embeddings', stage='batch')
+          logging.warning(f"Batch embedding of {len(batch)} texts failed, retrying one by one: {e}")
+          for position in batch:
+              try:
+                  with embedding_request_seconds.time(caller='documents'):
+                      vectors[position] = embedding.embed_query(texts[position])
+              except Exception as e:
+                  errors_total.inc(service='embeddings', stage='single')
+                  logging.error(f"Error embedding text {position}: {e}")
+
+  batch, batch_tokens = [], 0
+  for position, text in enumerate(texts):
+      tokens = _estimate_tokens(text)
+      if batch and (len(batch) >= max_items or batch_tokens + tokens > max_tokens):
+          flush(batch)
+          batch, batch_tokens = [], 0
+      batch.append(position)
+      batch_tokens += tokens
+  if batch:
+      flush(batch)
+  return vectors
+
+
+# Worker threads per ingestion stage; every stage is bound by remote latency
+STAGE_WORKERS = {'summarize': 4, 'store': 4, 'embed': 2, 'upsert': 1}
+# Items buffered per call by the batching stages
+STAGE_BATCH_SIZES = {'summarize': 32, 'embed': EMBED_BATCH_MAX_ITEMS, 'upsert': UPSERT_BATCH_SIZE * UPSERT_POOL_THREADS}
+STAGE_QUEUE_SIZE = 512
+
+# Incremental ingestion: stored videos are only re-processed once their last_updated is this old
+INCREMENTAL_INGEST = os.environ.get('INCREMENTAL_INGEST', '1') not in ('0', 'false')
+STALE_AFTER_DAYS = float(os.environ.get('STALE_AFTER_DAYS', 30))
+DEFAULT_USER_ID = 'default'
+
+
+def _as_utc(timestamp):
+  # Naive timestamps are taken as UTC so they compare with the timezone-aware ones Firestore returns
+  if timestamp is None or timestamp.tzinfo is not None:
+      return timestamp
+  return timestamp.replace(tzinfo=datetime.timezone.utc)
+
+
+def plan_incremental_ingest(video_data_list, user_id=DEFAULT_USER_ID, stale_after_days=STALE_AFTER_DAYS):
+  """
+  Decides which videos of an upload need the full ingestion pipeline.
+
+  Every ID of the upload is looked up with batched reads, so only videos confirmed to be
+  stored are skipped, and those stored more than stale_after_days ago are refreshed.
+  The user's watermark is returned alongside: watch events at or before it were already
+  recorded by an earlier upload.
+
   :param video_data_list: A list of video data.
-  :return: Tuple containing the processed data and progress percentage.
+  :param user_id: The user the upload belongs to.
+  :param stale_after_days: Age after which a stored video is refreshed; None never refreshes.
+  :return: Tuple of (statuses, stored, watermark) where statuses maps video ID -> 'new', 'refresh' or 'skip',
+           stored maps the stored video IDs to their last_updated and duration, and watermark is the
+           newest watch timestamp ingested for the user, or None.
   """
-  processed_data = []
-  progress = 0
-  embedding = OpenAIEmbeddings(openai_api_key=openai.api_key)
-  index_name = "learning-objectives"
-  pinecone_index = Pinecone.get_pinecone_index(index_name=index_name, pool_threads=4)
-  
-  for idx, video_data in enumerate(video_data_list):
+  watermark = _as_utc(get_ingest_watermark(user_id))
+  cutoff = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=stale_after_days) if stale_after_days is not None else None
+  stored = get_stored_videos((video_data['video_id'] for video_data in video_data_list),
+                             fields=('last_updated', 'duration_in_seconds'))
+
+  statuses = {}
+  for video_data in video_data_list:
       video_id = video_data['video_id']
-      video_details = get_youtube_video_details(yt_api_key, video_id)
-      if video_details:
-          process_video_data(video_id, video_details, video_data['timestamp'])
-          summary = agent_summarizer(video_details.get('description', ''))
-          processed_data.append({'video_id': video_id, 'summary': summary})
-  
-          # Embed summary into Pinecone
-          try:
-              embedded_summary = embedding.embed_query(summary)
-              if isinstance(embedded_summary, list) and all(isinstance(item, float) for item in embedded_summary):
-                  vector_to_upsert = {
-                      "id": video_id,
-                      "values": embedded_summary,
-                      "metadata": {
-                          "title": video_details.get('snippet', {}).get('title', ''),
-                          "video_id": video_id
-                      }
-                  }
-                  pinecone_index.upsert(vectors=[vector_to_upsert])
-                  logging.info(f"Upserted vector for video ID {video_id}")
-              else:
-                  logging.warning(f"Skipping upsert for video ID {video_id} due to invalid embedding format.")
-          except Exception as e:
-              logging.error(f"Error embedding summary for video ID {video_id}: {e}")
-  
-          progress = (idx + 1) / len(video_data_list) * 100
-  
-  return processed_data, progress
+      if video_id in statuses:
+          continue
+      if video_id not in stored:
+          statuses[video_id] = 'new'
+      elif cutoff is not None and (stored[video_id].get('last_updated') is None or _as_utc(stored[video_id]['last_updated']) < cutoff):
+          statuses[video_id] = 'refresh'
+      else:
+          statuses[video_id] = 'skip'
+  return statuses, stored, watermark
 
 
-def get_all_videos():
+def process_videos(video_data_list, stage_workers=None, on_progress=None, stage_counts=None,
+                   incremental=INCREMENTAL_INGEST, user_id=DEFAULT_USER_ID, ingest_counts=None, stage_timings=None,
+                   watch_timestamps=True):
   """
-  Retrieves all videos from Firestore.
+  Processes a list of video data and embeds summaries into the vector store.
+
+  Metadata is fetched in bulk up front; summarizing, storing, embedding and upserting
+  then run as concurrent pipeline stages, so remote calls overlap across videos.
+  Descriptions are stripped of channel boilerplate and cut to a token budget before summarizing;
+  short descriptions are summarized several to a request, and repeated descriptions come from the summary cache.
+  In incremental mode, videos already stored and not yet stale skip every stage.
 
-  :return: A list of video data.
+  :param video_data_list: A list of video data.
+  :param stage_workers: Optional dictionary overriding STAGE_WORKERS per stage name.
+  :param on_progress: Optional callback(completed, total, context), called in input order.
+  :param stage_counts: Optional dictionary updated in place with the number of videos each stage has processed.
+  :param incremental: Skip videos already stored, see plan_incremental_ingest.
+  :param user_id: The user the upload belongs to, whose watermark is read and advanced.
+  :param ingest_counts: Optional dictionary updated in place with the number of new, refreshed and skipped items.
+  :param stage_timings: Optional dictionary filled in place with the duration of every stage call, see run_pipeline.
+  :param watch_timestamps: False when the timestamps are processing times rather than watch times, as for
+                           yt-dlp extraction; the watermark is then left alone and no watch events are recorded.
+  :return: Tuple containing the processed data and progress percentage.
   """
-  videos = db.collection('youtube_videos').stream()
-  video_list = [{doc.id: doc.to_dict()} for doc in videos]
-  return video_list
+  if not video_data_list:
+      return [], 0
+  statuses, stored, watermark = {}, {}, None
+  if incremental:
+      try:
+          statuses, stored, watermark = plan_incremental_ingest(video_data_list, user_id)
+      except Exception as e:
+          logging.error(f"Incremental check failed, processing every video: {e}", exc_info=True)
+  counts = {'new': 0, 'refreshed': 0, 'skipped': 0}
+  for video_data in video_data_list:
+      status = statuses.get(video_data['video_id'], 'new')
+      counts['skipped' if status == 'skip' else 'refreshed' if status == 'refresh' else 'new'] += 1
+  if ingest_counts is not None:
+      ingest_counts.update(counts)
+  logging.info(f"Ingesting {counts['new']} new and {counts['refreshed']} stale items, skipping {counts['skipped']} already stored")
+
+  workers = dict(STAGE_WORKERS, **(stage_workers or {}))
+  embedding = get_embedding_client()
+  vector_store = get_vector_store()
+  deferred_ids = []
+  details_by_id, missing_ids = get_youtube_videos_details(yt_api_key, list({
+      video_data['video_id'] for video_data in video_data_list if statuses.get(video_data['video_id']) != 'skip'}),
+      deferred_ids=deferred_ids)
+  if deferred_ids:
+      logging.warning(f"YouTube quota deferred {len(deferred_ids)} videos; they will be picked up by the next upload")
+  if missing_ids:
+      logging.info(f"Skipping {len(missing_ids)} videos that are missing or private: {missing_ids}")
+
+  # Channel boilerplate, links, hashtags and timestamps are stripped before anything reaches the summarizer
+  descriptions, description_tokens, cleaned_tokens = clean_descriptions(details_by_id)
+  if description_tokens:
+      logging.info(f"Description cleanup kept {cleaned_tokens} of {description_tokens} estimated tokens "
+                   f"({description_tokens - cleaned_tokens} saved)")
+
+  # The category table is resolved once per upload instead of once per video; channel titles come with the video snippet
+  category_names = get_category_names(yt_api_key)
+
+  def summarize(contexts):
+      summaries = agent_summarizer_batch([context['description'] for context in contexts])
+      for context, summary in zip(contexts, summaries):
+          context['summary'] = summary
+
+  def store(context):
+      snippet = context['details'].get('snippet', {})
+      process_video_data(context['video_id'], context['details'], context['timestamp'],
+                         category_name=category_names.get(snippet.get('categoryId')),
+                         summary=context['summary'],
+                         writer=firestore_writer)
+      return context
+
+  def embed(contexts):
+      for context, embedded_summary in zip(contexts, embed_texts(embedding, [context['summary'] for context in contexts])):
+          context['embedding'] = embedded_summary
+
+  def upsert(contexts):
+      vectors_to_upsert = []
+      for context in contexts:
+          video_id = context['video_id']
+          if context['embedding'] is None:
+              continue
+          if not _is_valid_embedding(context['embedding']):
+              logging.warning(f"Skipping upsert for video ID {video_id} due to invalid embedding format.")
+              continue
+          vectors_to_upsert.append({
+              "id": video_id,
+              "values": context['embedding'],
+              "metadata": {
+                  "title": context['details'].get('snippet', {}).get('title', ''),
+                  "video_id": video_id
+              }
+          })
+      with vector_upsert_seconds.time(caller='ingest'):
+          failed_ids = vector_store.upsert(vectors_to_upsert)
+      if failed_ids:
+          errors_total.inc(len(failed_ids), service='vector_store', stage='upsert')
+
+  stages = [
+      Stage('summarize', summarize, workers['summarize'], batch_size=STAGE_BATCH_SIZES['summarize']),
+      Stage('store', store, workers['store']),
+      Stage('embed', embed, workers['embed'], batch_size=STAGE_BATCH_SIZES['embed']),
+      Stage('upsert', upsert, workers['upsert'], batch_size=STAGE_BATCH_SIZES['upsert']),
+  ]
+  contexts = [{
+      'video_id': video_data['video_id'],
+      'timestamp': video_data['timestamp'],
+      'details': details_by_id.get(video_data['video_id']),
+      # Descriptions that were nothing but boilerplate are summarized from the title instead
+      'description': (descriptions.get(video_data['video_id'])
+                      or details_by_id.get(video_data['video_id'], {}).get('snippet', {}).get('title', '')),
+      # Unchanged, missing or private videos pass through the pipeline without any work
+      'skip': video_data['video_id'] not in details_by_id,
+      'unchanged': statuses.get(video_data['video_id']) == 'skip',
+  } for video_data in video_data_list]
+  deferred = set(deferred_ids)
+  for context in contexts:
+      if context['video_id'] in deferred:
+          # Recorded as an error so the ingest watermark does not move past deferred videos
+          context['error'] = 'deferred: YouTube quota'
+
+  summary_stats_before = get_summary_stats()
+  with FirestoreBulkWriter('youtube_videos') as firestore_writer:
+      results = run_pipeline(contexts, stages, queue_size=STAGE_QUEUE_SIZE,
+                             on_progress=on_progress, stage_counts=stage_counts, stage_timings=stage_timings)
+  # A video whose Firestore write was lost (or never queued) failed, even though every stage returned;
+  # the error keeps the ingest watermark from moving past it, so the next upload retries the video
+  for context in results:
+      if not context.get('skip') and firestore_writer.results.get(context['video_id']) != 'ok':
+          context['error'] = f"store: {firestore_writer.results.get(context['video_id']) or 'not written'}"
+  request_sync()
+  processed_data = [{'video_id': context['video_id'], 'summary': context['summary']}
+                    for context in results if 'summary' in context]
+
+  # Keyword search covers every summarized video, whether or not its embedding made it into the vector store
+  try:
+      get_keyword_index().upsert([{
+          'id': context['video_id'],
+          'title': context['details'].get('snippet', {}).get('title', ''),
+          'channelTitle': context['details'].get('snippet', {}).get('channelTitle', ''),
+          'tags': context['details'].get('snippet', {}).get('tags', []),
+          'summary': context['summary'],
+      } for context in results if 'summary' in context and not context.get('error')])
+  except Exception as e:
+      errors_total.inc(service='keyword_index', stage='upsert')
+      logging.error(f"Failed to update the keyword index: {e}", exc_info=True)
+  progress = len(results) / len(video_data_list) * 100
+
+  # Feed the watch-time analytics with every successfully processed watch event, and with the watch
+  # events of unchanged videos newer than the watermark, whose duration is already stored. Failed items,
+  # lost writes included, are left for the upload that retries them
+  def is_new_watch(context):
+      timestamp = _as_utc(context['timestamp'])
+      return timestamp is not None and (watermark is None or timestamp > watermark)
+
+  if watch_timestamps:
+      record_watch_events({
+          'video_id': context['video_id'],
+          'timestamp': context['timestamp'],
+          'duration_in_seconds': (stored.get(context['video_id'], {}).get('duration_in_seconds') if context['unchanged']
+                                  else get_duration_in_seconds(context['details'])),
+      } for context in results
+        if not context.get('error') and (not context.get('skip') or (context['unchanged'] and is_new_watch(context))))
+
+  # The watermark only moves once every item of the upload went through, stored writes included, and only from real watch times
+  timestamps = [_as_utc(video_data['timestamp']) for video_data in video_data_list if video_data['timestamp'] is not None]
+  if incremental and watch_timestamps and timestamps and not any(context.get('error') for context in results):
+      try:
+          set_ingest_watermark(user_id, max(timestamps))
+      except Exception as e:
+          logging.error(f"Failed to store the ingest watermark for user {user_id}: {e}", exc_info=True)
+
+  summary_stats = get_summary_stats()
+  logging.info(
+      f"Summaries for this run: {summary_stats['calls'] - summary_stats_before['calls']} GPT calls made, "
+      f"{summary_stats['calls_saved'] - summary_stats_before['calls_saved']} calls and "
+      f"{summary_stats['tokens_saved'] - summary_stats_before['tokens_saved']} tokens saved by the summary cache, "
+      f"{description_tokens - cleaned_tokens} prompt tokens saved by description cleanup"
+  )
+  return processed_data, progress
 
 
 def embed_summaries_from_firestore(video_data):
   """
-  Process summaries of videos and insert embeddings into Pinecone.
+  Process summaries of videos and insert embeddings into the vector store, in batches.
 
   :param video_data: List of dictionaries containing video_id, title, and summary.
   """
-  embedding = OpenAIEmbeddings(openai_api_key=openai.api_key)
-  pool_threads = 4
-  index_name = "learning-objectives"
-  pinecone_index = Pinecone.get_pinecone_index(index_name=index_name, pool_threads=pool_threads)
+  embedding = get_embedding_client()
+  vector_store = get_vector_store()
 
+  videos = []
   for video in video_data:
       if 'video_id' not in video or 'title' not in video or 'summary' not in video:
           logging.warning(f"Required data not found in video data: {video}")
           continue
+      videos.append(video)
+
+  try:
+      get_keyword_index().upsert([{'id': video['video_id'], 'title': video['title'], 'summary': video['summary']} for video in videos])
+  except Exception as e:
+      errors_total.inc(service='keyword_index', stage='upsert')
+      logging.error(f"Failed to update the keyword index: {e}", exc_info=True)
 
+  vectors_to_upsert = []
+  for video, embedded_summary in zip(videos, embed_texts(embedding, [video['summary'] for video in videos])):
       video_id = video['video_id']
-      video_title = video['title']
-      summary = video['summary']
+      if embedded_summary is None:
+          continue
+      if not _is_valid_embedding(embedded_summary):
+          logging.warning(f"Skipping upsert for video ID {video_id} due to invalid embedding format.")
+          continue
+      vectors_to_upsert.append({
+          "id": video_id,
+          "values": embedded_summary,
+          "metadata": {
+              "title": video['title'],
+              "video_id": video_id
+          }
+      })
 
-      try:
-          embedded_summary = embedding.embed_query(summary)
-          if isinstance(embedded_summary, list) and all(isinstance(item, float) for item in embedded_summary):
-              vector_to_upsert = {
-                  "id": video_id,
-                  "values": embedded_summary,
-                  "metadata": {
-                      "title": video_title,
-                      "video_id": video_id
-                  }
-              }
-              pinecone_index.upsert(vectors=[vector_to_upsert])
-              logging.info(f"Upserted vector for video ID {video_id}")
-          else:
-              logging.warning(f"Skipping upsert for video ID {video_id} due to invalid embedding format.")
-      except Exception as e:
-          logging.error(f"Error inserting embedding for video ID {video_id}: {e}")
+  with vector_upsert_seconds.time(caller='backfill'):
+      failed_ids = vector_store.upsert(vectors_to_upsert)
+  if failed_ids:
+      errors_total.inc(len(failed_ids), service='vector_store', stage='upsert')
+      logging.error(f"Failed to upsert embeddings for {len(failed_ids)} videos: {failed_ids}")
@@ -0,0 +1,185 @@
+# Standard library imports
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+JOB_STORE_PATH = os.environ.get('JOB_STORE_PATH', '.cache/jobs.sqlite3')
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+PROGRESS_WRITE_INTERVAL = 0.5  # Seconds between progress writes to the job store
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+
+# Jobs only run in the process that queued them, so each row records its owner
+_HOSTNAME = socket.gethostname()
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='job')
+_local = threading.local()
+_orphans_checked = threading.Event()
+_orphans_lock = threading.Lock()
+
+def _connection():
+    # SQLite connections are per thread; the file itself is shared by every worker process
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        directory = os.path.dirname(JOB_STORE_PATH)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(JOB_STORE_PATH, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "job_id TEXT PRIMARY KEY, kind TEXT, state TEXT NOT NULL, done INTEGER NOT NULL DEFAULT 0, "
+            "total INTEGER NOT NULL DEFAULT 0, stage_counts TEXT NOT NULL DEFAULT '{}', result TEXT, error TEXT, "
+            "created_at REAL NOT NULL, started_at REAL, updated_at REAL NOT NULL, owner_host TEXT, owner_pid INTEGER)"
+        )
+        conn.commit()
+        _local.conn = conn
+    if not _orphans_checked.is_set():
+        _fail_orphaned_jobs_once()
+    return conn
+
+def _fail_orphaned_jobs_once():
+    # The first use of the job store in a process cleans up after dead ones, rather than importing the app
+    with _orphans_lock:
+        if _orphans_checked.is_set():
+            return
+        _orphans_checked.set()  # Set first, fail_orphaned_jobs uses the connection too
+        try:
+            fail_orphaned_jobs()
+        except sqlite3.Error as e:
+            logging.error(f"Failed to mark orphaned jobs as failed: {e}", exc_info=True)
+
+def _update_job(job_id, **fields):
+    fields['updated_at'] = time.time()
+    assignments = ", ".join(f"{name} = ?" for name in fields)
+    conn = _connection()
+    conn.execute(f"UPDATE jobs SET {assignments} WHERE job_id = ?", (*fields.values(), job_id))
+    conn.commit()
+
+class ProgressReporter:
+    """
+    Progress callback handed to a job. Writes to the job store are throttled to
+    one every PROGRESS_WRITE_INTERVAL seconds, except for the final update.
+    """
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.stage_counts = {}  # Filled in by the pipeline as items clear each stage
+        self._last_write = 0
+
+    def __call__(self, done, total, *_):
+        now = time.monotonic()
+        if done < total and now - self._last_write < PROGRESS_WRITE_INTERVAL:
+            return
+        self._last_write = now
+        _update_job(self.job_id, done=done, total=total, stage_counts=json.dumps(self.stage_counts))
+
+def submit_job(kind, func, total, *args, **kwargs):
+    """
+    Queues func to run on the local worker pool.
+
+    func is called as func(*args, progress=ProgressReporter, **kwargs) and its return
+    value, which must be JSON serializable, becomes the job result.
+
+    :param kind: A short label for the job type.
+    :param func: The function to run.
+    :param total: The number of items the job will process.
+    :return: The new job ID.
+    """
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    conn = _connection()
+    conn.execute(
+        "INSERT INTO jobs (job_id, kind, state, total, created_at, updated_at, owner_host, owner_pid) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (job_id, kind, QUEUED, total, now, now, _HOSTNAME, os.getpid())
+    )
+    conn.commit()
+
+    def run():
+        _update_job(job_id, state=RUNNING, started_at=time.time())
+        reporter = ProgressReporter(job_id)
+        try:
+            result = func(*args, progress=reporter, **kwargs)
+            _update_job(job_id, state=DONE, stage_counts=json.dumps(reporter.stage_counts), result=json.dumps(result))
+            logging.info(f"Job {job_id} ({kind}) finished")
+        except Exception as e:
+            logging.error(f"Job {job_id} ({kind}) failed: {e}", exc_info=True)
+            _update_job(job_id, state=FAILED, error=str(e))
+
+    _executor.submit(run)
+    logging.info(f"Queued job {job_id} ({kind}) with {total} items")
+    return job_id
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # Exists, owned by another user
+    return True
+
+def fail_orphaned_jobs():
+    """
+    Marks the queued and running jobs of processes on this host that are gone as failed,
+    so their progress streams end instead of waiting forever. Runs once per process, on
+    the first use of the job store.
+    Jobs of live worker processes, and of other hosts sharing the store, are left alone.
+
+    :return: Number of jobs marked as failed.
+    """
+    conn = _connection()
+    rows = conn.execute("SELECT job_id, owner_host, owner_pid FROM jobs WHERE state IN (?, ?)", (QUEUED, RUNNING)).fetchall()
+    orphaned = [job_id for job_id, owner_host, owner_pid in rows
+                if owner_host in (None, _HOSTNAME) and (owner_pid is None or not _process_alive(owner_pid))]
+    now = time.time()
+    conn.executemany("UPDATE jobs SET state = ?, error = ?, updated_at = ? WHERE job_id = ?",
+                     [(FAILED, 'Interrupted: the server restarted before the job finished', now, job_id) for job_id in orphaned])
+    conn.commit()
+    if orphaned:
+        logging.warning(f"Marked {len(orphaned)} jobs interrupted by a restart as failed")
+    return len(orphaned)
+
+def get_job(job_id):
+    """
+    Returns the current state of a job, including throughput and ETA.
+
+    :param job_id: The job ID.
+    :return: Dictionary describing the job, or None if it does not exist.
+    """
+    row = _connection().execute(
+        "SELECT job_id, kind, state, done, total, stage_counts, result, error, created_at, started_at, updated_at "
+        "FROM jobs WHERE job_id = ?", (job_id,)
+    ).fetchone()
+    if row is None:
+        return None
+    job_id, kind, state, done, total, stage_counts, result, error, created_at, started_at, updated_at = row
+
+    end = updated_at if state in (DONE, FAILED) else time.time()
+    elapsed = end - started_at if started_at else 0
+    throughput = done / elapsed if elapsed > 0 else 0.0
+    eta = (total - done) / throughput if throughput > 0 and state == RUNNING else None
+    return {
+        'job_id': job_id,
+        'kind': kind,
+        'state': state,
+        'done': done,
+        'total': total,
+        'progress': done / total * 100 if total else 0,
+        'throughput': throughput,
+        'eta_seconds': eta,
+        'stage_counts': json.loads(stage_counts),
+        'result': json.loads(result) if result else None,
+        'error': error,
+        'created_at': created_at,
+        'updated_at': updated_at,
+    }
@@ -0,0 +1,271 @@
+# Standard library imports
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+from itertools import islice
+
+# Third-party imports
+import numpy as np
+
+# Local imports
+from services.registry import register_service, get_service
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+KEYWORD_INDEX_PATH = os.environ.get('KEYWORD_INDEX_PATH', '.cache/keyword_index.sqlite3')
+BACKFILL_BATCH_SIZE = 500
+# Term frequencies are weighted by the field a term appears in
+FIELD_WEIGHTS = {'title': 3, 'channelTitle': 2, 'tags': 2, 'summary': 1}
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+TOKEN_REGEX = re.compile(r'\w+')
+STOPWORDS = frozenset(
+    'a an and are as at be by for from has have how in is it its of on or that the this to was were what when '
+    'where which who why will with video videos'.split()
+)
+
+def tokenize(text):
+    """
+    Splits text into lowercase word tokens, without stopwords.
+    """
+    return [token for token in TOKEN_REGEX.findall((text or '').lower()) if token not in STOPWORDS]
+
+def _weighted_terms(document):
+    terms = Counter()
+    for field, weight in FIELD_WEIGHTS.items():
+        value = document.get(field)
+        if isinstance(value, (list, tuple)):
+            value = " ".join(str(item) for item in value)
+        for token in tokenize(value):
+            terms[token] += weight
+    return terms
+
+class KeywordIndex:
+    """
+    BM25 inverted index over video titles, channel titles, tags and summaries. Postings
+    live in memory and are scored with numpy; documents are persisted in SQLite and the
+    postings rebuilt from them at startup. Every worker process shares the SQLite file,
+    so before each operation the index checks whether another process committed to it
+    (one PRAGMA, no table reads) and reloads the postings if so. Results have the same
+    shape as vector store matches, and `version` increases on every write or reload.
+    """
+
+    def __init__(self, path=KEYWORD_INDEX_PATH):
+        self.path = path
+        self._version = 0
+        self._lock = threading.RLock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS documents (id TEXT PRIMARY KEY, terms TEXT NOT NULL, metadata TEXT NOT NULL)")
+        self._conn.commit()
+        self._load()
+
+    def _load(self):
+        # Callers hold the lock, or are the constructor
+        self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        self._postings = {}  # term -> {row: weighted term frequency}
+        self._arrays = {}  # term -> (rows, frequencies) arrays of its postings, rebuilt after the term changes
+        self._rows = {}  # video ID -> row
+        self._ids = []  # Video ID per row, None for free rows
+        self._terms = []  # Terms per row, to find a document's postings on removal
+        self._metadata = []  # Metadata returned with matches, per row
+        self._free_rows = []
+        self._lengths = np.zeros(1024, dtype=np.float32)  # Weighted document length per row
+        self._total_length = 0.0
+        for video_id, terms, metadata in self._conn.execute("SELECT id, terms, metadata FROM documents"):
+            self._add(video_id, json.loads(terms), json.loads(metadata))
+        logging.info(f"Loaded keyword index with {len(self._rows)} documents")
+
+    def _refresh(self):
+        # data_version changes when another connection, in any process, commits to the file
+        if self._conn.execute("PRAGMA data_version").fetchone()[0] != self._data_version:
+            self._load()
+            self._version += 1
+
+    @property
+    def version(self):
+        with self._lock:
+            self._refresh()
+            return self._version
+
+    def __len__(self):
+        with self._lock:
+            self._refresh()
+            return len(self._rows)
+
+    def _add(self, video_id, terms, metadata):
+        self._remove(video_id)
+        if self._free_rows:
+            row = self._free_rows.pop()
+        else:
+            row = len(self._ids)
+            self._ids.append(None)
+            self._terms.append(None)
+            self._metadata.append(None)
+            if row >= len(self._lengths):
+                self._lengths = np.concatenate([self._lengths, np.zeros(len(self._lengths), dtype=np.float32)])
+        for term, frequency in terms.items():
+            self._postings.setdefault(term, {})[row] = frequency
+            self._arrays.pop(term, None)
+        length = sum(terms.values())
+        self._rows[video_id] = row
+        self._ids[row] = video_id
+        self._terms[row] = list(terms)
+        self._metadata[row] = metadata
+        self._lengths[row] = length
+        self._total_length += length
+
+    def _remove(self, video_id):
+        row = self._rows.pop(video_id, None)
+        if row is None:
+            return False
+        for term in self._terms[row]:
+            postings = self._postings[term]
+            del postings[row]
+            self._arrays.pop(term, None)
+            if not postings:
+                del self._postings[term]
+        self._total_length -= float(self._lengths[row])
+        self._lengths[row] = 0
+        self._ids[row] = self._terms[row] = self._metadata[row] = None
+        self._free_rows.append(row)
+        return True
+
+    def _posting_arrays(self, term):
+        arrays = self._arrays.get(term)
+        if arrays is None:
+            postings = self._postings[term]
+            arrays = self._arrays[term] = (np.fromiter(postings.keys(), dtype=np.int64, count=len(postings)),
+                                           np.fromiter(postings.values(), dtype=np.float32, count=len(postings)))
+        return arrays
+
+    def upsert(self, documents):
+        """
+        Indexes or re-indexes documents.
+
+        :param documents: List of dictionaries with `id` and any of title, channelTitle, tags and summary.
+        """
+        rows = []
+        with self._lock:
+            self._refresh()
+            for document in documents:
+                terms = dict(_weighted_terms(document))
+                metadata = {'video_id': document['id'], 'title': document.get('title') or ''}
+                self._add(document['id'], terms, metadata)
+                rows.append((document['id'], json.dumps(terms), json.dumps(metadata)))
+            with self._conn:
+                self._conn.executemany("INSERT OR REPLACE INTO documents VALUES (?, ?, ?)", rows)
+            self._version += 1
+
+    def delete(self, ids):
+        """
+        Removes documents by video ID.
+        """
+        with self._lock:
+            self._refresh()
+            removed = [(video_id,) for video_id in ids if self._remove(video_id)]
+            with self._conn:
+                self._conn.executemany("DELETE FROM documents WHERE id = ?", removed)
+            self._version += 1
+
+    def search(self, query, top_k=3):
+        """
+        Ranks documents against a query with BM25.
+
+        :param query: The query text.
+        :param top_k: Number of results to return.
+        :return: List of results with `id`, `score` and `metadata`, best match first.
+        """
+        with self._lock:
+            self._refresh()
+            documents = len(self._rows)
+            terms = [term for term in set(tokenize(query)) if term in self._postings]
+            if not documents or not terms:
+                return []
+            # Per-row BM25 length normalization, shared by every query term
+            norms = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[:len(self._ids)] / (self._total_length / documents))
+            scores = np.zeros(len(self._ids), dtype=np.float32)
+            for term in terms:
+                rows, frequencies = self._posting_arrays(term)
+                idf = math.log(1 + (documents - len(rows) + 0.5) / (len(rows) + 0.5))
+                scores[rows] += idf * frequencies * (BM25_K1 + 1) / (frequencies + norms[rows])
+
+            matched = np.flatnonzero(scores)
+            top_k = min(top_k, len(matched))
+            if not top_k:
+                return []
+            best = matched[np.argpartition(-scores[matched], top_k - 1)[:top_k]]
+            best = best[np.argsort(-scores[best], kind='stable')]
+            return [{'id': self._ids[row], 'score': float(scores[row]), 'metadata': self._metadata[row]} for row in best.tolist()]
+
+register_service('keyword_index', KeywordIndex)
+
+def get_keyword_index():
+    """
+    Returns the process-wide keyword index, loading it on first use.
+
+    :return: A KeywordIndex instance.
+    """
+    return get_service('keyword_index')
+
+def backfill_keyword_index(index=None, batch_size=BACKFILL_BATCH_SIZE):
+    """
+    Indexes every stored video that has a summary, reading from the video replica (or
+    Firestore while the replica is unavailable). Videos already indexed are re-indexed.
+
+    :param index: The KeywordIndex to fill; the process-wide one when omitted.
+    :param batch_size: Documents per upsert.
+    :return: Number of videos indexed.
+    """
+    from services.video_replica import iter_videos
+    index = index or get_keyword_index()
+    documents = ({
+        'id': video['video_id'],
+        'title': video.get('snippet', {}).get('title', ''),
+        'channelTitle': video.get('snippet', {}).get('channelTitle', ''),
+        'tags': video.get('snippet', {}).get('tags', []),
+        'summary': video.get('generated', {}).get('summary'),
+    } for video in iter_videos(fields=['snippet.title', 'snippet.channelTitle', 'snippet.tags', 'generated.summary'])
+        if video.get('generated', {}).get('summary'))
+    indexed = 0
+    while batch := list(islice(documents, batch_size)):
+        index.upsert(batch)
+        indexed += len(batch)
+    logging.info(f"Backfilled the keyword index with {indexed} videos")
+    return indexed
+
+def start_background_backfill():
+    """
+    Backfills the keyword index on a daemon thread if it is empty, as it is on deployments
+    that stored videos before the index existed. Called at startup when
+    KEYWORD_BACKFILL_AT_STARTUP is set.
+    """
+    def backfill():
+        try:
+            index = get_keyword_index()
+            if not len(index):
+                backfill_keyword_index(index)
+        except Exception as e:
+            logging.error(f"Failed to backfill the keyword index: {e}", exc_info=True)
+
+    threading.Thread(target=backfill, name='keyword-index-backfill', daemon=True).start()
+
+if __name__ == '__main__':
+    # Maintenance: python -m services.keyword_index --backfill
+    import argparse
+    parser = argparse.ArgumentParser(description='Maintain the local keyword index.')
+    parser.add_argument('--backfill', action='store_true', help='Index every stored video with a summary')
+    args = parser.parse_args()
+    if args.backfill:
+        print(f"Indexed {backfill_keyword_index()} videos")
+    else:
+        print(f"{len(get_keyword_index())} documents indexed")
@@ -1,79 +1,149 @@
 # Standard library imports
+import heapq
 import logging
-
-# Third-party imports
-import pinecone
-import openai
-from langchain.vectorstores import Pinecone
-from langchain.embeddings.openai import OpenAIEmbeddings
+import os
 
 # Local imports
-from config.api_keys import pinecone_api_key
+from services.keyword_index import get_keyword_index
+from services.vector_store import get_vector_store
+from utils.agents import get_embedding_client
+from utils.ttl_cache import TTLCache
+from utils.metrics import errors_total, embedding_request_seconds, vector_upsert_seconds, vector_query_seconds, keyword_query_seconds
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
-# Initialize Pinecone
-logging.info("Initializing Pinecone")
-pinecone.init(api_key=pinecone_api_key, environment='gcp-starter')
-existing_indexes = pinecone.list_indexes()
-index_name = 'learning-objectives'
-
-# Create Pinecone index if it doesn't exist
-if index_name not in existing_indexes:
-    logging.info(f"Creating new index: {index_name}")
-    pinecone.create_index(index_name, dimension=768, metric='cosine')
-else:
-    logging.info(f"Index '{index_name}' already exists.")
-
 def insert_embedding_into_pinecone(video_id, embedding):
     """
-    Insert an embedding into Pinecone.
+    Insert an embedding into the vector store.
 
     :param video_id: Identifier for the video.
     :param embedding: The embedding vector to be inserted.
     """
-    pinecone_index = pinecone.Index(index_name)
-
     # Validate embedding type
     if not isinstance(embedding, list) or not all(isinstance(e, float) for e in embedding):
         logging.error(f"Invalid embedding type for video ID {video_id}: {type(embedding)}")
         return
 
     try:
-        pinecone_index.upsert(vectors={video_id: embedding})
-        logging.info(f"Embedding successfully inserted for video ID {video_id}")
+        with vector_upsert_seconds.time(caller='insert'):
+            failed = get_vector_store().upsert([{"id": video_id, "values": embedding, "metadata": {"video_id": video_id}}])
+        if not failed:
+            logging.info(f"Embedding successfully inserted for video ID {video_id}")
     except Exception as e:
-        logging.error(f"Error inserting embedding into Pinecone for video ID {video_id}: {e}", exc_info=True)
+        errors_total.inc(service='vector_store', stage='upsert')
+        logging.error(f"Error inserting embedding into the vector store for video ID {video_id}: {e}", exc_info=True)
+
+# Process-wide clients and query caches
+QUERY_CACHE_SIZE = 1024
+QUERY_CACHE_TTL_SECONDS = 3600  # Embeddings of a subtopic never change
+# Result keys carry the index write versions. The keyword index sees other worker processes'
+# writes, the vector store's version only this process's, so this TTL is how stale a cached
+# result can be after another process writes vectors
+QUERY_RESULT_TTL_SECONDS = float(os.environ.get('QUERY_RESULT_TTL_SECONDS', 60))
+query_embedding_cache = TTLCache(maxsize=QUERY_CACHE_SIZE, ttl_seconds=QUERY_CACHE_TTL_SECONDS)
+query_result_cache = TTLCache(maxsize=QUERY_CACHE_SIZE, ttl_seconds=QUERY_RESULT_TTL_SECONDS)
+
+def get_query_cache_stats():
+    """
+    Returns hit rates and estimated latency saved by the subtopic embedding and result caches.
+
+    :return: Dictionary with the stats of both caches.
+    """
+    return {'embeddings': query_embedding_cache.stats(), 'results': query_result_cache.stats()}
+
+# 'vector' ranks by embedding similarity, 'keyword' by BM25 on the local keyword index alone
+# (no network calls), and 'hybrid' merges both rankings with reciprocal rank fusion.
+# Scores are on a different scale per mode, so the default stays 'vector', whose scores
+# are the similarity values clients have always received
+QUERY_MODES = ('vector', 'hybrid', 'keyword')
+SUBTOPIC_QUERY_MODE = os.environ.get('SUBTOPIC_QUERY_MODE', 'vector')
+RRF_K = 60
+HYBRID_CANDIDATES = 50  # Candidates taken from each ranking before fusion
+
+def reciprocal_rank_fusion(rankings, top_k=3, k=RRF_K):
+    """
+    Merges ranked result lists: each result scores 1 / (k + rank) in every list it appears in.
+
+    :param rankings: Lists of results with `id` and `metadata`, best match first.
+    :param top_k: Number of results to return.
+    :param k: Damping constant; larger values flatten the difference between top and lower ranks.
+    :return: List of results with `id`, fused `score` and `metadata`, best match first.
+    """
+    scores, metadata = {}, {}
+    for ranking in rankings:
+        for rank, match in enumerate(ranking, start=1):
+            scores[match['id']] = scores.get(match['id'], 0.0) + 1.0 / (k + rank)
+            metadata.setdefault(match['id'], match['metadata'])
+    best = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+    return [{'id': match_id, 'score': score, 'metadata': metadata[match_id]} for match_id, score in best]
 
-def query_pinecone(subtopic):
+def _keyword_search(subtopic, top_k):
+    with keyword_query_seconds.time():
+        return get_keyword_index().search(subtopic, top_k=top_k)
+
+def _titles(matches):
+    # Extract video titles and their scores
+    return [{
+        'title': match['metadata']['title'],
+        'score': match['score']
+    } for match in matches if 'title' in match['metadata']]
+
+def query_pinecone(subtopic, top_k=3, mode=SUBTOPIC_QUERY_MODE):
     """
-    Embed a subtopic and query Pinecone for the most relevant vectors.
+    Find the videos most relevant to a subtopic. In 'vector' mode the subtopic is embedded
+    and the vector store queried; 'keyword' mode only searches the local keyword index;
+    'hybrid' mode fuses both rankings. Scores are vector similarities, BM25 scores and
+    reciprocal rank fusion values respectively.
+    Embeddings and results are cached, and concurrent identical queries share one
+    computation. Results are keyed on the indexes' write versions, so any upsert or
+    delete in this process, or keyword index write in another, invalidates them; other
+    processes' vector writes show up within QUERY_RESULT_TTL_SECONDS.
 
     :param subtopic: The subtopic to query.
+    :param top_k: Number of results to return.
+    :param mode: One of QUERY_MODES.
     :return: A list of results including titles and scores.
     """
-    embedding = OpenAIEmbeddings(openai_api_key=openai.api_key)
-    pinecone_index = Pinecone.get_pinecone_index(index_name=index_name, pool_threads=4)
+    subtopic = " ".join(subtopic.split())
+
+    if mode == 'keyword':
+        try:
+            return _titles(_keyword_search(subtopic, top_k))
+        except Exception as e:
+            errors_total.inc(service='keyword_index', stage='query')
+            logging.error(f"Error querying the keyword index for subtopic: {e}", exc_info=True)
+            return []
 
     try:
-        # Embed the subtopic
-        embedded_subtopic = embedding.embed_query(subtopic)
-
-        # Query Pinecone
-        query_result = pinecone_index.query(
-            vector=embedded_subtopic, 
-            top_k=3, 
-            include_metadata=True
-        )
-
-        # Extract video titles and their scores
-        results = [{
-            'title': result['metadata']['title'],
-            'score': result['score']
-        } for result in query_result['matches'] if 'metadata' in result and 'title' in result['metadata']]
-
-        return results
+        vector_store = get_vector_store()
+        hybrid = mode == 'hybrid'
+
+        def embed_subtopic():
+            with embedding_request_seconds.time(caller='query'):
+                return get_embedding_client().embed_query(subtopic)
+
+        def search():
+            # Embed the subtopic
+            embedded_subtopic = query_embedding_cache.get_or_compute(subtopic, embed_subtopic)
+
+            # Query the vector store
+            with vector_query_seconds.time():
+                matches = vector_store.query(embedded_subtopic, top_k=max(top_k, HYBRID_CANDIDATES) if hybrid else top_k)
+            if not hybrid:
+                return _titles(matches)
+
+            try:
+                keyword_matches = _keyword_search(subtopic, HYBRID_CANDIDATES)
+            except Exception as e:
+                errors_total.inc(service='keyword_index', stage='query')
+                logging.error(f"Error querying the keyword index, ranking by vectors only: {e}", exc_info=True)
+                keyword_matches = []
+            return _titles(reciprocal_rank_fusion([matches, keyword_matches], top_k))
+
+        keyword_version = get_keyword_index().version if hybrid else None
+        return query_result_cache.get_or_compute((subtopic, top_k, mode, vector_store.version, keyword_version), search)
     except Exception as e:
-        logging.error(f"Error querying Pinecone for subtopic: {e}", exc_info=True)
+        errors_total.inc(service='vector_store', stage='query')
+        logging.error(f"Error querying the vector store for subtopic: {e}", exc_info=True)
         return []
@@ -0,0 +1,170 @@
+# Standard library imports
+import logging
+import queue
+import threading
+import time
+from collections import namedtuple
+
+# Local imports
+from utils.metrics import Gauge, errors_total, pipeline_items_total, pipeline_stage_seconds
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+# A pipeline stage: `func` takes an item context dict and returns it (possibly updated),
+# and `workers` threads run it concurrently. Stages with a `batch_size` instead receive a
+# list of up to batch_size contexts and update them in place.
+Stage = namedtuple('Stage', ['name', 'func', 'workers', 'batch_size'], defaults=(None,))
+
+# How long a batching stage waits for more items before flushing a partial batch
+BATCH_WAIT_SECONDS = 0.5
+
+_SENTINEL = object()
+
+# Input queues of the pipelines currently running, as (stage name, queue) pairs per run
+_active_queues = {}
+_active_queues_lock = threading.Lock()
+
+def _queue_depths():
+    depths = {}
+    with _active_queues_lock:
+        runs = list(_active_queues.values())
+    for run in runs:
+        for name, stage_queue in run:
+            depths[(name,)] = depths.get((name,), 0) + stage_queue.qsize()
+    return depths
+
+pipeline_queue_depth = Gauge('pipeline_queue_depth', 'Items waiting in front of each ingestion stage.', ['stage'], callback=_queue_depths)
+
+def run_pipeline(items, stages, queue_size=64, on_progress=None, stage_counts=None, stage_timings=None):
+    """
+    Runs items through a sequence of stages, each stage on its own worker threads.
+
+    Stages are connected by bounded queues, so a slow stage applies backpressure to the
+    ones before it instead of letting work pile up in memory. An item whose context has
+    `skip` set (or whose stage raised) is passed through the remaining stages untouched.
+
+    :param items: Iterable of item context dicts.
+    :param stages: List of Stage tuples, run in order.
+    :param queue_size: Maximum number of items waiting between two stages.
+    :param on_progress: Optional callback(completed, total, context), called in input order.
+    :param stage_counts: Optional dictionary updated in place with the number of items each stage has processed.
+    :param stage_timings: Optional dictionary filled in place with the duration in seconds of every
+                          call of each stage (one call per item, or per batch for batching stages).
+    :return: List of item contexts in input order.
+    """
+    items = list(items)
+    total = len(items)
+    queues = [queue.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]
+    remaining_workers = [stage.workers for stage in stages]
+    lock = threading.Lock()
+    if stage_counts is not None:
+        stage_counts.update({stage.name: 0 for stage in stages})
+    if stage_timings is not None:
+        stage_timings.update({stage.name: [] for stage in stages})
+
+    def count(stage, processed, seconds):
+        pipeline_stage_seconds.observe(seconds, stage=stage.name)
+        pipeline_items_total.inc(processed, stage=stage.name)
+        with lock:
+            if stage_counts is not None:
+                stage_counts[stage.name] += processed
+            if stage_timings is not None:
+                stage_timings[stage.name].append(seconds)
+
+    def feed():
+        for index, context in enumerate(items):
+            queues[0].put((index, context))
+        for _ in range(stages[0].workers if stages else 1):
+            queues[0].put(_SENTINEL)
+
+    def run_batch(stage, batch, outbox):
+        started = time.perf_counter()
+        try:
+            stage.func([context for _, context in batch])
+        except Exception as e:
+            errors_total.inc(service='pipeline', stage=stage.name)
+            logging.error(f"Stage '{stage.name}' failed for a batch of {len(batch)} items: {e}", exc_info=True)
+            for _, context in batch:
+                context['skip'] = True
+                context['error'] = f"{stage.name}: {e}"
+        count(stage, len(batch), time.perf_counter() - started)
+        for entry in batch:
+            outbox.put(entry)
+
+    def work(position, stage):
+        inbox, outbox = queues[position], queues[position + 1]
+        batch = []
+        while True:
+            try:
+                entry = inbox.get(timeout=BATCH_WAIT_SECONDS) if batch else inbox.get()
+            except queue.Empty:
+                # Upstream is slow; flush what we have rather than holding it back
+                run_batch(stage, batch, outbox)
+                batch = []
+                continue
+            if entry is _SENTINEL:
+                break
+            index, context = entry
+            if context.get('skip'):
+                outbox.put((index, context))
+            elif stage.batch_size:
+                batch.append((index, context))
+                if len(batch) >= stage.batch_size:
+                    run_batch(stage, batch, outbox)
+                    batch = []
+            else:
+                started = time.perf_counter()
+                try:
+                    context = stage.func(context)
+                except Exception as e:
+                    errors_total.inc(service='pipeline', stage=stage.name)
+                    logging.error(f"Stage '{stage.name}' failed for item {index}: {e}", exc_info=True)
+                    context['skip'] = True
+                    context['error'] = f"{stage.name}: {e}"
+                count(stage, 1, time.perf_counter() - started)
+                outbox.put((index, context))
+        if batch:
+            run_batch(stage, batch, outbox)
+
+        # The last worker of a stage to finish tells the next stage's workers to stop
+        with lock:
+            remaining_workers[position] -= 1
+            last = remaining_workers[position] == 0
+        if last:
+            next_workers = stages[position + 1].workers if position + 1 < len(stages) else 1
+            for _ in range(next_workers):
+                outbox.put(_SENTINEL)
+
+    run_id = object()
+    with _active_queues_lock:
+        _active_queues[run_id] = [(stage.name, queues[position]) for position, stage in enumerate(stages)]
+    try:
+        threads = [threading.Thread(target=feed, daemon=True)]
+        for position, stage in enumerate(stages):
+            threads.extend(threading.Thread(target=work, args=(position, stage), daemon=True) for _ in range(stage.workers))
+        for thread in threads:
+            thread.start()
+
+        # Reorder completed items so results and progress are reported in input order
+        results = [None] * total
+        pending = {}
+        completed = 0
+        while True:
+            entry = queues[-1].get()
+            if entry is _SENTINEL:
+                break
+            index, context = entry
+            pending[index] = context
+            while completed in pending:
+                results[completed] = pending.pop(completed)
+                completed += 1
+                if on_progress:
+                    on_progress(completed, total, results[completed - 1])
+
+        for thread in threads:
+            thread.join()
+    finally:
+        with _active_queues_lock:
+            del _active_queues[run_id]
+    return results
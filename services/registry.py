@@ -0,0 +1,90 @@
+# Standard library imports
+import logging
+import threading
+import time
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+# Service name -> zero-argument factory creating the client
+_factories = {}
+_instances = {}
+_init_seconds = {}
+_locks = {}
+_registry_lock = threading.Lock()
+
+def register_service(name, factory):
+    """
+    Registers a factory for a service. Nothing is created until the service is first requested.
+
+    :param name: The service name.
+    :param factory: Zero-argument function returning the service client.
+    """
+    with _registry_lock:
+        _factories[name] = factory
+        _locks.setdefault(name, threading.Lock())
+
+def get_service(name):
+    """
+    Returns a service client, creating it exactly once on first use, even when
+    several threads ask for it at the same time.
+
+    :param name: The service name.
+    :return: The service client.
+    :raises KeyError: If no service is registered under that name.
+    """
+    try:
+        return _instances[name]
+    except KeyError:
+        pass
+    with _locks[name]:
+        if name not in _instances:
+            started = time.perf_counter()
+            _instances[name] = _factories[name]()
+            _init_seconds[name] = time.perf_counter() - started
+            logging.info(f"Initialized service '{name}' in {_init_seconds[name] * 1000:.1f} ms")
+        return _instances[name]
+
+def warm_up_services(names=None, background=True):
+    """
+    Initializes services ahead of their first use. Failures are logged and left for
+    the first real request to retry.
+
+    :param names: Service names to initialize; all registered services when omitted.
+    :param background: Initialize on a daemon thread instead of blocking the caller.
+    :return: The warm-up thread when running in the background, otherwise None.
+    """
+    names = list(names or _factories)
+
+    def warm_up():
+        for name in names:
+            try:
+                get_service(name)
+            except Exception as e:
+                logging.error(f"Failed to warm up service '{name}': {e}", exc_info=True)
+
+    if not background:
+        warm_up()
+        return None
+    thread = threading.Thread(target=warm_up, name='service-warm-up', daemon=True)
+    thread.start()
+    return thread
+
+def get_startup_report():
+    """
+    Returns how long each initialized service took to create.
+
+    :return: Dictionary of service name -> initialization time in milliseconds, None if not initialized yet.
+    """
+    return {name: (_init_seconds[name] * 1000 if name in _init_seconds else None) for name in _factories}
+
+if __name__ == '__main__':
+    # Startup benchmark: python -m services.registry
+    started = time.perf_counter()
+    import main  # noqa: F401
+    from services import registry  # The registry main.py populated, not this __main__ copy
+    import_ms = (time.perf_counter() - started) * 1000
+    print(f"import main: {import_ms:.1f} ms")
+    registry.warm_up_services(background=False)
+    for service_name, init_ms in registry.get_startup_report().items():
+        print(f"init {service_name}: {init_ms:.1f} ms" if init_ms is not None else f"init {service_name}: failed")
@@ -0,0 +1,314 @@
+# Standard library imports
+import json
+import logging
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+
+# Third-party imports
+import numpy as np
+
+# Local imports
+from config.api_keys import pinecone_api_key
+from services.registry import register_service, get_service
+
+try:
+    import hnswlib  # Optional: approximate nearest neighbour graph for large local stores
+except ImportError:
+    hnswlib = None
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+VECTOR_STORE_BACKEND = os.environ.get('VECTOR_STORE_BACKEND', 'pinecone')  # 'pinecone' or 'local'
+VECTOR_STORE_PATH = os.environ.get('VECTOR_STORE_PATH', '.cache/vectors')
+PINECONE_INDEX_NAME = 'learning-objectives'
+UPSERT_BATCH_SIZE = 100
+UPSERT_POOL_THREADS = 4
+ANN_THRESHOLD = 50000  # Local stores with at least this many vectors use the HNSW graph when hnswlib is installed
+
+class VectorStore(ABC):
+    """
+    Interface shared by the vector store backends. Vectors are dictionaries with
+    `id`, `values` and `metadata`; query results have `id`, `score` and `metadata`.
+    `version` increases on every write, so callers can key cached query results on it.
+    """
+
+    version = 0
+
+    @abstractmethod
+    def upsert(self, vectors):
+        """
+        Inserts or replaces vectors.
+
+        :param vectors: List of vector dictionaries.
+        :return: List of vector IDs that could not be stored.
+        """
+
+    @abstractmethod
+    def delete(self, ids):
+        """
+        Deletes vectors by ID.
+
+        :param ids: List of vector IDs.
+        """
+
+    @abstractmethod
+    def query(self, vector, top_k=3):
+        """
+        Finds the vectors most similar to the given one by cosine similarity.
+
+        :param vector: The query embedding.
+        :param top_k: Number of results to return.
+        :return: List of results, best match first.
+        """
+
+class PineconeVectorStore(VectorStore):
+    """
+    Vector store backed by the remote Pinecone index.
+    """
+
+    def __init__(self, index_name=PINECONE_INDEX_NAME, pool_threads=UPSERT_POOL_THREADS):
+        from langchain.vectorstores import Pinecone
+        get_service('pinecone')
+        self.index = Pinecone.get_pinecone_index(index_name=index_name, pool_threads=pool_threads)
+
+    def upsert(self, vectors, batch_size=UPSERT_BATCH_SIZE):
+        """
+        Upserts vectors in chunks of batch_size, sending the chunks concurrently on the index's
+        pool threads. Vectors of a failed chunk are retried one at a time.
+        """
+        failed_ids = []
+        requests_in_flight = []
+        for start in range(0, len(vectors), batch_size):
+            chunk = vectors[start:start + batch_size]
+            try:
+                requests_in_flight.append((chunk, self.index.upsert(vectors=chunk, async_req=True)))
+            except Exception as e:
+                requests_in_flight.append((chunk, e))
+
+        for chunk, pending in requests_in_flight:
+            try:
+                if isinstance(pending, Exception):
+                    raise pending
+                pending.get()
+                logging.info(f"Upserted {len(chunk)} vectors")
+                continue
+            except Exception as e:
+                logging.warning(f"Upsert of {len(chunk)} vectors failed, retrying one by one: {e}")
+            for vector in chunk:
+                try:
+                    self.index.upsert(vectors=[vector])
+                except Exception as e:
+                    logging.error(f"Error upserting vector for video ID {vector['id']}: {e}")
+                    failed_ids.append(vector['id'])
+        self.version += 1
+        return failed_ids
+
+    def delete(self, ids):
+        self.index.delete(ids=list(ids))
+        self.version += 1
+
+    def query(self, vector, top_k=3):
+        query_result = self.index.query(vector=vector, top_k=top_k, include_metadata=True)
+        return [{
+            'id': match['id'],
+            'score': match['score'],
+            'metadata': (match['metadata'] if 'metadata' in match else None) or {}
+        } for match in query_result['matches']]
+
+class LocalVectorStore(VectorStore):
+    """
+    In-process vector store. Unit-normalized embeddings live in a memory-mapped float32
+    matrix so cosine similarity is one matrix-vector product; IDs and metadata are kept
+    in SQLite, one row per matrix row, so a write only touches the rows it changes.
+    Deleted rows are zeroed and reused by later inserts.
+
+    Single-process only: the matrix and the row table are loaded once, so two processes
+    writing the same path would overwrite each other's rows.
+    """
+
+    def __init__(self, path=VECTOR_STORE_PATH, ann_threshold=ANN_THRESHOLD):
+        self.path = path
+        self.ann_threshold = ann_threshold
+        self._lock = threading.RLock()
+        self._matrix_path = os.path.join(path, 'vectors.f32')
+        self._index_path = os.path.join(path, 'index.sqlite3')
+        self._ann = None
+        os.makedirs(path, exist_ok=True)
+        self._conn = sqlite3.connect(self._index_path, check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS vectors (row INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE, metadata TEXT NOT NULL)")
+        self._conn.commit()
+        self._load()
+
+    def _load(self):
+        settings = dict(self._conn.execute("SELECT name, value FROM settings"))
+        self.dimension = settings.get('dimension')
+        self._capacity = settings.get('capacity', 0)
+        rows = self._conn.execute("SELECT row, id, metadata FROM vectors").fetchall()
+        size = max((row for row, _, _ in rows), default=-1) + 1
+        self._ids = [None] * size  # Vector ID per row, None for free rows
+        self._metadata = [None] * size
+        for row, vector_id, metadata in rows:
+            self._ids[row] = vector_id
+            self._metadata[row] = json.loads(metadata)
+        self._matrix = (np.memmap(self._matrix_path, dtype=np.float32, mode='r+', shape=(self._capacity, self.dimension))
+                        if self._capacity else None)
+        self._rows = {vector_id: row for row, vector_id in enumerate(self._ids) if vector_id is not None}
+        self._free_rows = [row for row, vector_id in enumerate(self._ids) if vector_id is None]
+
+    def _save(self, changed_rows, deleted_ids=()):
+        # The matrix is flushed first, so a row in the table never points at vector data that was not written
+        self._matrix.flush()
+        with self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO settings VALUES (?, ?)",
+                                   [('dimension', self.dimension), ('capacity', self._capacity)])
+            self._conn.executemany("DELETE FROM vectors WHERE id = ?", [(vector_id,) for vector_id in deleted_ids])
+            self._conn.executemany("INSERT OR REPLACE INTO vectors VALUES (?, ?, ?)",
+                                   [(row, self._ids[row], json.dumps(self._metadata[row])) for row in changed_rows])
+
+    def _ensure_capacity(self, rows):
+        if rows <= self._capacity:
+            return
+        capacity = max(rows, self._capacity * 2, 1024)
+        temp_path = self._matrix_path + '.tmp'
+        matrix = np.memmap(temp_path, dtype=np.float32, mode='w+', shape=(capacity, self.dimension))
+        if self._matrix is not None:
+            matrix[:self._capacity] = self._matrix
+        matrix.flush()
+        self._matrix = None
+        os.replace(temp_path, self._matrix_path)
+        self._matrix = np.memmap(self._matrix_path, dtype=np.float32, mode='r+', shape=(capacity, self.dimension))
+        self._capacity = capacity
+
+    def __len__(self):
+        return len(self._rows)
+
+    def upsert(self, vectors):
+        failed_ids = []
+        changed_rows = set()
+        with self._lock:
+            for vector in vectors:
+                values = np.asarray(vector['values'], dtype=np.float32)
+                norm = np.linalg.norm(values)
+                if self.dimension is None:
+                    self.dimension = values.shape[0]
+                if values.shape != (self.dimension,) or not norm:
+                    logging.error(f"Invalid embedding for video ID {vector['id']}")
+                    failed_ids.append(vector['id'])
+                    continue
+
+                row = self._rows.get(vector['id'])
+                if row is None:
+                    if self._free_rows:
+                        row = self._free_rows.pop()
+                    else:
+                        row = len(self._ids)
+                        self._ensure_capacity(row + 1)
+                        self._ids.append(None)
+                        self._metadata.append(None)
+                    self._rows[vector['id']] = row
+                self._matrix[row] = values / norm
+                self._ids[row] = vector['id']
+                self._metadata[row] = vector.get('metadata') or {}
+                changed_rows.add(row)
+                if self._ann is not None:
+                    self._ann_add(row)
+            if changed_rows:
+                self._save(changed_rows)
+            self.version += 1
+        return failed_ids
+
+    def delete(self, ids):
+        with self._lock:
+            deleted_ids = []
+            for vector_id in ids:
+                row = self._rows.pop(vector_id, None)
+                if row is None:
+                    continue
+                self._matrix[row] = 0
+                self._ids[row] = None
+                self._metadata[row] = None
+                self._free_rows.append(row)
+                deleted_ids.append(vector_id)
+                if self._ann is not None:
+                    self._ann.mark_deleted(row)
+            if deleted_ids:
+                self._save((), deleted_ids)
+            self.version += 1
+
+    def _ann_add(self, row):
+        if row >= self._ann.get_max_elements():
+            self._ann.resize_index(max(row + 1, self._ann.get_max_elements() * 2))
+        self._ann.add_items(self._matrix[row:row + 1], [row])
+
+    def _build_ann(self):
+        rows = np.array(sorted(self._rows.values()), dtype=np.int64)
+        ann = hnswlib.Index(space='cosine', dim=self.dimension)
+        ann.init_index(max_elements=max(self._capacity, 1), ef_construction=200, M=16)
+        ann.add_items(self._matrix[rows], rows)
+        ann.set_ef(64)
+        self._ann = ann
+        logging.info(f"Built HNSW index over {len(rows)} local vectors")
+
+    def query(self, vector, top_k=3):
+        with self._lock:
+            if not self._rows:
+                return []
+            query_vector = np.asarray(vector, dtype=np.float32)
+            norm = np.linalg.norm(query_vector)
+            if query_vector.shape != (self.dimension,) or not norm:
+                raise ValueError(f"Query vector must be a non-zero vector of dimension {self.dimension}")
+            query_vector /= norm
+            top_k = min(top_k, len(self._rows))
+
+            if hnswlib is not None and len(self._rows) >= self.ann_threshold:
+                if self._ann is None:
+                    self._build_ann()
+                labels, distances = self._ann.knn_query(query_vector, k=top_k)
+                matches = zip(labels[0].tolist(), (1 - distances[0]).tolist())
+            else:
+                scores = self._matrix[:len(self._ids)] @ query_vector
+                if self._free_rows:
+                    scores[self._free_rows] = -np.inf
+                best = np.argpartition(-scores, top_k - 1)[:top_k]
+                best = best[np.argsort(-scores[best])]
+                matches = zip(best.tolist(), scores[best].tolist())
+
+            return [{'id': self._ids[row], 'score': float(score), 'metadata': self._metadata[row]} for row, score in matches]
+
+def _init_pinecone():
+    import pinecone
+
+    logging.info("Initializing Pinecone")
+    pinecone.init(api_key=pinecone_api_key, environment='gcp-starter')
+    existing_indexes = pinecone.list_indexes()
+
+    # Create Pinecone index if it doesn't exist
+    if PINECONE_INDEX_NAME not in existing_indexes:
+        logging.info(f"Creating new index: {PINECONE_INDEX_NAME}")
+        pinecone.create_index(PINECONE_INDEX_NAME, dimension=768, metric='cosine')
+    else:
+        logging.info(f"Index '{PINECONE_INDEX_NAME}' already exists.")
+    return pinecone
+
+def _create_vector_store():
+    if VECTOR_STORE_BACKEND == 'local':
+        vector_store = LocalVectorStore(VECTOR_STORE_PATH)
+    else:
+        vector_store = PineconeVectorStore(PINECONE_INDEX_NAME)
+    logging.info(f"Using {type(vector_store).__name__} for embeddings")
+    return vector_store
+
+register_service('pinecone', _init_pinecone)
+register_service('vector_store', _create_vector_store)
+
+def get_vector_store():
+    """
+    Returns the process-wide vector store selected by VECTOR_STORE_BACKEND, created on first use.
+
+    :return: A VectorStore instance.
+    """
+    return get_service('vector_store')
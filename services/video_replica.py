@@ -0,0 +1,340 @@
+# Standard library imports
+import datetime
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+# Local imports
+from services.registry import register_service, get_service
+from controllers.firestore_controller import iter_videos_from_firestore
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+VIDEO_REPLICA = os.environ.get('VIDEO_REPLICA', '1') not in ('0', 'false')
+VIDEO_REPLICA_PATH = os.environ.get('VIDEO_REPLICA_PATH', '.cache/video_replica.sqlite3')
+REPLICA_SYNC_INTERVAL_SECONDS = float(os.environ.get('REPLICA_SYNC_INTERVAL_SECONDS', 60))
+# Documents are queued with their last_updated before they are committed, so each sync
+# re-reads this window behind the cursor to catch commits that landed late
+REPLICA_SYNC_OVERLAP_SECONDS = float(os.environ.get('REPLICA_SYNC_OVERLAP_SECONDS', 60))
+# The background thread repairs the replica this often, which bounds how long the drift
+# sync() cannot see (late commits, upstream deletes) can last; 0 disables it
+REPLICA_REPAIR_INTERVAL_SECONDS = float(os.environ.get('REPLICA_REPAIR_INTERVAL_SECONDS', 6 * 3600))
+REPLICA_PAGE_SIZE = 500
+
+# Set after an ingest, so the next read syncs instead of waiting for the background sync
+_sync_requested = threading.Event()
+
+def _encode_value(value):
+    if isinstance(value, datetime.datetime):
+        return {'__datetime__': value.isoformat()}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def _decode_object(obj):
+    if len(obj) == 1 and '__datetime__' in obj:
+        return datetime.datetime.fromisoformat(obj['__datetime__'])
+    return obj
+
+def _pack(video_data):
+    return zlib.compress(json.dumps(video_data, default=_encode_value, separators=(',', ':')).encode('utf-8'))
+
+def _unpack(blob):
+    return json.loads(zlib.decompress(blob), object_hook=_decode_object)
+
+def _epoch(timestamp):
+    if not isinstance(timestamp, datetime.datetime):
+        return 0.0
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=datetime.timezone.utc)
+    return timestamp.timestamp()
+
+def _project(video_data, fields):
+    """
+    Keeps only the given dotted field paths of a video, the way a Firestore select() does.
+    """
+    projected = {}
+    for path in fields:
+        source, target = video_data, projected
+        parts = path.split('.')
+        for part in parts[:-1]:
+            source = source.get(part) if isinstance(source, dict) else None
+            if source is None:
+                break
+            target = target.setdefault(part, {})
+        else:
+            if isinstance(source, dict) and parts[-1] in source:
+                target[parts[-1]] = source[parts[-1]]
+    projected['video_id'] = video_data['video_id']
+    return projected
+
+class VideoReplica:
+    """
+    Local read replica of the youtube_videos collection: zlib-compressed JSON documents in
+    SQLite, plus an in-memory index of video ID -> last_updated. sync() pulls only the
+    documents whose last_updated moved past the cursor; check_consistency() compares the
+    index with the IDs and timestamps in Firestore, and resync() rebuilds from scratch.
+    start_maintenance() runs sync and repair on a background thread.
+    """
+
+    def __init__(self, path=VIDEO_REPLICA_PATH, overlap_seconds=REPLICA_SYNC_OVERLAP_SECONDS):
+        self.path = path
+        self.overlap_seconds = overlap_seconds
+        self.last_synced = None  # Wall clock time of the last successful sync
+        self.last_repaired = None  # Wall clock time of the last background repair
+        self._maintenance = None  # The background sync thread, once started
+        self._lock = threading.Lock()  # Guards the connection and the index
+        self._sync_lock = threading.Lock()  # One sync at a time
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS videos (video_id TEXT PRIMARY KEY, last_updated REAL NOT NULL, data BLOB NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS videos_last_updated ON videos (last_updated, video_id)")
+        self._conn.commit()
+        self._index = dict(self._conn.execute("SELECT video_id, last_updated FROM videos"))
+        logging.info(f"Loaded video replica with {len(self._index)} documents")
+
+    def __len__(self):
+        return len(self._index)
+
+    def _store(self, videos):
+        rows = [(video['video_id'], _epoch(video.get('last_updated')), _pack(video)) for video in videos]
+        with self._lock:
+            with self._conn:
+                self._conn.executemany("INSERT OR REPLACE INTO videos VALUES (?, ?, ?)", rows)
+            self._index.update((video_id, last_updated) for video_id, last_updated, _ in rows)
+        return len(rows)
+
+    def _remove(self, video_ids):
+        with self._lock:
+            with self._conn:
+                self._conn.executemany("DELETE FROM videos WHERE video_id = ?", [(video_id,) for video_id in video_ids])
+            for video_id in video_ids:
+                self._index.pop(video_id, None)
+
+    def _pull(self, since=None):
+        pulled, page = 0, []
+        for video in iter_videos_from_firestore(page_size=REPLICA_PAGE_SIZE, since=since):
+            page.append(video)
+            if len(page) >= REPLICA_PAGE_SIZE:
+                pulled += self._store(page)
+                page = []
+        return pulled + self._store(page)
+
+    def sync(self):
+        """
+        Pulls the documents updated since the last sync, minus the overlap window.
+
+        The cursor only sees documents by last_updated, so two kinds of drift get through:
+        documents committed more than overlap_seconds after their last_updated, and
+        documents deleted upstream. Both stay until check_consistency(repair=True) runs,
+        which the background thread does every REPLICA_REPAIR_INTERVAL_SECONDS.
+
+        :return: Number of documents pulled.
+        """
+        with self._sync_lock:
+            started = time.time()
+            with self._lock:
+                cursor = max(self._index.values(), default=None)
+            since = (datetime.datetime.fromtimestamp(cursor - self.overlap_seconds, datetime.timezone.utc)
+                     if cursor else None)
+            pulled = self._pull(since)
+            self.last_synced = started
+            logging.info(f"Video replica synced {pulled} documents" + (f" updated since {since.isoformat()}" if since else ""))
+            return pulled
+
+    def start_maintenance(self, interval=REPLICA_SYNC_INTERVAL_SECONDS, repair_interval=REPLICA_REPAIR_INTERVAL_SECONDS):
+        """
+        Starts the background thread that syncs right away, then every interval seconds, and
+        repairs every repair_interval seconds. Does nothing if the thread is already running.
+        """
+        with self._lock:
+            if self._maintenance is not None:
+                return
+            self._maintenance = threading.Thread(target=self._maintain, args=(interval, repair_interval),
+                                                 name='video-replica-sync', daemon=True)
+        self._maintenance.start()
+
+    def _maintain(self, interval, repair_interval):
+        last_repair = time.time()
+        while True:
+            try:
+                if repair_interval and time.time() - last_repair >= repair_interval:
+                    report = self.check_consistency(repair=True)
+                    last_repair = self.last_repaired = time.time()
+                    if not report['consistent']:
+                        logging.warning(f"Video replica repaired {len(report['missing'])} missing, {len(report['extra'])} extra "
+                                        f"and {len(report['outdated'])} outdated documents")
+                else:
+                    self.sync()
+            except Exception as e:
+                logging.error(f"Background video replica sync failed: {e}", exc_info=True)
+            time.sleep(interval)
+
+    def resync(self):
+        """
+        Drops every local document and copies the whole collection again.
+
+        :return: Number of documents copied.
+        """
+        with self._sync_lock:
+            started = time.time()
+            with self._lock:
+                with self._conn:
+                    self._conn.execute("DELETE FROM videos")
+                self._index.clear()
+            copied = self._pull()
+            self.last_synced = started
+            logging.info(f"Video replica resynced with {copied} documents")
+            return copied
+
+    def check_consistency(self, repair=False):
+        """
+        Compares the replica with Firestore, reading only each document's ID and last_updated.
+
+        :param repair: Remove documents deleted upstream and re-pull missing or outdated ones.
+        :return: Dictionary with the document counts and the IDs missing, extra or outdated locally.
+        """
+        remote = {video['video_id']: _epoch(video.get('last_updated'))
+                  for video in iter_videos_from_firestore(page_size=REPLICA_PAGE_SIZE, fields=['last_updated'])}
+        with self._lock:
+            local = dict(self._index)
+        report = {
+            'remote_count': len(remote),
+            'local_count': len(local),
+            'missing': sorted(set(remote) - set(local)),
+            'extra': sorted(set(local) - set(remote)),
+            'outdated': sorted(video_id for video_id, last_updated in remote.items()
+                               if video_id in local and local[video_id] < last_updated),
+        }
+        report['consistent'] = not (report['missing'] or report['extra'] or report['outdated'])
+        if repair and not report['consistent']:
+            with self._sync_lock:
+                self._remove(report['extra'])
+                # The repair pull is bounded by the oldest document that needs it
+                stale = [remote[video_id] for video_id in report['missing'] + report['outdated']]
+                if stale:
+                    self._pull(datetime.datetime.fromtimestamp(min(stale) - 1, datetime.timezone.utc))
+        return report
+
+    def iter_videos(self, fields=None, since=None):
+        """
+        Yields the replicated videos, in the same order and shape as iter_videos_from_firestore.
+
+        :param fields: Optional list of field paths to keep.
+        :param since: Optional datetime; only videos with a later `last_updated` are returned.
+        :return: A generator of video data dictionaries.
+        """
+        if fields and since is not None:
+            # As in iter_videos_from_firestore, where paging by last_updated needs it in the projection
+            fields = list(dict.fromkeys([*fields, 'last_updated']))
+        # Keyset paging, so a slow consumer never holds the lock between pages
+        if since is None:
+            query = "SELECT video_id, data FROM videos WHERE video_id > ? ORDER BY video_id LIMIT ?"
+            position = ('',)
+        else:
+            query = ("SELECT video_id, data, last_updated FROM videos WHERE last_updated > ? AND (last_updated, video_id) > (?, ?) "
+                     "ORDER BY last_updated, video_id LIMIT ?")
+            position = (_epoch(since), '')
+        while True:
+            with self._lock:
+                parameters = position if since is None else (_epoch(since),) + position
+                rows = self._conn.execute(query, parameters + (REPLICA_PAGE_SIZE,)).fetchall()
+            for row in rows:
+                video_data = _unpack(row[1])
+                yield _project(video_data, fields) if fields else video_data
+            if len(rows) < REPLICA_PAGE_SIZE:
+                return
+            position = (rows[-1][0],) if since is None else (rows[-1][2], rows[-1][0])
+
+    def status(self):
+        """
+        Returns the document count, the newest last_updated and when the replica was last synced and repaired.
+        """
+        with self._lock:
+            count = len(self._index)
+            cursor = max(self._index.values(), default=None)
+        return {
+            'documents': count,
+            'newest_update': datetime.datetime.fromtimestamp(cursor, datetime.timezone.utc).isoformat() if cursor else None,
+            'last_synced': datetime.datetime.fromtimestamp(self.last_synced, datetime.timezone.utc).isoformat() if self.last_synced else None,
+            'last_repaired': datetime.datetime.fromtimestamp(self.last_repaired, datetime.timezone.utc).isoformat() if self.last_repaired else None,
+        }
+
+register_service('video_replica', lambda: VideoReplica(VIDEO_REPLICA_PATH))
+
+def get_video_replica():
+    """
+    Returns the process-wide video replica, loading it on first use.
+    """
+    return get_service('video_replica')
+
+def start_background_sync():
+    """
+    Loads the replica and starts its background sync on a daemon thread, so the first
+    reads after startup find it warm. Called at startup when REPLICA_SYNC_AT_STARTUP is
+    set; failures are logged and left for the first read to retry.
+    """
+    def warm_up():
+        try:
+            get_video_replica().start_maintenance()
+        except Exception as e:
+            logging.error(f"Failed to start the video replica: {e}", exc_info=True)
+
+    if VIDEO_REPLICA:
+        threading.Thread(target=warm_up, name='video-replica-warm-up', daemon=True).start()
+
+def request_sync():
+    """
+    Makes the next read sync the replica first. Called after writes to youtube_videos; costs nothing until then.
+    """
+    _sync_requested.set()
+
+def iter_videos(fields=None, since=None):
+    """
+    Yields every stored video for the read endpoints from the local replica, which a
+    background thread keeps in sync. Until that thread's first sync after startup
+    finishes, and whenever the replica is disabled or unavailable, reads go straight
+    to Firestore instead, so no request ever waits for a full copy of the collection.
+
+    :param fields: Optional list of field paths to keep.
+    :param since: Optional datetime; only videos with a later `last_updated` are returned.
+    :return: A generator of video data dictionaries.
+    """
+    if VIDEO_REPLICA:
+        try:
+            replica = get_video_replica()
+            replica.start_maintenance()
+            if replica.last_synced is not None:
+                if _sync_requested.is_set():
+                    # Incremental, so an ingest is visible to the next read
+                    _sync_requested.clear()
+                    replica.sync()
+                return replica.iter_videos(fields=fields, since=since)
+            logging.info("Video replica still warming up, reading from Firestore")
+        except Exception as e:
+            logging.error(f"Video replica unavailable, reading from Firestore: {e}", exc_info=True)
+    return iter_videos_from_firestore(fields=fields, since=since)
+
+if __name__ == '__main__':
+    # Maintenance: python -m services.video_replica [--check [--repair] | --resync]
+    import argparse
+    parser = argparse.ArgumentParser(description='Maintain the local replica of the youtube_videos collection.')
+    parser.add_argument('--check', action='store_true', help='Compare the replica with Firestore')
+    parser.add_argument('--repair', action='store_true', help='With --check, fix the differences found')
+    parser.add_argument('--resync', action='store_true', help='Rebuild the replica from the whole collection')
+    args = parser.parse_args()
+    replica = VideoReplica(VIDEO_REPLICA_PATH)
+    if args.resync:
+        print(f"Copied {replica.resync()} documents")
+    elif args.check:
+        report = replica.check_consistency(repair=args.repair)
+        print(json.dumps({name: value if not isinstance(value, list) else {'count': len(value), 'ids': value[:20]}
+                          for name, value in report.items()}, indent=2))
+    else:
+        print(f"Pulled {replica.sync()} documents")
+        print(json.dumps(replica.status(), indent=2))
@@ -26,15 +26,59 @@ function uploadFile(formElement) {
       console.log("Upload response:", data);
       if (data.error) {
           alert("Upload Error: " + data.error);
+          hideLoader(loader);
+      } else if (data.job_id) {
+          followProgress(data.job_id, loader);
       } else {
-          alert('File processed successfully!');
+          alert(data.message);
+          hideLoader(loader);
       }
   })
   .catch(error => {
       console.error('Error:', error);
       alert('Error occurred: ' + error.message);
-  })
-  .finally(() => hideLoader(loader));
+      hideLoader(loader);
+  });
+}
+
+function followProgress(jobId, loader) {
+  const progressElement = document.getElementById('upload-progress');
+  const source = new EventSource('/progress/stream?job_id=' + encodeURIComponent(jobId));
+
+  source.onmessage = function(event) {
+      const job = JSON.parse(event.data);
+      updateProgress(progressElement, job);
+      if (job.state === 'done' || job.state === 'failed') {
+          source.close();
+          hideLoader(loader);
+          if (job.state === 'done') {
+              alert('File processed successfully!');
+          } else {
+              alert('Processing Error: ' + job.error);
+          }
+      }
+  };
+
+  source.onerror = function() {
+      // The browser reconnects on its own; only give up once the stream is closed
+      if (source.readyState === EventSource.CLOSED) {
+          hideLoader(loader);
+      }
+  };
+}
+
+function updateProgress(progressElement, job) {
+  if (!progressElement) {
+      return;
+  }
+  let text = `${job.state}: ${job.done} / ${job.total} videos (${job.progress.toFixed(1)}%)`;
+  if (job.throughput) {
+      text += `, ${job.throughput.toFixed(1)} videos/s`;
+  }
+  if (job.eta_seconds !== null) {
+      text += `, about ${Math.ceil(job.eta_seconds)}s left`;
+  }
+  progressElement.textContent = text;
 }
 
 
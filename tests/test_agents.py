@@ -0,0 +1,79 @@
+# Standard library imports
+import json
+import queue
+import threading
+import urllib.request
+
+# Third-party imports
+import pytest
+
+# Local imports
+from benchmarks.fakes import serve_fake_http
+from services import registry
+from utils import agents
+from utils.agents import SummaryCache, SUMMARIZER_MODEL, SUMMARIZER_PROMPT, SUMMARIZER_BATCH_PROMPT
+from utils.openai_client import ChatClient
+
+@pytest.fixture(scope='module')
+def fake_openai():
+    """
+    Runs the fake OpenAI API on a daemon thread and returns its port.
+    """
+    ready = queue.Queue()
+    threading.Thread(target=serve_fake_http, args=('openai', 0, 0.0, ready), daemon=True).start()
+    return ready.get(timeout=10)
+
+@pytest.fixture
+def summarizer(fake_openai, tmp_path, monkeypatch):
+    """
+    Points the summarizer at the fake API with an empty summary cache.
+    """
+    monkeypatch.setitem(registry._instances, 'openai', ChatClient(api_key='test', base_url=f'http://127.0.0.1:{fake_openai}/v1'))
+    cache = SummaryCache(str(tmp_path / 'summaries.sqlite3'))
+    monkeypatch.setattr(agents, 'summary_cache', cache)
+    return cache
+
+def chat_calls(port):
+    with urllib.request.urlopen(f'http://127.0.0.1:{port}/_stats') as response:
+        return json.load(response)['calls'].get('/v1/chat/completions', 0)
+
+@pytest.mark.usefixtures('summarizer')
+def test_short_descriptions_are_batched_in_order(fake_openai):
+    descriptions = [f'Video number {index} about cooking pasta' for index in range(10)]
+    before = chat_calls(fake_openai)
+    summaries = agents.agent_summarizer_batch(descriptions)
+    assert summaries == [f'Summary: {description}' for description in descriptions]
+    # BATCH_MAX_ITEMS descriptions per request
+    assert chat_calls(fake_openai) - before == 2
+
+@pytest.mark.usefixtures('summarizer')
+def test_duplicates_and_cached_descriptions_are_not_resent(fake_openai):
+    descriptions = ['Same description', 'Other description', 'Same description']
+    first = agents.agent_summarizer_batch(descriptions)
+    assert first[0] == first[2] == 'Summary: Same description'
+    before = chat_calls(fake_openai)
+    assert agents.agent_summarizer_batch(descriptions) == first
+    assert chat_calls(fake_openai) == before
+
+def test_batch_summaries_do_not_fill_the_single_prompt_key(summarizer):
+    description = 'A description summarized in a batch'
+    agents.agent_summarizer_batch([description, 'Another description'])
+    assert summarizer.get(SummaryCache.key(SUMMARIZER_MODEL, SUMMARIZER_PROMPT, description)) is None
+    assert summarizer.get(SummaryCache.key(SUMMARIZER_MODEL, SUMMARIZER_BATCH_PROMPT, description)) == f'Summary: {description}'
+
+def test_long_descriptions_are_summarized_alone(summarizer, fake_openai):
+    long_description = 'word ' * (agents.BATCH_DESCRIPTION_MAX_TOKENS * 4)
+    before = chat_calls(fake_openai)
+    summaries = agents.agent_summarizer_batch([long_description, 'Short one'])
+    assert summaries[0] == f'Summary: {long_description[:80]}'
+    assert summaries[1] == 'Summary: Short one'
+    assert chat_calls(fake_openai) - before == 2
+    assert summarizer.get(SummaryCache.key(SUMMARIZER_MODEL, SUMMARIZER_PROMPT, long_description)) == summaries[0]
+
+def test_call_counter_counts_requests(summarizer, fake_openai):
+    descriptions = [f'Counted description {index}' for index in range(10)] + ['word ' * (agents.BATCH_DESCRIPTION_MAX_TOKENS * 4)]
+    calls_before, requests_before = summarizer.stats()['calls'], chat_calls(fake_openai)
+    agents.agent_summarizer_batch(descriptions)
+    # Two batches of short descriptions and one long description on its own
+    assert chat_calls(fake_openai) - requests_before == 3
+    assert summarizer.stats()['calls'] - calls_before == 3
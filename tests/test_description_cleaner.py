@@ -0,0 +1,50 @@
+# Local imports
+from utils.description_cleaner import BoilerplateStore, clean_descriptions, truncate_to_budget, _strip_noise
+
+def details(channel_id, description, title='A video'):
+    return {'snippet': {'channelId': channel_id, 'title': title, 'description': description}}
+
+def test_chapter_timestamps_are_stripped_at_line_start():
+    assert _strip_noise('0:00 Intro') == 'Intro'
+    assert _strip_noise('01:02:03 - Deep dive') == 'Deep dive'
+    assert _strip_noise('[12:34] Q&A') == 'Q&A'
+    assert _strip_noise('  (3:15) | Outro') == 'Outro'
+
+def test_times_inside_a_line_are_kept():
+    assert _strip_noise('The launch starts at 7:30 tomorrow') == 'The launch starts at 7:30 tomorrow'
+    assert _strip_noise('Aspect ratio 16:9 and a 3:45 runtime') == 'Aspect ratio 16:9 and a 3:45 runtime'
+
+def test_urls_and_hashtags_are_stripped():
+    assert _strip_noise('Follow me: https://example.com/me #python #tips') == 'Follow me'
+    assert _strip_noise('See www.example.com for more') == 'See for more'
+
+def test_channel_boilerplate_is_dropped_once_learned(tmp_path):
+    store = BoilerplateStore(str(tmp_path / 'boilerplate.sqlite3'), min_videos=3, min_share=0.5)
+    footer = 'Subscribe for more videos every week!'
+    videos = {f'v{number}': details('channel', f'Topic number {number} explained.\n{footer}') for number in range(4)}
+    cleaned, tokens_before, tokens_after = clean_descriptions(videos, store=store)
+    assert cleaned['v0'] == 'Topic number 0 explained.'
+    assert tokens_after < tokens_before
+
+def test_boilerplate_is_per_channel(tmp_path):
+    store = BoilerplateStore(str(tmp_path / 'boilerplate.sqlite3'), min_videos=3, min_share=0.5)
+    footer = 'Thanks for watching'
+    videos = {f'a{number}': details('channel-a', f'Episode {number}\n{footer}') for number in range(3)}
+    videos['b0'] = details('channel-b', f'Something else\n{footer}')
+    cleaned, _, _ = clean_descriptions(videos, store=store)
+    assert cleaned['a0'] == 'Episode 0'
+    assert cleaned['b0'] == f'Something else\n{footer}'
+
+def test_videos_are_counted_once_per_channel(tmp_path):
+    store = BoilerplateStore(str(tmp_path / 'boilerplate.sqlite3'), min_videos=3, min_share=0.5)
+    video = {'v0': details('channel', 'Only line')}
+    for _ in range(3):
+        cleaned, _, _ = clean_descriptions(video, store=store)
+    assert cleaned['v0'] == 'Only line'
+
+def test_truncate_to_budget_cuts_at_a_word_boundary():
+    text = 'word ' * 100
+    truncated = truncate_to_budget(text, max_tokens=10)
+    assert len(truncated) <= 40
+    assert not truncated.endswith('wor')
+    assert truncate_to_budget('short', max_tokens=10) == 'short'
@@ -0,0 +1,18 @@
+# Local imports
+from utils.metrics import Gauge, _format_value
+
+def test_integral_and_fractional_values():
+    assert _format_value(3) == '3'
+    assert _format_value(3.0) == '3'
+    assert _format_value(0.25) == '0.25'
+
+def test_non_finite_values_use_exposition_spellings():
+    assert _format_value(float('inf')) == '+Inf'
+    assert _format_value(float('-inf')) == '-Inf'
+    assert _format_value(float('nan')) == 'NaN'
+
+def test_gauge_renders_non_finite_values():
+    gauge = Gauge('test_non_finite_gauge', 'Gauge with non-finite values.', ['kind'])
+    gauge.set(float('nan'), kind='ratio')
+    gauge.set(float('inf'), kind='limit')
+    assert gauge._samples() == ['test_non_finite_gauge{kind="limit"} +Inf', 'test_non_finite_gauge{kind="ratio"} NaN']
@@ -0,0 +1,63 @@
+# Standard library imports
+import os
+import stat
+import sys
+import time
+
+# Local imports
+from controllers.subprocess_controller import iter_youtube_ids
+
+FAKE_YT_DLP = """#!{python}
+import sys
+with open({runs!r}, 'a') as runs:
+    runs.write('run\\n')
+{body}
+"""
+
+def install_fake_yt_dlp(tmp_path, monkeypatch, body):
+    """
+    Puts an executable `yt-dlp` on PATH that records each run and then executes body.
+    """
+    runs = tmp_path / 'runs.log'
+    script = tmp_path / 'yt-dlp'
+    script.write_text(FAKE_YT_DLP.format(python=sys.executable, runs=str(runs), body=body))
+    script.chmod(script.stat().st_mode | stat.S_IXUSR)
+    monkeypatch.setenv('PATH', f"{tmp_path}{os.pathsep}{os.environ.get('PATH', '')}")
+    return runs
+
+def run_count(runs):
+    return len(runs.read_text().splitlines()) if runs.exists() else 0
+
+def test_failing_yt_dlp_stops_after_consecutive_failures(tmp_path, monkeypatch):
+    runs = install_fake_yt_dlp(tmp_path, monkeypatch, "sys.stderr.write('ERROR: cookies expired\\n')\nsys.exit(1)")
+    failures = []
+    started = time.monotonic()
+    ids = list(iter_youtube_ids('cookies', window_size=5, workers=2, timeout=5, failures=failures, max_consecutive_failures=3))
+    assert ids == []
+    assert time.monotonic() - started < 10
+    # Workers already past next_window() may finish one more run each
+    assert 3 <= run_count(runs) <= 4
+    assert len(failures) == run_count(runs)
+    assert 'cookies expired' in failures[0]
+
+def test_timed_out_windows_stop_extraction(tmp_path, monkeypatch):
+    runs = install_fake_yt_dlp(tmp_path, monkeypatch, "import time\ntime.sleep(30)")
+    failures = []
+    ids = list(iter_youtube_ids('cookies', window_size=5, workers=1, timeout=0.5, failures=failures, max_consecutive_failures=2))
+    assert ids == []
+    assert run_count(runs) == 2
+    assert all('timed out' in failure for failure in failures)
+
+def test_short_window_ends_history(tmp_path, monkeypatch):
+    # Prints one ID per requested entry, up to a history of 12 entries
+    runs = install_fake_yt_dlp(tmp_path, monkeypatch, (
+        "start = int(sys.argv[sys.argv.index('--playlist-start') + 1])\n"
+        "end = int(sys.argv[sys.argv.index('--playlist-end') + 1])\n"
+        "for entry in range(start, min(end, 12) + 1):\n"
+        "    print(f'video{entry}')"
+    ))
+    failures = []
+    ids = list(iter_youtube_ids('cookies', window_size=5, workers=1, timeout=5, failures=failures))
+    assert sorted(ids) == sorted(f'video{entry}' for entry in range(1, 13))
+    assert run_count(runs) == 3
+    assert failures == []
@@ -0,0 +1,83 @@
+# Standard library imports
+import threading
+import time
+
+# Local imports
+from utils.ttl_cache import TTLCache
+
+def test_concurrent_misses_compute_once():
+    cache = TTLCache()
+    calls = []
+    started, release = threading.Event(), threading.Event()
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 'value'
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(cache.get_or_compute('key', compute)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(cache.get_or_compute('key', compute))) for _ in range(8)]
+    for thread in followers:
+        thread.start()
+    # Every follower waits on the leader's computation before it finishes
+    deadline = time.monotonic() + 5
+    while cache.stats()['coalesced'] < 8 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join()
+    assert results == ['value'] * 9
+    assert len(calls) == 1
+    assert cache.stats()['coalesced'] == 8
+
+def test_miss_racing_a_finished_leader_uses_its_value():
+    class RacingCache(TTLCache):
+        # The caller's first lookup missed just before the leader stored the value
+        def get(self, key, default=None):
+            with self._lock:
+                self._misses += 1
+            return default
+
+    cache = RacingCache()
+    cache.put('key', 'value')
+
+    def compute():
+        raise AssertionError('recomputed a stored value')
+
+    assert cache.get_or_compute('key', compute) == 'value'
+    assert cache.stats()['coalesced'] == 1
+
+def test_failed_computation_is_raised_to_every_waiter_and_not_cached():
+    cache = TTLCache()
+    started, release = threading.Event(), threading.Event()
+
+    def compute():
+        started.set()
+        release.wait(5)
+        raise ValueError('boom')
+
+    errors = []
+
+    def call():
+        try:
+            cache.get_or_compute('key', compute)
+        except ValueError as e:
+            errors.append(str(e))
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=call)
+    follower.start()
+    deadline = time.monotonic() + 5
+    while not cache.stats()['coalesced'] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for thread in (leader, follower):
+        thread.join()
+    assert errors == ['boom', 'boom']
+    assert cache.get_or_compute('key', lambda: 'value') == 'value'
@@ -1,11 +1,22 @@
 # Standard library imports
+import hashlib
+import json
 import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 # Third-party imports
 import openai
 
 # Local imports
 from config.api_keys import oai_api_key
+from services.registry import register_service, get_service
+from utils.openai_client import get_chat_client, estimate_text_tokens, OPENAI_CONCURRENCY
+from utils.metrics import errors_total, openai_request_seconds, openai_tokens_total
 
 # Configure logging with structured formatting
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -13,6 +24,147 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(level
 # Initialize the OpenAI client with API key
 openai.api_key = oai_api_key
 
+SUMMARIZER_MODEL = "gpt-3.5-turbo"
+SUMMARIZER_PROMPT = "Provide a short summary of the following YouTube video description. The summary should be concise.\nDescription:"
+SUMMARY_CACHE_PATH = os.environ.get('SUMMARY_CACHE_PATH', '.cache/summaries.sqlite3')
+SUMMARY_CACHE_MEMORY_ENTRIES = 4096
+SUMMARIZER_BATCH_PROMPT = (
+    "Provide a short summary of each of the following YouTube video descriptions. The summaries should be concise.\n"
+    "The descriptions are given as a JSON array of objects with an id and a description. Reply with a JSON object "
+    "of the form {\"summaries\": [{\"id\": <id>, \"summary\": <summary>}]} with one entry per description."
+)
+# Descriptions up to this many tokens are packed together into one request
+BATCH_DESCRIPTION_MAX_TOKENS = 250
+BATCH_MAX_ITEMS = 8
+BATCH_MAX_TOKENS = 2000
+
+class SummaryCache:
+    """
+    Content-addressed summary cache: an in-memory LRU tier in front of a SQLite tier.
+    Keys hash the model, prompt and normalized description, so identical descriptions
+    are summarized only once across uploads and restarts.
+    """
+
+    def __init__(self, path, memory_entries=SUMMARY_CACHE_MEMORY_ENTRIES):
+        self.path = path
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()  # key -> (summary, tokens)
+        self._conn = None
+        self._lock = threading.Lock()
+        self._counters = {'calls': 0, 'memory_hits': 0, 'disk_hits': 0, 'tokens_used': 0, 'tokens_saved': 0}
+
+    @staticmethod
+    def key(model, prompt, text):
+        normalized = " ".join(text.split())
+        return hashlib.sha256(json.dumps([model, prompt, normalized]).encode('utf-8')).hexdigest()
+
+    def _connection(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute("CREATE TABLE IF NOT EXISTS summaries (key TEXT PRIMARY KEY, summary TEXT NOT NULL, tokens INTEGER)")
+            self._conn.commit()
+        return self._conn
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        """
+        Returns the cached summary for a key, or None.
+        """
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                summary, tokens = self._memory[key]
+                self._counters['memory_hits'] += 1
+            else:
+                row = self._connection().execute("SELECT summary, tokens FROM summaries WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                summary, tokens = row
+                self._remember(key, (summary, tokens))
+                self._counters['disk_hits'] += 1
+            self._counters['tokens_saved'] += tokens or 0
+            return summary
+
+    def put(self, key, summary, tokens, count_call=True):
+        """
+        Stores a freshly generated summary and the tokens it cost.
+
+        :param count_call: Count the summary as one GPT call; batch requests pass False and call record_call() once instead.
+        """
+        with self._lock:
+            if count_call:
+                self._counters['calls'] += 1
+            self._counters['tokens_used'] += tokens or 0
+            self._remember(key, (summary, tokens))
+            conn = self._connection()
+            conn.execute("INSERT OR REPLACE INTO summaries VALUES (?, ?, ?)", (key, summary, tokens))
+            conn.commit()
+
+    def record_call(self):
+        """
+        Counts one GPT call whose summaries were stored with count_call=False.
+        """
+        with self._lock:
+            self._counters['calls'] += 1
+
+    def stats(self):
+        """
+        Returns cumulative counters; callers diff two snapshots for per-run numbers.
+        """
+        with self._lock:
+            stats = dict(self._counters)
+        stats['calls_saved'] = stats['memory_hits'] + stats['disk_hits']
+        return stats
+
+summary_cache = SummaryCache(SUMMARY_CACHE_PATH)
+
+def _create_embedding_client():
+    # langchain is slow to import, so it is only loaded once embeddings are needed
+    from langchain.embeddings.openai import OpenAIEmbeddings
+    return OpenAIEmbeddings(openai_api_key=openai.api_key)
+
+register_service('embeddings', _create_embedding_client)
+
+def get_embedding_client():
+    """
+    Returns the process-wide OpenAIEmbeddings client, creating it on first use.
+    """
+    return get_service('embeddings')
+
+def get_summary_stats():
+    """
+    Returns cumulative summary cache counters (GPT calls made and saved, tokens used and saved).
+
+    :return: Dictionary of counters.
+    """
+    return summary_cache.stats()
+
+def _chat_completion(model, messages, **kwargs):
+    """
+    Sends a chat completion request through the shared rate-limited client.
+
+    :return: Tuple of (content or None, total tokens used or 0).
+    """
+    started = time.perf_counter()
+    try:
+        content, tokens = get_chat_client().complete(model, messages, **kwargs)
+    except Exception:
+        errors_total.inc(service='openai', stage='chat')
+        raise
+    finally:
+        # Includes rate-limit waits and retries: this is the latency the caller sees
+        openai_request_seconds.observe(time.perf_counter() - started, model=model)
+    openai_tokens_total.inc(tokens, model=model)
+    return content, tokens
+
 def openai_chat_completions(model, messages):
     """
     Utility function to interact with OpenAI's chat API.
@@ -22,11 +174,7 @@ def openai_chat_completions(model, messages):
     :return: The content of the response or None if an error occurs.
     """
     try:
-        response = openai.chat.completions.create(
-            model=model,
-            messages=messages
-        )
-        return response.choices[0].message.content if response.choices else None
+        return _chat_completion(model, messages)[0]
     except Exception as e:
         logging.error("Error in OpenAI interaction", exc_info=True)
         return None
@@ -34,18 +182,27 @@ def openai_chat_completions(model, messages):
 def agent_summarizer(description):
     """
     Generate a summary for a given video description using OpenAI's GPT-3.5 Turbo model.
+    Summaries are memoized in the summary cache, so a description is only sent once.
 
     :param description: A string representing the YouTube video description.
     :return: A string summary of the description.
     """
     try:
-        model = "gpt-3.5-turbo"
-        prompt = "Provide a short summary of the following YouTube video description. The summary should be concise.\nDescription:"
-        messages = [{"role": "system", "content": prompt}, {"role": "user", "content": description}]
+        description = description or ''
+        key = SummaryCache.key(SUMMARIZER_MODEL, SUMMARIZER_PROMPT, description)
+        cached = summary_cache.get(key)
+        if cached is not None:
+            return cached
 
-        result = openai_chat_completions(model, messages)
+        messages = [{"role": "system", "content": SUMMARIZER_PROMPT}, {"role": "user", "content": description}]
+        try:
+            result, tokens = _chat_completion(SUMMARIZER_MODEL, messages)
+        except Exception as e:
+            logging.error("Error in OpenAI interaction", exc_info=True)
+            result, tokens = None, 0
 
         if result:
+            summary_cache.put(key, result, tokens)
             logging.info(f"Summary generated successfully for description: {description[:50]}...")
             return result
         else:
@@ -55,6 +212,92 @@ def agent_summarizer(description):
         logging.error("Error in agent_summarizer", exc_info=True)
         return "An error occurred during summary generation."
 
+def _pack_batches(pending):
+    """
+    Groups (key, description) pairs into requests: short descriptions are packed up to
+    BATCH_MAX_ITEMS and BATCH_MAX_TOKENS per request, longer ones go alone.
+    """
+    batches, batch, batch_tokens = [], [], 0
+    for key, description in pending:
+        tokens = estimate_text_tokens(description)
+        if tokens > BATCH_DESCRIPTION_MAX_TOKENS:
+            batches.append([(key, description)])
+            continue
+        if batch and (len(batch) >= BATCH_MAX_ITEMS or batch_tokens + tokens > BATCH_MAX_TOKENS):
+            batches.append(batch)
+            batch, batch_tokens = [], 0
+        batch.append((key, description))
+        batch_tokens += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+def _summarize_batch(batch):
+    """
+    Summarizes several descriptions with one request. Summaries are cached under the batch
+    prompt's key, so they never stand in for a single-prompt summary of the same text.
+
+    :return: Dictionary of key -> summary for the descriptions the reply covered.
+    """
+    items = [{'id': index, 'description': description} for index, (_, description) in enumerate(batch)]
+    messages = [{"role": "system", "content": SUMMARIZER_BATCH_PROMPT},
+                {"role": "user", "content": json.dumps(items, ensure_ascii=False)}]
+    try:
+        content, tokens = _chat_completion(SUMMARIZER_MODEL, messages, response_format={"type": "json_object"})
+        entries = json.loads(content or '{}').get('summaries', [])
+    except Exception as e:
+        logging.error(f"Error summarizing a batch of {len(batch)} descriptions: {e}", exc_info=True)
+        return {}
+
+    summaries = {}
+    for entry in entries if isinstance(entries, list) else []:
+        index = entry.get('id') if isinstance(entry, dict) else None
+        if isinstance(index, int) and 0 <= index < len(batch) and isinstance(entry.get('summary'), str) and entry['summary']:
+            summaries[batch[index][0]] = entry['summary']
+    summary_cache.record_call()
+    for key, description in batch:
+        if key in summaries:
+            summary_cache.put(SummaryCache.key(SUMMARIZER_MODEL, SUMMARIZER_BATCH_PROMPT, description), summaries[key],
+                              tokens // len(batch), count_call=False)
+    logging.info(f"Summarized {len(summaries)} of {len(batch)} descriptions in one request")
+    return summaries
+
+_summary_pool = ThreadPoolExecutor(max_workers=OPENAI_CONCURRENCY, thread_name_prefix='summarizer')
+
+def agent_summarizer_batch(descriptions):
+    """
+    Summarizes many descriptions at once. Cached summaries are returned directly, short
+    descriptions are packed several to a request with a structured JSON reply, and the
+    requests run concurrently within the client's rate limits. Descriptions a batch reply
+    left out are summarized on their own. A cached summary from either prompt is reused.
+
+    :param descriptions: List of YouTube video descriptions.
+    :return: List of summaries, in the same order.
+    """
+    descriptions = [description or '' for description in descriptions]
+    keys = [SummaryCache.key(SUMMARIZER_MODEL, SUMMARIZER_PROMPT, description) for description in descriptions]
+    summaries = {}
+    pending = {}
+    for key, description in zip(keys, descriptions):
+        if key in summaries or key in pending:
+            continue
+        cached = summary_cache.get(key)
+        if cached is None:
+            cached = summary_cache.get(SummaryCache.key(SUMMARIZER_MODEL, SUMMARIZER_BATCH_PROMPT, description))
+        if cached is not None:
+            summaries[key] = cached
+        else:
+            pending[key] = description
+
+    batches = _pack_batches(pending.items())
+    futures = [_summary_pool.submit(_summarize_batch, batch) for batch in batches if len(batch) > 1]
+    for future in futures:
+        summaries.update(future.result())
+    leftovers = [key for key in pending if key not in summaries]
+    for key, summary in zip(leftovers, _summary_pool.map(lambda key: agent_summarizer(pending[key]), leftovers)):
+        summaries[key] = summary
+    return [summaries[key] for key in keys]
+
 def agent_expander(user_topic):
     """
     Generate subtopics from the user's input using OpenAI's GPT-3.5 Turbo model.
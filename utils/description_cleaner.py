@@ -0,0 +1,165 @@
+# Standard library imports
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+
+# Local imports
+from utils.metrics import description_tokens_saved_total
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+BOILERPLATE_PATH = os.environ.get('BOILERPLATE_PATH', '.cache/boilerplate.sqlite3')
+DESCRIPTION_TOKEN_BUDGET = int(os.environ.get('DESCRIPTION_TOKEN_BUDGET', 400))  # Tokens kept per description
+# A line is channel boilerplate once it appeared in this many of the channel's videos...
+BOILERPLATE_MIN_VIDEOS = int(os.environ.get('BOILERPLATE_MIN_VIDEOS', 3))
+# ...and in at least this share of them
+BOILERPLATE_MIN_SHARE = float(os.environ.get('BOILERPLATE_MIN_SHARE', 0.3))
+
+URL_REGEX = re.compile(r'(?:https?://|www\.)\S+', re.IGNORECASE)
+HASHTAG_REGEX = re.compile(r'(?<!\w)#\w+')
+# Chapter timestamps only, at the start of a line; times inside sentences ("starts at 7:30") are content
+TIMESTAMP_REGEX = re.compile(r'^\s*[\[(]?(?:\d{1,2}:)?\d{1,2}:\d{2}[\])]?(?![\d:])')
+# Separators left dangling at the start or end of a line once its timestamp or link is gone
+DANGLING_REGEX = re.compile(r'^[\s\-–—|:•>]+|[\s\-–—|:•]+$')
+ALPHANUMERIC_REGEX = re.compile(r'\w')
+
+def _estimate_tokens(text):
+    # Roughly four characters per token for English text
+    return len(text) // 4 + 1 if text else 0
+
+def _strip_noise(line):
+    line = URL_REGEX.sub('', line)
+    line = HASHTAG_REGEX.sub('', line)
+    line = TIMESTAMP_REGEX.sub('', line)
+    return DANGLING_REGEX.sub('', " ".join(line.split()))
+
+def _line_hash(line):
+    # Lines are compared after noise removal and case folding, so a footer whose links change per upload still matches
+    return int.from_bytes(hashlib.sha1(line.casefold().encode('utf-8')).digest()[:8], 'big', signed=True)
+
+def _content_lines(description):
+    """
+    Returns the cleaned, non-empty lines of a description with their hashes.
+    """
+    lines = []
+    for raw_line in (description or '').splitlines():
+        line = _strip_noise(raw_line)
+        if ALPHANUMERIC_REGEX.search(line):
+            lines.append((line, _line_hash(line)))
+    return lines
+
+def truncate_to_budget(text, max_tokens=DESCRIPTION_TOKEN_BUDGET):
+    """
+    Cuts text to about max_tokens tokens, at a word boundary where possible.
+    """
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    boundary = cut.rfind(' ')
+    return cut[:boundary] if boundary > max_chars // 2 else cut
+
+class BoilerplateStore:
+    """
+    Per-channel line frequencies, persisted in SQLite so channels are learned across uploads.
+    Each video is counted once; a line is boilerplate for its channel once it appears in
+    BOILERPLATE_MIN_VIDEOS of the channel's videos and in BOILERPLATE_MIN_SHARE of them.
+    """
+
+    def __init__(self, path, min_videos=BOILERPLATE_MIN_VIDEOS, min_share=BOILERPLATE_MIN_SHARE):
+        self.path = path
+        self.min_videos = min_videos
+        self.min_share = min_share
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute("CREATE TABLE IF NOT EXISTS channel_videos (channel_id TEXT, video_id TEXT, PRIMARY KEY (channel_id, video_id))")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS channel_lines (channel_id TEXT, line_hash INTEGER, videos INTEGER NOT NULL, "
+                               "PRIMARY KEY (channel_id, line_hash))")
+            self._conn.commit()
+        return self._conn
+
+    def learn(self, videos):
+        """
+        Counts the lines of videos not seen before.
+
+        :param videos: Iterable of (video_id, channel_id, list of line hashes).
+        """
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                for video_id, channel_id, line_hashes in videos:
+                    if not channel_id:
+                        continue
+                    inserted = conn.execute("INSERT OR IGNORE INTO channel_videos VALUES (?, ?)", (channel_id, video_id)).rowcount
+                    if not inserted:
+                        continue
+                    conn.executemany(
+                        "INSERT INTO channel_lines VALUES (?, ?, 1) ON CONFLICT (channel_id, line_hash) DO UPDATE SET videos = videos + 1",
+                        [(channel_id, line_hash) for line_hash in set(line_hashes)]
+                    )
+
+    def boilerplate(self, channel_ids):
+        """
+        Returns the boilerplate line hashes of each channel.
+
+        :param channel_ids: Iterable of channel IDs.
+        :return: Dictionary of channel ID -> set of line hashes.
+        """
+        boilerplate = {}
+        with self._lock:
+            conn = self._connection()
+            for channel_id in set(channel_ids):
+                videos = conn.execute("SELECT COUNT(*) FROM channel_videos WHERE channel_id = ?", (channel_id,)).fetchone()[0]
+                if videos < self.min_videos:
+                    continue
+                threshold = max(self.min_videos, self.min_share * videos)
+                boilerplate[channel_id] = {row[0] for row in conn.execute(
+                    "SELECT line_hash FROM channel_lines WHERE channel_id = ? AND videos >= ?", (channel_id, threshold))}
+        return boilerplate
+
+boilerplate_store = BoilerplateStore(BOILERPLATE_PATH)
+
+def clean_descriptions(details_by_id, max_tokens=DESCRIPTION_TOKEN_BUDGET, store=boilerplate_store):
+    """
+    Prepares video descriptions for summarization: learns each channel's repeated lines
+    from these videos, drops them, removes URLs, hashtags and chapter timestamps, and cuts each
+    description to the token budget.
+
+    :param details_by_id: Dictionary of video ID -> video details, as returned by get_youtube_videos_details.
+    :param max_tokens: Token budget per description.
+    :param store: The BoilerplateStore holding the learned channel lines.
+    :return: Tuple of (dictionary of video ID -> cleaned description, estimated tokens before, estimated tokens after).
+    """
+    parsed = {}
+    for video_id, details in details_by_id.items():
+        snippet = (details or {}).get('snippet', {})
+        description = snippet.get('description') or ''
+        parsed[video_id] = (snippet.get('channelId'), description, _content_lines(description))
+
+    try:
+        store.learn((video_id, channel_id, [line_hash for _, line_hash in lines]) for video_id, (channel_id, _, lines) in parsed.items())
+        boilerplate = store.boilerplate(channel_id for channel_id, _, _ in parsed.values() if channel_id)
+    except sqlite3.Error as e:
+        logging.error(f"Boilerplate store unavailable, keeping channel boilerplate: {e}", exc_info=True)
+        boilerplate = {}
+
+    cleaned, tokens_before, tokens_after = {}, 0, 0
+    for video_id, (channel_id, description, lines) in parsed.items():
+        channel_boilerplate = boilerplate.get(channel_id, ())
+        text = truncate_to_budget("\n".join(line for line, line_hash in lines if line_hash not in channel_boilerplate), max_tokens)
+        cleaned[video_id] = text
+        tokens_before += _estimate_tokens(description)
+        tokens_after += _estimate_tokens(text)
+    description_tokens_saved_total.inc(tokens_before - tokens_after)
+    return cleaned, tokens_before, tokens_after
@@ -1,11 +1,17 @@
 # Standard library imports
 import re
+import codecs
 import logging
+import time
+from html.parser import HTMLParser
 
 # Third-party imports
 from bs4 import BeautifulSoup
 import dateutil.parser
 
+# Local imports
+from utils.metrics import html_parse_seconds, html_parsed_records_total
+
 # Initialize logging with structured formatting
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
@@ -15,6 +21,32 @@ tzinfos = {
     # Add other timezones if necessary
 }
 
+# Watch entries live in this exact div class in Google Takeout exports
+CONTENT_CELL_CLASS = "content-cell mdl-cell mdl-cell--6-col mdl-typography--body-1"
+timestamp_regex = re.compile(
+    r'\b(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\b \d{1,2}, \d{4}, \d{1,2}:\d{2}:\d{2}\u202F[APM]{2}\s\w+'
+)
+
+def _build_video_record(href, text):
+    """
+    Builds a video record from a content cell's first link and its text.
+
+    :param href: The href of the first link in the content cell.
+    :param text: The full text of the content cell.
+    :return: A dictionary with the video ID and timestamp, or None if the link is not a video.
+    """
+    if not href or 'youtube.com/watch?v=' not in href:
+        return None
+    video_id = href.split('watch?v=')[-1].split('&')[0]
+    timestamp_match = timestamp_regex.search(text)
+    timestamp = None
+    if timestamp_match:
+        try:
+            timestamp = dateutil.parser.parse(timestamp_match.group(), tzinfos=tzinfos)
+        except ValueError as e:
+            logging.error(f"Error parsing timestamp for video ID {video_id}: {e}")
+    return {'video_id': video_id, 'timestamp': timestamp}
+
 def parse_html(html_content):
     """
     Parses HTML content to extract video IDs and timestamps.
@@ -22,23 +54,98 @@ def parse_html(html_content):
     :param html_content: HTML content as a string.
     :return: A list of dictionaries containing video IDs and their timestamps.
     """
-    soup = BeautifulSoup(html_content, 'html.parser')
-    video_data_list = []
-    timestamp_regex = re.compile(
-        r'\b(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\b \d{1,2}, \d{4}, \d{1,2}:\d{2}:\d{2}\u202F[APM]{2}\s\w+'
-    )
-
-    for div in soup.find_all("div", class_="content-cell mdl-cell mdl-cell--6-col mdl-typography--body-1"):
-        link_tag = div.find('a', href=True)
-        if link_tag and 'youtube.com/watch?v=' in link_tag['href']:
-            video_id = link_tag['href'].split('watch?v=')[-1].split('&')[0]
-            timestamp_match = timestamp_regex.search(div.get_text())
-            timestamp = None
-            if timestamp_match:
-                try:
-                    timestamp = dateutil.parser.parse(timestamp_match.group(), tzinfos=tzinfos)
-                except ValueError as e:
-                    logging.error(f"Error parsing timestamp for video ID {video_id}: {e}")
-            video_data_list.append({'video_id': video_id, 'timestamp': timestamp})
+    with html_parse_seconds.time(parser='soup'):
+        soup = BeautifulSoup(html_content, 'html.parser')
+        video_data_list = []
 
+        for div in soup.find_all("div", class_=CONTENT_CELL_CLASS):
+            link_tag = div.find('a', href=True)
+            record = _build_video_record(link_tag['href'] if link_tag else None, div.get_text())
+            if record:
+                video_data_list.append(record)
+
+    html_parsed_records_total.inc(len(video_data_list), parser='soup')
     return video_data_list
+
+class WatchHistoryParser(HTMLParser):
+    """
+    Incremental Takeout watch-history parser. Only the content cell currently
+    open is buffered, so memory stays constant regardless of the file size.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.records = []
+        self._div_depth = 0  # Nesting depth inside the open content cell, 0 when outside
+        self._href = None
+        self._text = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag != 'div' and not (tag == 'a' and self._div_depth):
+            return
+        attrs = dict(attrs)
+        if tag == 'a':
+            if self._href is None and attrs.get('href') is not None:
+                self._href = attrs['href']
+        elif self._div_depth:
+            self._div_depth += 1
+        elif attrs.get('class') == CONTENT_CELL_CLASS:
+            self._div_depth = 1
+
+    def handle_endtag(self, tag):
+        if tag != 'div' or not self._div_depth:
+            return
+        self._div_depth -= 1
+        if not self._div_depth:
+            record = _build_video_record(self._href, ''.join(self._text))
+            if record:
+                self.records.append(record)
+            self._href = None
+            self._text = []
+
+    def handle_data(self, data):
+        if self._div_depth:
+            self._text.append(data)
+
+    def pop_records(self):
+        """
+        Returns the records completed so far and clears them from the parser.
+        """
+        records, self.records = self.records, []
+        return records
+
+def iter_parse_html(stream, chunk_size=64 * 1024, encoding='utf-8'):
+    """
+    Parses a watch-history HTML stream chunk by chunk, yielding records as they are completed.
+
+    :param stream: A binary or text file-like object (e.g. an uploaded file's stream).
+    :param chunk_size: Number of bytes read from the stream per iteration.
+    :param encoding: Encoding used to decode binary streams.
+    :return: A generator of dictionaries containing video IDs and their timestamps.
+    :raises UnicodeDecodeError: If the stream is not valid in the given encoding.
+    """
+    parser = WatchHistoryParser()
+    decoder = codecs.getincrementaldecoder(encoding)()
+    # Only time spent reading and parsing counts, not time the consumer spends between records
+    parse_seconds = 0.0
+    records = 0
+
+    while True:
+        started = time.perf_counter()
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        parser.feed(decoder.decode(chunk) if isinstance(chunk, bytes) else chunk)
+        completed = parser.pop_records()
+        parse_seconds += time.perf_counter() - started
+        records += len(completed)
+        yield from completed
+
+    parser.feed(decoder.decode(b'', final=True))
+    parser.close()
+    completed = parser.pop_records()
+    parse_seconds += time.perf_counter() - started
+    records += len(completed)
+    html_parse_seconds.observe(parse_seconds, parser='stream')
+    html_parsed_records_total.inc(records, parser='stream')
+    yield from completed
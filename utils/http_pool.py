@@ -0,0 +1,91 @@
+# Standard library imports
+import asyncio
+import logging
+import os
+import threading
+from urllib.parse import urlsplit
+
+# Third-party imports
+import httpx
+
+try:
+    import h2  # noqa: F401  Optional: enables HTTP/2 in httpx
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+HTTP_MAX_CONNECTIONS = int(os.environ.get('HTTP_MAX_CONNECTIONS', 32))
+HTTP_MAX_KEEPALIVE = int(os.environ.get('HTTP_MAX_KEEPALIVE', 16))
+HTTP_KEEPALIVE_SECONDS = float(os.environ.get('HTTP_KEEPALIVE_SECONDS', 60))
+HTTP_PER_HOST_LIMIT = int(os.environ.get('HTTP_PER_HOST_LIMIT', 8))  # Requests in flight to any one host
+HTTP_TIMEOUT_SECONDS = float(os.environ.get('HTTP_TIMEOUT_SECONDS', 30))
+
+class AsyncHttpPool:
+    """
+    One pooled httpx.AsyncClient (keep-alive, HTTP/2 when the h2 package is installed)
+    running on its own event loop thread, so Flask request threads, pipeline workers and
+    coroutines on other event loops all reuse the same connections.
+
+    Coroutines await request() from their own loop; synchronous code calls run(coroutine)
+    to execute a coroutine on the pool's loop and wait for its result. Anything run on the
+    pool's loop is shared by every caller, so run() is only for coroutines that never block
+    (no file or SQLite I/O), and must not be called from the pool's own loop.
+    """
+
+    def __init__(self, max_connections=HTTP_MAX_CONNECTIONS, max_keepalive=HTTP_MAX_KEEPALIVE,
+                 per_host_limit=HTTP_PER_HOST_LIMIT, timeout=HTTP_TIMEOUT_SECONDS, http2=HTTP2_AVAILABLE):
+        self.per_host_limit = per_host_limit
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='http-pool', daemon=True)
+        self._thread.start()
+        self._host_slots = {}  # host -> asyncio.Semaphore, only touched on the pool's loop
+
+        async def create_client():
+            return httpx.AsyncClient(
+                http2=http2,
+                timeout=timeout,
+                limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive,
+                                    keepalive_expiry=HTTP_KEEPALIVE_SECONDS),
+            )
+
+        self._client = self.run(create_client())
+        logging.info(f"HTTP pool started with {max_connections} connections, "
+                     f"{per_host_limit} per host, HTTP/2 {'on' if http2 else 'off'}")
+
+    async def _request(self, method, url, **kwargs):
+        host = urlsplit(url).netloc
+        slots = self._host_slots.get(host)
+        if slots is None:
+            slots = self._host_slots[host] = asyncio.Semaphore(self.per_host_limit)
+        async with slots:
+            return await self._client.request(method, url, **kwargs)
+
+    async def request(self, method, url, **kwargs):
+        """
+        Sends a request through the pool from any event loop.
+
+        :param method: HTTP method.
+        :param url: Request URL.
+        :param kwargs: Passed to httpx.AsyncClient.request (params, headers, json, ...).
+        :return: The httpx.Response.
+        :raises httpx.HTTPError: On transport errors.
+        """
+        if asyncio.get_running_loop() is self._loop:
+            return await self._request(method, url, **kwargs)
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self._request(method, url, **kwargs), self._loop))
+
+    def run(self, coroutine):
+        """
+        Runs a coroutine on the pool's event loop and blocks until it finishes.
+
+        :param coroutine: The coroutine.
+        :return: The coroutine's result.
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def close(self):
+        self.run(self._client.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
@@ -0,0 +1,165 @@
+# Standard library imports
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds in seconds, from sub-millisecond cache work up to slow remote batches
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_metrics = []
+_registry_lock = threading.Lock()
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+def _format_value(value):
+    value = float(value)
+    # Exposition format spellings; int() would raise on these
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(value) if value != int(value) else str(int(value))
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _metrics.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def render(self):
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}'] + self._samples()
+
+class Counter(_Metric):
+    """
+    Monotonically increasing count, optionally split by labels.
+    """
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        with self._lock:
+            values = dict(self._values)
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}' for key, value in sorted(values.items())]
+
+class Gauge(_Metric):
+    """
+    Point-in-time value. With a callback, the value is read when the metrics are rendered;
+    the callback returns a dictionary of label value tuple -> value.
+    """
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+        self._callback = callback
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def _samples(self):
+        with self._lock:
+            values = dict(self._values)
+        if self._callback:
+            values.update(self._callback())
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}' for key, value in sorted(values.items())]
+
+class Histogram(_Metric):
+    """
+    Cumulative-bucket histogram, as Prometheus expects. observe() is a bisect and a few
+    additions under a lock, so it is cheap enough for per-item hot paths.
+    """
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        Observes the duration of the with block, whether or not it raises.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _samples(self):
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        samples = []
+        for key, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), values):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                samples.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, [("le", le)])} {cumulative}')
+            samples.append(f'{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(values[-1])}')
+            samples.append(f'{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}')
+        return samples
+
+def render_metrics():
+    """
+    Renders every registered metric in the Prometheus text exposition format.
+
+    :return: The metrics page as a string.
+    """
+    with _registry_lock:
+        metrics = list(_metrics)
+    return '\n'.join(line for metric in metrics for line in metric.render()) + '\n'
+
+# Application metrics, served on /metrics
+errors_total = Counter('errors_total', 'Errors by service and stage.', ['service', 'stage'])
+html_parse_seconds = Histogram('html_parse_seconds', 'Time spent parsing watch history uploads.', ['parser'])
+html_parsed_records_total = Counter('html_parsed_records_total', 'Watch entries extracted from uploads.', ['parser'])
+youtube_request_seconds = Histogram('youtube_request_seconds', 'Latency of YouTube Data API requests.', ['method'])
+youtube_quota_units_total = Counter('youtube_quota_units_total', 'YouTube quota units spent.', ['method', 'priority'])
+youtube_quota_deferred_total = Counter('youtube_quota_deferred_total', 'YouTube calls deferred by the quota scheduler.', ['method', 'priority'])
+description_tokens_saved_total = Counter('description_tokens_saved_total', 'Estimated tokens removed from descriptions before summarization.')
+openai_request_seconds = Histogram('openai_request_seconds', 'Latency of OpenAI chat completion requests.', ['model'])
+openai_tokens_total = Counter('openai_tokens_total', 'Tokens used by OpenAI chat completions.', ['model'])
+embedding_request_seconds = Histogram('embedding_request_seconds', 'Latency of embedding requests.', ['caller'])
+embedded_texts_total = Counter('embedded_texts_total', 'Texts sent for embedding.', ['caller'])
+vector_upsert_seconds = Histogram('vector_upsert_seconds', 'Latency of vector store upserts.', ['caller'])
+vector_query_seconds = Histogram('vector_query_seconds', 'Latency of vector store queries.')
+keyword_query_seconds = Histogram('keyword_query_seconds', 'Latency of keyword index searches.')
+firestore_write_seconds = Histogram('firestore_write_seconds', 'Latency of Firestore commits.', ['kind'])
+firestore_documents_written_total = Counter('firestore_documents_written_total', 'Documents written to Firestore.', ['collection'])
+pipeline_stage_seconds = Histogram('pipeline_stage_seconds', 'Duration of ingestion stage calls (per item, or per batch).', ['stage'])
+pipeline_items_total = Counter('pipeline_items_total', 'Items processed by each ingestion stage.', ['stage'])
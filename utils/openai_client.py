@@ -0,0 +1,169 @@
+# Standard library imports
+import logging
+import os
+import random
+import threading
+import time
+
+# Third-party imports
+import openai
+
+# Local imports
+from config.api_keys import oai_api_key
+from services.registry import register_service, get_service
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+OPENAI_BASE_URL = os.environ.get('OPENAI_BASE_URL')  # Point at a local fake server for tests and benchmarks
+OPENAI_RPM = int(os.environ.get('OPENAI_RPM', 3500))  # Requests per minute
+OPENAI_TPM = int(os.environ.get('OPENAI_TPM', 90000))  # Tokens per minute
+OPENAI_CONCURRENCY = int(os.environ.get('OPENAI_CONCURRENCY', 8))  # Requests in flight at once
+OPENAI_MAX_RETRIES = 5
+OPENAI_TIMEOUT_SECONDS = 60
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+COMPLETION_TOKENS_RESERVE = 256  # Tokens reserved for the reply when the request does not set max_tokens
+
+# Rate limits, 5xx responses and dropped connections are retried; other errors are not
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.InternalServerError, openai.APIConnectionError)
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at rate_per_minute, holding at most
+    one minute's worth of tokens. acquire() blocks until enough tokens are available.
+    """
+
+    def __init__(self, rate_per_minute):
+        self.capacity = rate_per_minute
+        self.rate = rate_per_minute / 60.0
+        self._tokens = float(rate_per_minute)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, amount=1):
+        """
+        Takes amount tokens, waiting for the bucket to refill if needed.
+
+        :return: Seconds spent waiting.
+        """
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return waited
+                wait = (amount - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+    def adjust(self, amount):
+        """
+        Returns (positive amount) or charges (negative amount) tokens once the real cost
+        of a request is known. Charges may leave the bucket in debt.
+        """
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens + amount)
+
+def estimate_text_tokens(text):
+    """
+    Rough token count of a piece of text: about four characters per token.
+    """
+    return len(text or '') // 4
+
+def estimate_tokens(messages, max_tokens=None):
+    """
+    Rough token count of a chat request: the text estimate plus per-message overhead, plus the reply budget.
+    """
+    prompt_tokens = sum(estimate_text_tokens(message.get('content')) + 4 for message in messages)
+    return prompt_tokens + (max_tokens or COMPLETION_TOKENS_RESERVE)
+
+def _retry_after(error):
+    # Honour the server's Retry-After header when it sends one
+    response = getattr(error, 'response', None)
+    try:
+        return float(response.headers.get('retry-after')) if response is not None else None
+    except (TypeError, ValueError):
+        return None
+
+class ChatClient:
+    """
+    Chat completions client shared by every thread. Requests are throttled by a
+    requests-per-minute and a tokens-per-minute bucket and capped at `concurrency`
+    in flight; 429, 5xx and connection errors are retried with exponential backoff.
+    """
+
+    def __init__(self, api_key=oai_api_key, base_url=OPENAI_BASE_URL, rpm=OPENAI_RPM, tpm=OPENAI_TPM,
+                 concurrency=OPENAI_CONCURRENCY, max_retries=OPENAI_MAX_RETRIES):
+        # The SDK's own retries are disabled so every attempt goes through the buckets
+        self._client = openai.OpenAI(api_key=api_key, base_url=base_url, max_retries=0, timeout=OPENAI_TIMEOUT_SECONDS)
+        self.request_bucket = TokenBucket(rpm)
+        self.token_bucket = TokenBucket(tpm)
+        self.max_retries = max_retries
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._lock = threading.Lock()
+        self._counters = {'requests': 0, 'retries': 0, 'failures': 0, 'tokens': 0, 'throttled_seconds': 0.0}
+
+    def _count(self, **increments):
+        with self._lock:
+            for name, value in increments.items():
+                self._counters[name] += value
+
+    def complete(self, model, messages, **kwargs):
+        """
+        Sends a chat completion request.
+
+        :param model: The model to use.
+        :param messages: The messages to send.
+        :param kwargs: Extra request parameters, such as max_tokens or response_format.
+        :return: Tuple of (content or None, total tokens used or 0).
+        :raises openai.OpenAIError: If the request failed, after retries for retryable errors.
+        """
+        estimated = estimate_tokens(messages, kwargs.get('max_tokens'))
+        for attempt in range(self.max_retries + 1):
+            throttled = self.request_bucket.acquire() + self.token_bucket.acquire(estimated)
+            self._count(requests=1, throttled_seconds=throttled)
+            try:
+                with self._slots:
+                    response = self._client.chat.completions.create(model=model, messages=messages, **kwargs)
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    self._count(failures=1)
+                    raise
+                delay = _retry_after(e) or min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt) * random.uniform(0.5, 1.0)
+                logging.warning(f"OpenAI request failed ({type(e).__name__}), retrying in {delay:.1f}s")
+                self._count(retries=1)
+                time.sleep(delay)
+                continue
+            except Exception:
+                self._count(failures=1)
+                raise
+            content = response.choices[0].message.content if response.choices else None
+            tokens = response.usage.total_tokens if getattr(response, 'usage', None) else 0
+            if tokens:
+                self.token_bucket.adjust(estimated - tokens)
+            self._count(tokens=tokens)
+            return content, tokens
+
+    def stats(self):
+        """
+        Returns request, retry, failure and token counters and the seconds spent waiting on the rate limits.
+        """
+        with self._lock:
+            return dict(self._counters)
+
+register_service('openai', ChatClient)
+
+def get_chat_client():
+    """
+    Returns the process-wide rate-limited chat client, creating it on first use.
+    """
+    return get_service('openai')
@@ -0,0 +1,123 @@
+# Standard library imports
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries also expire after ttl_seconds.
+
+    get_or_compute times every computation, so stats() can estimate how much
+    latency the hits saved, and coalesces concurrent misses on the same key into
+    one computation whose result every caller receives.
+    """
+
+    def __init__(self, maxsize=1024, ttl_seconds=3600):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (value, stored_at)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._compute_seconds = 0.0
+        self._coalesced = 0
+        self._in_flight = {}  # key -> Future of the computation running for it
+
+    def _fresh_entry(self, key):
+        # Callers hold the lock
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry[1] >= self.ttl_seconds:
+            del self._entries[key]
+            entry = None
+        return entry
+
+    def _store(self, key, value):
+        # Callers hold the lock
+        self._entries[key] = (value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._fresh_entry(key)
+            if entry is None:
+                self._misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        with self._lock:
+            self._store(key, value)
+
+    def get_or_compute(self, key, compute):
+        """
+        Returns the cached value for key, or computes, caches and returns it.
+
+        :param key: The cache key.
+        :param compute: Zero-argument function producing the value.
+        :return: The value.
+        """
+        marker = object()
+        value = self.get(key, marker)
+        if value is not marker:
+            return value
+        with self._lock:
+            # A leader may have stored the value since the lookup above
+            entry = self._fresh_entry(key)
+            if entry is not None:
+                self._coalesced += 1
+                return entry[0]
+            pending = self._in_flight.get(key)
+            if pending is None:
+                pending = self._in_flight[key] = Future()
+                leader = True
+            else:
+                self._coalesced += 1
+                leader = False
+        if not leader:
+            # Raises the leader's exception if its computation failed
+            return pending.result()
+
+        started = time.perf_counter()
+        try:
+            value = compute()
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight[key]
+            pending.set_exception(e)
+            raise
+        # Stored in the same critical section that retires the computation, so no caller
+        # can find neither the value nor the in-flight computation
+        with self._lock:
+            self._compute_seconds += time.perf_counter() - started
+            self._store(key, value)
+            del self._in_flight[key]
+        pending.set_result(value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Returns hit and miss counts, the hit rate, the misses that waited on another
+        caller's computation and the estimated seconds saved by hits.
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            computations = self._misses - self._coalesced
+            average_compute = self._compute_seconds / computations if computations else 0.0
+            return {
+                'size': len(self._entries),
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / lookups if lookups else 0.0,
+                'coalesced': self._coalesced,
+                'average_miss_seconds': average_compute,
+                'seconds_saved': self._hits * average_compute,
+            }
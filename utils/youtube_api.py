@@ -1,162 +1,688 @@
 # Standard library imports
+import asyncio
+import contextvars
+import datetime
+import json
 import logging
 import os
+import sqlite3
+import threading
+import time
+from zoneinfo import ZoneInfo
 
 # Third-party imports
-import requests
-import google_auth_oauthlib.flow
-import googleapiclient.discovery
-import googleapiclient.errors
-from googleapiclient.discovery import build
+import httpx
 
 # Local imports
-from config.api_keys import yt_api_key
+from services.registry import register_service, get_service
+from utils.http_pool import AsyncHttpPool
+from utils.metrics import errors_total, youtube_request_seconds, youtube_quota_units_total, youtube_quota_deferred_total
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
-youtube = build('youtube', 'v3', developerKey=yt_api_key)
+# Every YouTube call goes through one keep-alive connection pool, created on first use
+register_service('youtube', AsyncHttpPool)
 
-def get_youtube_video_details(yt_api_key, video_id):
+def get_http_pool():
   """
-  Makes an API call to YouTube to get details of a specific video.
+  Returns the process-wide HTTP connection pool used for YouTube API calls.
+  """
+  return get_service('youtube')
+
+# Set inside the synchronous wrappers, whose coroutine runs on a private loop in the calling thread
+_caller_loop = contextvars.ContextVar('youtube_caller_loop', default=False)
+
+async def _blocking(func, *args):
+  # SQLite work (video cache, memoized tables, quota ledger) never runs on a shared event loop:
+  # inline on a sync wrapper's private loop, in a worker thread for any other caller
+  if _caller_loop.get():
+      return func(*args)
+  return await asyncio.to_thread(func, *args)
+
+def _run(coroutine):
+  """
+  Runs a coroutine to completion on a new event loop in the calling thread. Only its HTTP
+  requests are handed to the pool's loop, so cache and quota reads never block other callers.
+  """
+  async def main():
+      _caller_loop.set(True)
+      return await coroutine
+  return asyncio.run(main())
+
+async def _api_get(method, url, **kwargs):
+  # Every Data API request goes through here so latency and failures are measured per method
+  started = time.perf_counter()
+  try:
+      response = await get_http_pool().request("GET", url, **kwargs)
+  except httpx.HTTPError:
+      errors_total.inc(service='youtube', stage=method)
+      raise
+  finally:
+      youtube_request_seconds.observe(time.perf_counter() - started, method=method)
+  if response.status_code >= 400:
+      errors_total.inc(service='youtube', stage=method)
+  return response
+
+# Quota units charged per call of each Data API method
+QUOTA_COSTS = {'videos.list': 1, 'channels.list': 1, 'videoCategories.list': 1, 'search.list': 100}
+YT_DAILY_QUOTA = int(os.environ.get('YT_DAILY_QUOTA', 10000))
+# Bulk ingestion stops at this share of the daily quota; the rest is kept for interactive search
+YT_BULK_QUOTA_FRACTION = float(os.environ.get('YT_BULK_QUOTA_FRACTION', 0.8))
+QUOTA_LEDGER_PATH = os.environ.get('YT_QUOTA_LEDGER_PATH', '.cache/youtube_quota.sqlite3')
+QUOTA_TIMEZONE = ZoneInfo('America/Los_Angeles')  # The daily quota resets at midnight Pacific time
+INTERACTIVE, BULK = 'interactive', 'bulk'
+
+class QuotaDeferred(Exception):
+  """
+  Raised when a call would take its priority class over its share of the daily quota.
+  """
+
+  def __init__(self, method, priority, retry_at):
+      super().__init__(f"YouTube quota for {priority} {method} calls is used up until {retry_at.isoformat()}")
+      self.method = method
+      self.priority = priority
+      self.retry_at = retry_at
+
+class QuotaScheduler:
+  """
+  Admits YouTube Data API calls against the daily unit quota and records their cost in
+  a SQLite ledger, so every worker process shares the same running total. Interactive
+  calls may spend the whole quota; bulk calls are deferred once spending reaches
+  bulk_fraction of it, which keeps the remainder for interactive search.
+  """
+
+  def __init__(self, path, daily_quota=YT_DAILY_QUOTA, bulk_fraction=YT_BULK_QUOTA_FRACTION):
+      self.path = path
+      self.daily_quota = daily_quota
+      self.bulk_fraction = bulk_fraction
+      self._conn = None
+      self._lock = threading.Lock()
+      self._deferred = {INTERACTIVE: 0, BULK: 0}
+
+  def _connection(self):
+      if self._conn is None:
+          directory = os.path.dirname(self.path)
+          if directory:
+              os.makedirs(directory, exist_ok=True)
+          # Autocommit mode, so charge() can take the write lock explicitly with BEGIN IMMEDIATE
+          self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30, isolation_level=None)
+          self._conn.execute(
+              "CREATE TABLE IF NOT EXISTS quota_ledger ("
+              "day TEXT NOT NULL, method TEXT NOT NULL, priority TEXT NOT NULL, "
+              "units INTEGER NOT NULL, calls INTEGER NOT NULL, PRIMARY KEY (day, method, priority))"
+          )
+      return self._conn
+
+  @staticmethod
+  def _quota_day(now=None):
+      now = (now or datetime.datetime.now(datetime.timezone.utc)).astimezone(QUOTA_TIMEZONE)
+      next_reset = datetime.datetime.combine(now.date() + datetime.timedelta(days=1), datetime.time(), QUOTA_TIMEZONE)
+      return now.date().isoformat(), next_reset
+
+  def limit(self, priority):
+      return self.daily_quota if priority == INTERACTIVE else int(self.daily_quota * self.bulk_fraction)
+
+  def charge(self, method, priority=BULK):
+      """
+      Records one call of a method, or refuses it if it does not fit the caller's budget.
+      Calls are charged up front because YouTube bills failed requests too.
+
+      :param method: Data API method name, a key of QUOTA_COSTS.
+      :param priority: INTERACTIVE or BULK.
+      :raises QuotaDeferred: If the call would exceed the budget of its priority class.
+      """
+      cost = QUOTA_COSTS[method]
+      day, next_reset = self._quota_day()
+      with self._lock:
+          conn = self._connection()
+          conn.execute("BEGIN IMMEDIATE")
+          try:
+              spent = conn.execute("SELECT COALESCE(SUM(units), 0) FROM quota_ledger WHERE day = ?", (day,)).fetchone()[0]
+              if spent + cost > self.limit(priority):
+                  conn.execute("ROLLBACK")
+                  self._deferred[priority] += 1
+                  youtube_quota_deferred_total.inc(method=method, priority=priority)
+                  raise QuotaDeferred(method, priority, next_reset)
+              conn.execute(
+                  "INSERT INTO quota_ledger VALUES (?, ?, ?, ?, 1) ON CONFLICT (day, method, priority) "
+                  "DO UPDATE SET units = units + excluded.units, calls = calls + 1", (day, method, priority, cost)
+              )
+              conn.execute("COMMIT")
+          except sqlite3.Error:
+              conn.execute("ROLLBACK")
+              raise
+      youtube_quota_units_total.inc(cost, method=method, priority=priority)
+
+  def status(self):
+      """
+      Returns today's quota spend and what is left for each priority class.
+
+      :return: Dictionary describing the budget.
+      """
+      day, next_reset = self._quota_day()
+      with self._lock:
+          rows = self._connection().execute(
+              "SELECT method, priority, units, calls FROM quota_ledger WHERE day = ?", (day,)
+          ).fetchall()
+          deferred = dict(self._deferred)
+      spent = sum(units for _, _, units, _ in rows)
+      by_method = {}
+      for method, priority, units, calls in rows:
+          entry = by_method.setdefault(method, {'units': 0, 'calls': 0, 'cost_per_call': QUOTA_COSTS.get(method)})
+          entry['units'] += units
+          entry['calls'] += calls
+      return {
+          'day': day,
+          'resets_at': next_reset.isoformat(),
+          'daily_quota': self.daily_quota,
+          'spent': spent,
+          'remaining': max(self.daily_quota - spent, 0),
+          'bulk_limit': self.limit(BULK),
+          'bulk_remaining': max(self.limit(BULK) - spent, 0),
+          'spent_by_priority': {priority: sum(units for _, row_priority, units, _ in rows if row_priority == priority)
+                                for priority in (INTERACTIVE, BULK)},
+          'by_method': by_method,
+          'deferred_calls': deferred,
+      }
+
+quota_scheduler = QuotaScheduler(QUOTA_LEDGER_PATH)
+
+def get_quota_status():
+  """
+  Returns today's YouTube Data API quota spend and remaining budget.
+
+  :return: Dictionary describing the budget.
+  """
+  return quota_scheduler.status()
+
+YOUTUBE_API_BASE_URL = os.environ.get('YOUTUBE_API_BASE_URL', 'https://www.googleapis.com/youtube/v3')  # Overridable for local fakes
+YOUTUBE_VIDEOS_URL = f"{YOUTUBE_API_BASE_URL}/videos"
+YOUTUBE_CATEGORIES_URL = f"{YOUTUBE_API_BASE_URL}/videoCategories"
+YOUTUBE_CHANNELS_URL = f"{YOUTUBE_API_BASE_URL}/channels"
+YOUTUBE_SEARCH_URL = f"{YOUTUBE_API_BASE_URL}/search"
+VIDEO_PARTS = "snippet,contentDetails,statistics"
+MAX_IDS_PER_REQUEST = 50  # videos.list accepts at most 50 comma-separated IDs
+
+# Video metadata cache settings
+VIDEO_CACHE_PATH = os.environ.get('YT_VIDEO_CACHE_PATH', '.cache/youtube_videos.sqlite3')
+VIDEO_CACHE_TTL_SECONDS = int(os.environ.get('YT_VIDEO_CACHE_TTL_SECONDS', 7 * 24 * 3600))
+VIDEO_CACHE_MAX_ENTRIES = int(os.environ.get('YT_VIDEO_CACHE_MAX_ENTRIES', 200000))
+
+class VideoDetailsCache:
+  """
+  Disk-backed (SQLite) cache of normalized video details keyed by video ID.
+
+  Entries younger than the TTL are served without any API call. Older entries
+  are refetched; videos.list ETags cover a whole response, so a refetch is
+  counted as revalidated when the item's own ETag did not change. The least
+  recently used entries are evicted once the cache grows past max_entries.
+  """
+
+  def __init__(self, path, ttl_seconds=VIDEO_CACHE_TTL_SECONDS, max_entries=VIDEO_CACHE_MAX_ENTRIES):
+      self.path = path
+      self.ttl_seconds = ttl_seconds
+      self.max_entries = max_entries
+      self._conn = None
+      self._lock = threading.Lock()
+      self._counters = {'hits': 0, 'misses': 0, 'stale': 0, 'revalidated': 0, 'updated': 0, 'evicted': 0}
+
+  def _connection(self):
+      # Opened on first use so importing this module never touches the disk
+      if self._conn is None:
+          directory = os.path.dirname(self.path)
+          if directory:
+              os.makedirs(directory, exist_ok=True)
+          self._conn = sqlite3.connect(self.path, check_same_thread=False)
+          self._conn.execute(
+              "CREATE TABLE IF NOT EXISTS videos ("
+              "video_id TEXT PRIMARY KEY, etag TEXT, details TEXT NOT NULL, "
+              "fetched_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+          )
+          self._conn.execute("CREATE INDEX IF NOT EXISTS videos_accessed_at ON videos (accessed_at)")
+          self._conn.commit()
+      return self._conn
+
+  def lookup(self, video_ids):
+      """
+      Looks up video IDs in the cache.
+
+      :param video_ids: List of video IDs.
+      :return: Tuple of (dictionary of fresh video ID -> details, dictionary of stale video ID -> (etag, details)).
+      """
+      fresh, stale = {}, {}
+      now = time.time()
+      with self._lock:
+          conn = self._connection()
+          for start in range(0, len(video_ids), 500):  # Stay below SQLite's bound parameter limit
+              chunk = video_ids[start:start + 500]
+              placeholders = ",".join("?" * len(chunk))
+              rows = conn.execute(
+                  f"SELECT video_id, etag, details, fetched_at FROM videos WHERE video_id IN ({placeholders})", chunk
+              ).fetchall()
+              for video_id, etag, details, fetched_at in rows:
+                  if now - fetched_at < self.ttl_seconds:
+                      fresh[video_id] = json.loads(details)
+                  else:
+                      stale[video_id] = (etag, json.loads(details))
+          if fresh:
+              conn.executemany("UPDATE videos SET accessed_at = ? WHERE video_id = ?", [(now, video_id) for video_id in fresh])
+              conn.commit()
+          self._counters['hits'] += len(fresh)
+          self._counters['stale'] += len(stale)
+          self._counters['misses'] += len(video_ids) - len(fresh) - len(stale)
+      return fresh, stale
+
+  def store(self, details_by_id, previous_etags=None):
+      """
+      Stores freshly fetched video details, counting entries whose ETag did not change as revalidated.
+
+      :param details_by_id: Dictionary of video ID -> normalized video details.
+      :param previous_etags: Dictionary of video ID -> ETag of the stale cache entry, if any.
+      """
+      if not details_by_id:
+          return
+      previous_etags = previous_etags or {}
+      now = time.time()
+      rows = []
+      revalidated = updated = 0
+      for video_id, details in details_by_id.items():
+          if video_id in previous_etags:
+              if previous_etags[video_id] == details.get('etag'):
+                  revalidated += 1
+              else:
+                  updated += 1
+          rows.append((video_id, details.get('etag', ''), json.dumps(details), now, now))
+      with self._lock:
+          conn = self._connection()
+          conn.executemany("INSERT OR REPLACE INTO videos VALUES (?, ?, ?, ?, ?)", rows)
+          self._evict(conn)
+          conn.commit()
+          self._counters['revalidated'] += revalidated
+          self._counters['updated'] += updated
+
+  def _evict(self, conn):
+      count = conn.execute("SELECT COUNT(*) FROM videos").fetchone()[0]
+      overflow = count - self.max_entries
+      if overflow > 0:
+          conn.execute(
+              "DELETE FROM videos WHERE video_id IN (SELECT video_id FROM videos ORDER BY accessed_at LIMIT ?)", (overflow,)
+          )
+          self._counters['evicted'] += overflow
+
+  def stats(self):
+      """
+      Returns the cache counters and an estimate of the API calls they saved.
+
+      :return: Dictionary of counters.
+      """
+      with self._lock:
+          stats = dict(self._counters)
+      lookups = stats['hits'] + stats['misses'] + stats['stale']
+      stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+      # Every hit would otherwise have been one video in a 50-ID videos.list call
+      stats['video_fetches_saved'] = stats['hits']
+      return stats
+
+video_cache = VideoDetailsCache(VIDEO_CACHE_PATH)
+
+class MemoizedLookup:
+  """
+  Small key -> JSON value table with an in-process tier in front of a SQLite
+  table (stored next to the video cache). Entries expire after ttl_seconds.
+  """
+
+  def __init__(self, path, table, ttl_seconds):
+      self.path = path
+      self.table = table
+      self.ttl_seconds = ttl_seconds
+      self._memory = {}  # key -> (value, fetched_at)
+      self._conn = None
+      self._lock = threading.Lock()
+
+  def _connection(self):
+      if self._conn is None:
+          directory = os.path.dirname(self.path)
+          if directory:
+              os.makedirs(directory, exist_ok=True)
+          self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+          self._conn.execute(
+              f"CREATE TABLE IF NOT EXISTS {self.table} (key TEXT PRIMARY KEY, value TEXT NOT NULL, fetched_at REAL NOT NULL)"
+          )
+          self._conn.commit()
+      return self._conn
+
+  def get_many(self, keys):
+      """
+      Returns the unexpired values for the given keys, loading the persistent tier on an in-process miss.
+
+      :param keys: List of keys.
+      :return: Dictionary of key -> value for the keys that were found and fresh.
+      """
+      now = time.time()
+      found = {}
+      with self._lock:
+          pending = []
+          for key in keys:
+              entry = self._memory.get(key)
+              if entry and now - entry[1] < self.ttl_seconds:
+                  found[key] = entry[0]
+              else:
+                  pending.append(key)
+          if pending:
+              conn = self._connection()
+              for start in range(0, len(pending), 500):
+                  chunk = pending[start:start + 500]
+                  placeholders = ",".join("?" * len(chunk))
+                  rows = conn.execute(
+                      f"SELECT key, value, fetched_at FROM {self.table} WHERE key IN ({placeholders})", chunk
+                  ).fetchall()
+                  for key, value, fetched_at in rows:
+                      if now - fetched_at < self.ttl_seconds:
+                          found[key] = json.loads(value)
+                          self._memory[key] = (found[key], fetched_at)
+      return found
+
+  def put_many(self, values):
+      """
+      Stores values in both tiers.
+
+      :param values: Dictionary of key -> JSON serializable value.
+      """
+      if not values:
+          return
+      now = time.time()
+      with self._lock:
+          for key, value in values.items():
+              self._memory[key] = (value, now)
+          conn = self._connection()
+          conn.executemany(
+              f"INSERT OR REPLACE INTO {self.table} VALUES (?, ?, ?)",
+              [(key, json.dumps(value), now) for key, value in values.items()]
+          )
+          conn.commit()
+
+category_table = MemoizedLookup(VIDEO_CACHE_PATH, 'video_categories', ttl_seconds=30 * 24 * 3600)
+channel_table = MemoizedLookup(VIDEO_CACHE_PATH, 'channels', ttl_seconds=7 * 24 * 3600)
+
+def get_video_cache_stats():
+  """
+  Returns hit/miss/revalidate counters of the video metadata cache.
+
+  :return: Dictionary of cache counters.
+  """
+  return video_cache.stats()
+
+def _normalize_video_item(item):
+  """
+  Converts a raw videos.list item into the normalized video details shape.
+
+  :param item: A single item from the videos.list response.
+  :return: Dictionary containing video details.
+  """
+  snippet = item.get("snippet", {})
+  content_details = item.get("contentDetails", {})
+  statistics = item.get("statistics", {})
+
+  # Extract thumbnail information
+  thumbnails = snippet.get("thumbnails", {})
+  thumbnail_urls = {quality: thumb_info.get('url') for quality, thumb_info in thumbnails.items() if 'url' in thumb_info}
+
+  # Extract additional fields
+  return {
+      "kind": item.get("kind", ""),
+      "etag": item.get("etag", ""),
+      "id": item.get("id", ""),
+      "snippet": {
+          "publishedAt": snippet.get("publishedAt", ""),
+          "channelId": snippet.get("channelId", ""),
+          "title": snippet.get("title", ""),
+          "description": snippet.get("description", ""),
+          "thumbnails": thumbnail_urls,
+          "channelTitle": snippet.get("channelTitle", ""),
+          "tags": snippet.get("tags", []),
+          "categoryId": snippet.get("categoryId", ""),
+          "liveBroadcastContent": snippet.get("liveBroadcastContent", ""),
+          "defaultLanguage": snippet.get("defaultLanguage", ""),
+          "localized": snippet.get("localized", {}),
+          "defaultAudioLanguage": snippet.get("defaultAudioLanguage", "")
+      },
+      "contentDetails": content_details,
+      "statistics": statistics
+  }
+
+async def aget_youtube_video_details(yt_api_key, video_id, priority=INTERACTIVE):
+  """
+  Makes an API call to YouTube to get details of a specific video, served from the video cache when fresh.
 
   :param yt_api_key: YouTube API key.
   :param video_id: ID of the YouTube video.
+  :param priority: Quota priority of the call, INTERACTIVE or BULK.
   :return: Dictionary containing video details or empty dictionary on failure.
   """
-  url = "https://www.googleapis.com/youtube/v3/videos"
-  parts = "snippet,contentDetails,statistics"
-  params = {"part": parts, "id": video_id, "key": yt_api_key}
+  fresh, stale = await _blocking(video_cache.lookup, [video_id])
+  if video_id in fresh:
+      return fresh[video_id]
+
+  params = {"part": VIDEO_PARTS, "id": video_id, "key": yt_api_key}
+  # Served when the refetch of a stale entry fails
+  fallback = stale[video_id][1] if video_id in stale else {}
+
+  try:
+      await _blocking(quota_scheduler.charge, 'videos.list', priority)
+  except QuotaDeferred as e:
+      logging.warning(str(e))
+      return fallback
 
   try:
-      response = requests.get(url, params=params)
+      response = await _api_get('videos.list', YOUTUBE_VIDEOS_URL, params=params)
       if response.status_code == 200:
           items = response.json().get("items", [])
           if items:
-              item = items[0]
-              snippet = item.get("snippet", {})
-              content_details = item.get("contentDetails", {})
-              statistics = item.get("statistics", {})
-
-              # Extract thumbnail information
-              thumbnails = snippet.get("thumbnails", {})
-              thumbnail_urls = {quality: thumb_info.get('url') for quality, thumb_info in thumbnails.items() if 'url' in thumb_info}
-
-              # Extract additional fields
-              video_details = {
-                  "kind": item.get("kind", ""),
-                  "etag": item.get("etag", ""),
-                  "id": item.get("id", ""),
-                  "snippet": {
-                      "publishedAt": snippet.get("publishedAt", ""),
-                      "channelId": snippet.get("channelId", ""),
-                      "title": snippet.get("title", ""),
-                      "description": snippet.get("description", ""),
-                      "thumbnails": thumbnail_urls,
-                      "channelTitle": snippet.get("channelTitle", ""),
-                      "tags": snippet.get("tags", []),
-                      "categoryId": snippet.get("categoryId", ""),
-                      "liveBroadcastContent": snippet.get("liveBroadcastContent", ""),
-                      "defaultLanguage": snippet.get("defaultLanguage", ""),
-                      "localized": snippet.get("localized", {}),
-                      "defaultAudioLanguage": snippet.get("defaultAudioLanguage", "")
-                  },
-                  "contentDetails": content_details,
-                  "statistics": statistics
-              }
-
+              video_details = _normalize_video_item(items[0])
+              await _blocking(video_cache.store, {video_id: video_details}, {video_id: stale[video_id][0]} if video_id in stale else None)
               return video_details
           else:
               logging.warning(f"No items found for video ID {video_id}")
               return {}
       else:
           logging.error(f"Error fetching data for video ID {video_id}: {response.status_code}")
-          logging.debug("Response Content:", response.content)
-          return {}
-  except requests.RequestException as e:
+          logging.debug("Response Content: %s", response.content)
+          return fallback
+  except httpx.HTTPError as e:
       logging.error(f"Request error for video ID {video_id}: {e}", exc_info=True)
-      return {}
+      return fallback
+
+async def _fetch_videos_chunk(yt_api_key, chunk):
+  # None when the call failed, as opposed to a response that left out deleted or private videos
+  params = {"part": VIDEO_PARTS, "id": ",".join(chunk), "key": yt_api_key}
+  try:
+      response = await _api_get('videos.list', YOUTUBE_VIDEOS_URL, params=params)
+      if response.status_code == 200:
+          return {item.get("id", ""): _normalize_video_item(item) for item in response.json().get("items", [])}
+      logging.error(f"Error fetching data for {len(chunk)} video IDs starting at {chunk[0]}: {response.status_code}")
+      logging.debug("Response Content: %s", response.content)
+  except httpx.HTTPError as e:
+      logging.error(f"Request error for {len(chunk)} video IDs starting at {chunk[0]}: {e}", exc_info=True)
+  return None
+
+async def aget_youtube_videos_details(yt_api_key, video_ids, priority=BULK, deferred_ids=None):
+  """
+  Fetches details for any number of YouTube videos, MAX_IDS_PER_REQUEST IDs per videos.list call,
+  with the calls running concurrently on the shared connection pool.
+  Fresh entries are served from the video cache; stale ones are refetched and compared by ETag.
+  Stale entries whose refetch was deferred by the quota or failed are served as they are.
 
-def get_category_name(yt_api_key, category_id):
+  :param yt_api_key: YouTube API key.
+  :param video_ids: Iterable of YouTube video IDs. Duplicates are fetched once.
+  :param priority: Quota priority of the calls, INTERACTIVE or BULK.
+  :param deferred_ids: Optional list extended in place with the IDs not fetched because the quota deferred them.
+  :return: Tuple of (dictionary of video ID -> video details, list of IDs that were missing, private or failed).
+  """
+  unique_ids = list(dict.fromkeys(video_id for video_id in video_ids if video_id))
+  details_by_id, stale = await _blocking(video_cache.lookup, unique_ids)
+  to_fetch = [video_id for video_id in unique_ids if video_id not in details_by_id]
+  chunks = [to_fetch[start:start + MAX_IDS_PER_REQUEST] for start in range(0, len(to_fetch), MAX_IDS_PER_REQUEST)]
+  missing_ids = []
+
+  # Quota is charged chunk by chunk before anything is sent, so a deferral cuts off a clean tail
+  admitted = []
+  for index, chunk in enumerate(chunks):
+      try:
+          await _blocking(quota_scheduler.charge, 'videos.list', priority)
+      except QuotaDeferred as e:
+          deferred = [video_id for pending in chunks[index:] for video_id in pending]
+          logging.warning(f"{e}; deferring {len(deferred)} video IDs")
+          for video_id in deferred:
+              if video_id in stale:
+                  details_by_id[video_id] = stale[video_id][1]
+              else:
+                  missing_ids.append(video_id)
+                  if deferred_ids is not None:
+                      deferred_ids.append(video_id)
+          break
+      admitted.append(chunk)
+
+  fetched = {}
+  for chunk, chunk_details in zip(admitted, await asyncio.gather(*(_fetch_videos_chunk(yt_api_key, chunk) for chunk in admitted))):
+      if chunk_details is None:
+          for video_id in chunk:
+              if video_id in stale:
+                  details_by_id[video_id] = stale[video_id][1]
+              else:
+                  missing_ids.append(video_id)
+          continue
+      fetched.update(chunk_details)
+      # Deleted and private IDs are simply absent from the response
+      missing_ids.extend(video_id for video_id in chunk if video_id not in chunk_details)
+
+  await _blocking(video_cache.store, fetched, {video_id: etag for video_id, (etag, _) in stale.items()})
+  details_by_id.update(fetched)
+
+  if missing_ids:
+      logging.warning(f"No details found for {len(missing_ids)} of {len(unique_ids)} video IDs")
+  return details_by_id, missing_ids
+
+async def aget_category_names(yt_api_key, region_code='US', priority=BULK):
     """
-    Retrieves the category name for a given YouTube category ID.
+    Retrieves every YouTube category name for a region, loaded with one videoCategories.list call and memoized.
 
     :param yt_api_key: YouTube API key.
-    :param category_id: YouTube category ID.
-    :return: Category name or 'Unknown' on failure.
+    :param region_code: ISO 3166-1 alpha-2 region code.
+    :param priority: Quota priority of the call, INTERACTIVE or BULK.
+    :return: Dictionary of category ID -> category name, empty on failure.
     """
-    url = "https://www.googleapis.com/youtube/v3/videoCategories"
-    params = {"part": "snippet", "id": category_id, "key": yt_api_key}
+    cached = await _blocking(category_table.get_many, [region_code])
+    if region_code in cached:
+        return cached[region_code]
+
+    params = {"part": "snippet", "regionCode": region_code, "key": yt_api_key}
 
     try:
-        response = requests.get(url, params=params)
+        await _blocking(quota_scheduler.charge, 'videoCategories.list', priority)
+        response = await _api_get('videoCategories.list', YOUTUBE_CATEGORIES_URL, params=params)
         if response.status_code == 200:
-            items = response.json().get("items", [])
-            if items:
-                return items[0].get("snippet", {}).get("title", "Unknown")
-            return "Unknown"
+            categories = {item.get("id", ""): item.get("snippet", {}).get("title", "Unknown")
+                          for item in response.json().get("items", [])}
+            await _blocking(category_table.put_many, {region_code: categories})
+            return categories
         else:
-            logging.error(f"Error fetching category for ID {category_id}: {response.status_code}")
-            return "Unknown"
-    except requests.RequestException as e:
-        logging.error(f"Request error for category ID {category_id}: {e}", exc_info=True)
-        return "Unknown"
+            logging.error(f"Error fetching categories for region {region_code}: {response.status_code}")
+            return {}
+    except QuotaDeferred as e:
+        logging.warning(str(e))
+        return {}
+    except httpx.HTTPError as e:
+        logging.error(f"Request error for categories of region {region_code}: {e}", exc_info=True)
+        return {}
 
-def get_channel_data(yt_api_key, channel_id):
+async def aget_category_name(yt_api_key, category_id, region_code='US'):
+    """
+    Retrieves the category name for a given YouTube category ID.
+
+    :param yt_api_key: YouTube API key.
+    :param category_id: YouTube category ID.
+    :param region_code: ISO 3166-1 alpha-2 region code whose category table is used.
+    :return: Category name or 'Unknown' on failure.
+    """
+    return (await aget_category_names(yt_api_key, region_code)).get(category_id, "Unknown")
+
+async def _fetch_channels_chunk(yt_api_key, chunk):
+  params = {"part": "snippet", "id": ",".join(chunk), "key": yt_api_key}
+  try:
+      response = await _api_get('channels.list', YOUTUBE_CHANNELS_URL, params=params)
+      if response.status_code == 200:
+          return {item.get("id", ""): item["snippet"]["title"]
+                  for item in response.json().get("items", []) if item.get("snippet", {}).get("title")}
+      logging.error(f"Error fetching {len(chunk)} channels starting at {chunk[0]}: {response.status_code}")
+  except httpx.HTTPError as e:
+      logging.error(f"Request error for {len(chunk)} channels starting at {chunk[0]}: {e}", exc_info=True)
+  return {}
+
+async def aget_channels_data(yt_api_key, channel_ids, priority=BULK):
   """
-  Retrieves the channel data for a given YouTube category ID.
+  Retrieves channel titles for any number of channel IDs, MAX_IDS_PER_REQUEST IDs per channels.list call,
+  with the calls running concurrently on the shared connection pool.
+  Results are memoized, so only channels not seen recently are requested.
 
   :param yt_api_key: YouTube API key.
-  :param category_id: YouTube category ID.
-  :return: Category name or 'Unknown' on failure.
+  :param channel_ids: Iterable of YouTube channel IDs.
+  :param priority: Quota priority of the calls, INTERACTIVE or BULK.
+  :return: Dictionary of channel ID -> channel title. Unresolved channels are left out.
   """
-  url = "https://www.googleapis.com/youtube/v3/channels"
-  params = {"part": "snippet", "id": channel_id, "key": yt_api_key}
+  unique_ids = list(dict.fromkeys(channel_id for channel_id in channel_ids if channel_id))
+  titles = await _blocking(channel_table.get_many, unique_ids)
+  to_fetch = [channel_id for channel_id in unique_ids if channel_id not in titles]
 
-  try:
-      response = requests.get(url, params=params)
-      if response.status_code == 200:
-          items = response.json().get("items", [])
-          if items:
-              return items[0].get("snippet", {}).get("title", "Unknown")
-          return "Unknown"
-      else:
-          logging.error(f"Error fetching category for ID {channel_id}: {response.status_code}")
-          return "Unknown"
-  except requests.RequestException as e:
-      logging.error(f"Request error for category ID {channel_id}: {e}", exc_info=True)
-      return "Unknown"
+  admitted = []
+  for start in range(0, len(to_fetch), MAX_IDS_PER_REQUEST):
+      try:
+          await _blocking(quota_scheduler.charge, 'channels.list', priority)
+      except QuotaDeferred as e:
+          logging.warning(f"{e}; leaving {len(to_fetch) - start} channels unresolved")
+          break
+      admitted.append(to_fetch[start:start + MAX_IDS_PER_REQUEST])
 
+  for fetched in await asyncio.gather(*(_fetch_channels_chunk(yt_api_key, chunk) for chunk in admitted)):
+      await _blocking(channel_table.put_many, fetched)
+      titles.update(fetched)
 
-# -*- coding: utf-8 -*-
+  return {channel_id: titles[channel_id] for channel_id in unique_ids if channel_id in titles}
 
-# Sample Python code for youtube.search.list
-# See instructions for running these code samples locally:
-# https://developers.google.com/explorer-help/code-samples#python
+async def aget_channel_data(yt_api_key, channel_id):
+  """
+  Retrieves the channel title for a given YouTube channel ID.
+
+  :param yt_api_key: YouTube API key.
+  :param channel_id: YouTube channel ID.
+  :return: Channel title or 'Unknown' on failure.
+  """
+  return (await aget_channels_data(yt_api_key, [channel_id])).get(channel_id, "Unknown")
 
-scopes = ["https://www.googleapis.com/auth/youtube.force-ssl"]
+async def ayoutube_search(yt_api_key, query, max_results=3, priority=INTERACTIVE):
+  """
+  Searches YouTube for videos matching a query with one search.list call.
 
-def youtube_search(yt_api_key, query, max_results=3):
+  :param yt_api_key: YouTube API key.
+  :param query: The search query.
+  :param max_results: Number of videos to return.
+  :param priority: Quota priority of the call, INTERACTIVE or BULK.
+  :return: List of dictionaries with title, videoId and thumbnail, empty on failure.
+  """
   try:
-      # Log the YouTube API key and query for debugging
-      logging.info(f"Using YouTube API key: {yt_api_key}")
       logging.info(f"Searching YouTube for query: '{query}' with max results: {max_results}")
 
-      # Build the YouTube client
-      youtube = build('youtube', 'v3', developerKey=yt_api_key)
-
-      # Perform the search  
-      search_response = youtube.search().list(
-          q=query,
-          part='snippet',
-          maxResults=max_results,
-          type='video'
-      ).execute()
+      # Perform the search
+      await _blocking(quota_scheduler.charge, 'search.list', priority)
+      params = {"part": "snippet", "q": query, "maxResults": max_results, "type": "video", "key": yt_api_key}
+      response = await _api_get('search.list', YOUTUBE_SEARCH_URL, params=params)
+      if response.status_code != 200:
+          logging.error(f"Error searching YouTube for query '{query}': {response.status_code}")
+          return []
 
       # Extract video information
       videos = []
-      for search_result in search_response.get('items', []):
+      for search_result in response.json().get('items', []):
           videos.append({
               'title': search_result['snippet']['title'],
               'videoId': search_result['id']['videoId'],
@@ -167,6 +693,32 @@ def youtube_search(yt_api_key, query, max_results=3):
       logging.info(f"Found {len(videos)} videos for query '{query}'")
       return videos
 
+  except QuotaDeferred as e:
+      logging.warning(str(e))
+      return []
   except Exception as e:
       logging.error(f"Error in youtube_search: {str(e)}", exc_info=True)
       return []
+
+# Synchronous wrappers: each runs its coroutine in the calling thread, see _run. Do not call them from async code.
+
+def get_youtube_video_details(yt_api_key, video_id, priority=INTERACTIVE):
+  return _run(aget_youtube_video_details(yt_api_key, video_id, priority))
+
+def get_youtube_videos_details(yt_api_key, video_ids, priority=BULK, deferred_ids=None):
+  return _run(aget_youtube_videos_details(yt_api_key, video_ids, priority, deferred_ids))
+
+def get_category_names(yt_api_key, region_code='US', priority=BULK):
+  return _run(aget_category_names(yt_api_key, region_code, priority))
+
+def get_category_name(yt_api_key, category_id, region_code='US'):
+  return _run(aget_category_name(yt_api_key, category_id, region_code))
+
+def get_channels_data(yt_api_key, channel_ids, priority=BULK):
+  return _run(aget_channels_data(yt_api_key, channel_ids, priority))
+
+def get_channel_data(yt_api_key, channel_id):
+  return _run(aget_channel_data(yt_api_key, channel_id))
+
+def youtube_search(yt_api_key, query, max_results=3, priority=INTERACTIVE):
+  return _run(ayoutube_search(yt_api_key, query, max_results, priority))